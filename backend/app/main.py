@@ -1,18 +1,69 @@
-from fastapi import FastAPI, HTTPException, Depends
-from pydantic import BaseModel, AnyUrl, EmailStr
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, AnyUrl, EmailStr, Field
 import os
+import asyncio
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import math
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 import psycopg
-from psycopg.rows import dict_row
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import AsyncConnectionPool
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.concurrency import run_in_threadpool
 import time
-import requests
+import aiohttp
+import msgpack
+import orjson
+import zstandard
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Network Health API (MVP)")
+# Outbound HTTP for manual measurements (created in lifespan). Like the
+# worker's probes, "warm" endpoints go through a pooled session with cached
+# DNS answers and "cold" ones through a session that never reuses either.
+MANUAL_MEASURE_TIMEOUT_SECONDS = float(os.getenv("MANUAL_MEASURE_TIMEOUT_SECONDS", "5"))
+DNS_CACHE_TTL_SECONDS = float(os.getenv("DNS_CACHE_TTL_SECONDS", "30"))
+http_session: Optional[aiohttp.ClientSession] = None
+cold_http_session: Optional[aiohttp.ClientSession] = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global http_session, cold_http_session
+    # One pool per API process, opened before the first request is served
+    await pool.open(wait=True)
+    timeout = aiohttp.ClientTimeout(total=MANUAL_MEASURE_TIMEOUT_SECONDS)
+    http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(ttl_dns_cache=DNS_CACHE_TTL_SECONDS),
+        timeout=timeout,
+    )
+    cold_http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(force_close=True, use_dns_cache=False),
+        timeout=timeout,
+    )
+    listener = asyncio.create_task(live_hub.run())
+    try:
+        yield
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        await http_session.close()
+        await cold_http_session.close()
+        await pool.close()
+
+
+app = FastAPI(title="Network Health API (MVP)", lifespan=lifespan)
 
 # Allow frontend (Vite) to call this API from the browser
 origins = [
@@ -82,37 +133,128 @@ DB_NAME = os.getenv("DB_NAME", "nethealth")
 DB_USER = os.getenv("DB_USER", "netuser")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "netpass")
 
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# How long a request waits for a free connection before failing
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+# Idle connections above min size are closed after this long
+DB_POOL_MAX_IDLE_SECONDS = float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300"))
+
+DB_CONNINFO = make_conninfo(
+    host=DB_HOST,
+    port=DB_PORT,
+    dbname=DB_NAME,
+    user=DB_USER,
+    password=DB_PASSWORD,
+)
+
+pool = AsyncConnectionPool(
+    DB_CONNINFO,
+    kwargs={"row_factory": dict_row},
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT_SECONDS,
+    max_idle=DB_POOL_MAX_IDLE_SECONDS,
+    # Test each connection with a cheap round trip before handing it out,
+    # so a connection dropped by Postgres never reaches a handler
+    check=AsyncConnectionPool.check_connection,
+    open=False,
+    name="api",
+)
+
 
 def get_conn():
-    # Simple connection per request for MVP (we’ll optimize later)
-    return psycopg.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        row_factory=dict_row,
-    )
+    """
+    Borrow a connection from the pool. Use as a context manager; the
+    connection goes back to the pool (committed, or rolled back on error)
+    when the block exits.
+    """
+    return pool.connection()
+
+
+async def notify_endpoint_change(cur, endpoint_id: int):
+    """
+    Tell the worker an endpoint was created / updated / deleted so it can
+    reschedule just that one. Delivered when the transaction commits.
+    """
+    await cur.execute("SELECT pg_notify('endpoint_changes', %s);", (str(endpoint_id),))
 
 
-def get_user_by_email(email: str):
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
+async def get_user_by_email(email: str):
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 "SELECT id, email, password_hash, created_at FROM users WHERE email=%s;",
                 (email,),
             )
-            return cur.fetchone()
+            return await cur.fetchone()
 
 
-def get_user_by_id(user_id: int):
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
+async def get_user_by_id(user_id: int):
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 "SELECT id, email, password_hash, created_at FROM users WHERE id=%s;",
                 (user_id,),
             )
-            return cur.fetchone()
+            return await cur.fetchone()
+
+
+# === Resolved-user cache ===
+# get_current_user would otherwise hit the users table on every request
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+# With this on, a valid token is enough: the user is built from its claims
+# and never looked up, so a deleted user keeps access until the token
+# expires (ACCESS_TOKEN_EXPIRE_MINUTES).
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+
+class UserCache:
+    """
+    Bounded LRU of resolved users with a TTL. Entries are dropped when the
+    users row changes (NOTIFY user_changes, see init.sql / LiveHub), so the
+    TTL only bounds staleness if a notification is missed.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL_SECONDS, max_size: int = USER_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "trusted_claims": 0}
+
+    def get(self, user_id: int):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def put(self, user: dict):
+        self._entries[user["id"]] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user["id"])
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+        }
+
+
+user_cache = UserCache()
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -135,9 +277,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
 
-    user = get_user_by_id(user_id)
+    if AUTH_TRUST_TOKEN_CLAIMS and "email" in payload:
+        user_cache.stats["trusted_claims"] += 1
+        return {"id": user_id, "email": payload["email"]}
+
+    user = user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        row = await get_user_by_id(user_id)
+        if row is None:
+            raise credentials_exception
+        # Never keep password hashes around in memory
+        user = {"id": row["id"], "email": row["email"], "created_at": row["created_at"]}
+        user_cache.put(user)
     return user
 
 
@@ -146,16 +297,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 # ================================
 
 @app.post("/signup", response_model=UserOut)
-def signup(user_in: UserCreate):
-    existing = get_user_by_email(user_in.email)
+async def signup(user_in: UserCreate):
+    existing = await get_user_by_email(user_in.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    password_hash = get_password_hash(user_in.password)
+    # pbkdf2 is deliberately slow; keep it off the event loop
+    password_hash = await run_in_threadpool(get_password_hash, user_in.password)
 
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 INSERT INTO users (email, password_hash)
                 VALUES (%s, %s)
@@ -163,22 +315,24 @@ def signup(user_in: UserCreate):
                 """,
                 (user_in.email, password_hash),
             )
-            row = cur.fetchone()
-            conn.commit()
+            row = await cur.fetchone()
+            await conn.commit()
 
+    # Signup is always followed by a login and the first requests
+    user_cache.put(dict(row))
     return row
 
 
 @app.post("/login", response_model=Token)
-def login(user_in: UserLogin):
-    user = get_user_by_email(user_in.email)
+async def login(user_in: UserLogin):
+    user = await get_user_by_email(user_in.email)
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect email or password")
 
-    if not verify_password(user_in.password, user["password_hash"]):
+    if not await run_in_threadpool(verify_password, user_in.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
 
-    access_token = create_access_token(data={"sub": str(user["id"])})
+    access_token = create_access_token(data={"sub": str(user["id"]), "email": user["email"]})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -187,72 +341,235 @@ def login(user_in: UserLogin):
 # ================================
 
 @app.get("/healthz")
-def healthz():
+async def healthz():
     """Liveness/readiness check (later used by Kubernetes)."""
     try:
-        with get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT 1;")
-                _ = cur.fetchone()
+        async with get_conn() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT 1;")
+                _ = await cur.fetchone()
         return {"ok": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Runtime counters for this API process. db_pool.saturation is the share
+    of max_size currently checked out; requests_waiting > 0 means handlers
+    are queueing for a connection. summary_cache counts summary rows
+    found in endpoint_status (hits) vs. endpoints not measured yet. live
+    counts SSE subscribers and the deltas fanned out to them. user_cache
+    shows how many authenticated requests skipped the users lookup.
+    response_cache counts conditional GETs answered with 304, bodies
+    served from response_cache and bodies built from scratch.
+    manual_measure counts outbound probes, calls that joined one in
+    flight or got a fresh result, and calls allowed / rate limited.
+    """
+    stats = pool.get_stats()
+    in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+    stats["saturation"] = round(in_use / pool.max_size, 3)
+    return {
+        "db_pool": stats,
+        "summary_cache": summary_cache,
+        "live": {"subscribers": live_hub.subscriber_count(), **live_hub.stats},
+        "user_cache": user_cache.snapshot(),
+        "response_cache": response_cache_stats,
+        "manual_measure": {**measure_flights.stats, **measure_limiter.stats},
+    }
+
+
+# ================================
+# LIVE UPDATES (SSE, fed by LISTEN live_updates)
+# ================================
+
+# Events buffered per dashboard before it is considered lagging
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "500"))
+# Comment line sent on idle streams so proxies keep the connection open
+LIVE_KEEPALIVE_SECONDS = float(os.getenv("LIVE_KEEPALIVE_SECONDS", "15"))
+
+
+class LiveHub:
+    """
+    Fans the JSON deltas that the DB publishes on NOTIFY live_updates
+    (measurement / alert / state, see init.sql) out to the SSE streams of
+    this API process, by user_id. One LISTEN connection per process, so
+    an idle dashboard costs an open socket and nothing else.
+
+    The same connection listens on user_changes to drop stale entries
+    from the user cache.
+
+    A subscriber that falls LIVE_QUEUE_SIZE events behind, or that may
+    have missed events while the listener reconnected, gets a single
+    {"type": "resync"} telling it to re-fetch.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self.stats = {"events": 0, "delivered": 0, "resyncs": 0}
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(LIVE_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(q) for q in self._subscribers.values())
+
+    def _put(self, queue: asyncio.Queue, event: dict):
+        try:
+            queue.put_nowait(event)
+            self.stats["delivered"] += 1
+        except asyncio.QueueFull:
+            # Too far behind: drop the backlog, the client re-fetches instead
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"type": "resync"})
+            self.stats["resyncs"] += 1
+
+    def publish(self, event: dict):
+        self.stats["events"] += 1
+        for queue in self._subscribers.get(event.get("user_id"), ()):
+            self._put(queue, event)
+
+    def resync_all(self):
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._put(queue, {"type": "resync"})
+
+    async def run(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    DB_CONNINFO, autocommit=True
+                ) as conn:
+                    await conn.execute("LISTEN live_updates;")
+                    await conn.execute("LISTEN user_changes;")
+                    # Anything sent while we were disconnected is lost
+                    self.resync_all()
+                    user_cache.clear()
+                    async for notify in conn.notifies():
+                        try:
+                            if notify.channel == "user_changes":
+                                user_cache.invalidate(int(notify.payload))
+                            else:
+                                self.publish(json.loads(notify.payload))
+                        except ValueError:
+                            continue
+            except Exception as e:
+                print(f"[api] Live updates listener error: {e}")
+                await asyncio.sleep(1)
+
+
+live_hub = LiveHub()
+
+
+@app.get("/api/stream")
+async def stream_updates(token: str = Query(...)):
+    """
+    Server-Sent Events stream of the current user's measurement, alert and
+    alert-state deltas. The token goes in the query string because
+    EventSource cannot send headers.
+    """
+    current_user = await get_current_user(token)
+    user_id = current_user["id"]
+    queue = live_hub.subscribe(user_id)
+
+    async def events():
+        try:
+            yield "event: ready\ndata: {}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            live_hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ================================
 # ENDPOINTS CRUD
 # ================================
 
 @app.get("/api/endpoints")
-def list_endpoints(current_user=Depends(get_current_user)):
+async def list_endpoints(current_user=Depends(get_current_user)):
     """
     List all endpoints owned by the authenticated user.
     """
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
-                SELECT e.id, e.name, e.url, e.created_at
+                SELECT e.id, e.name, e.url, e.created_at, e.check_interval_seconds,
+                       e.probe_headers_only, e.probe_mode
                 FROM endpoints e
                 WHERE e.user_id = %s
                 ORDER BY e.id;
                 """,
                 (current_user["id"],),
             )
-            rows = cur.fetchall()
+            rows = await cur.fetchall()
     return {"endpoints": rows}
 
 
 class NewEndpoint(BaseModel):
     name: str
     url: AnyUrl
+    check_interval_seconds: Optional[int] = Field(None, ge=1)  # None = worker default
+    probe_headers_only: bool = False  # stop probes at the response headers
+    probe_mode: str = Field("warm", pattern="^(warm|cold)$")
 
 
 @app.post("/api/endpoints")
-def create_endpoint(
+async def create_endpoint(
     ep: NewEndpoint,
     current_user=Depends(get_current_user),
 ):
     """
     Create a new endpoint owned by the authenticated user.
     """
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
-                INSERT INTO endpoints (user_id, name, url)
-                VALUES (%s, %s, %s)
+                INSERT INTO endpoints (
+                  user_id, name, url, check_interval_seconds, probe_headers_only, probe_mode
+                )
+                VALUES (%s, %s, %s, %s, %s, %s)
                 RETURNING id, user_id, name, url, created_at,
+                          check_interval_seconds,
+                          probe_headers_only,
+                          probe_mode,
                           latency_threshold_ms,
                           consecutive_fail_threshold,
                           consecutive_failures,
                           alert_active,
                           last_alert_at;
                 """,
-                (current_user["id"], ep.name, str(ep.url)),
+                (
+                    current_user["id"], ep.name, str(ep.url),
+                    ep.check_interval_seconds, ep.probe_headers_only, ep.probe_mode,
+                ),
             )
-            row = cur.fetchone()
-            conn.commit()
+            row = await cur.fetchone()
+            await notify_endpoint_change(cur, row["id"])
+            await conn.commit()
 
     return row
 
@@ -260,22 +577,29 @@ def create_endpoint(
 class EndpointUpdate(BaseModel):
     name: Optional[str] = None
     url: Optional[AnyUrl] = None
+    check_interval_seconds: Optional[int] = Field(None, ge=1)
+    probe_headers_only: Optional[bool] = None
+    probe_mode: Optional[str] = Field(None, pattern="^(warm|cold)$")
 
 
 @app.put("/api/endpoints/{endpoint_id}")
-def update_endpoint(
+async def update_endpoint(
     endpoint_id: int,
     ep_update: EndpointUpdate,
     current_user=Depends(get_current_user),
 ):
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            # Check ownership
-            cur.execute(
-                "SELECT id FROM endpoints WHERE id = %s AND user_id = %s;",
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            # Check ownership (locked: the percentile window check below)
+            await cur.execute(
+                """
+                SELECT id, latency_percentile_window_minutes FROM endpoints
+                WHERE id = %s AND user_id = %s
+                FOR UPDATE;
+                """,
                 (endpoint_id, current_user["id"]),
             )
-            owned = cur.fetchone()
+            owned = await cur.fetchone()
             if owned is None:
                 raise HTTPException(status_code=404, detail="Endpoint not found")
 
@@ -290,17 +614,37 @@ def update_endpoint(
                 fields.append("url = %s")
                 params.append(str(ep_update.url))
 
+            if ep_update.check_interval_seconds is not None:
+                error = percentile_window_error(
+                    owned["latency_percentile_window_minutes"], ep_update.check_interval_seconds
+                )
+                if error:
+                    raise HTTPException(status_code=422, detail=error)
+                fields.append("check_interval_seconds = %s")
+                params.append(ep_update.check_interval_seconds)
+
+            if ep_update.probe_headers_only is not None:
+                fields.append("probe_headers_only = %s")
+                params.append(ep_update.probe_headers_only)
+
+            if ep_update.probe_mode is not None:
+                fields.append("probe_mode = %s")
+                params.append(ep_update.probe_mode)
+
             if not fields:
                 raise HTTPException(status_code=400, detail="No fields to update")
 
             params.append(endpoint_id)
 
-            cur.execute(
+            await cur.execute(
                 f"""
                 UPDATE endpoints
                 SET {", ".join(fields)}
                 WHERE id = %s
                 RETURNING id, user_id, name, url, created_at,
+                          check_interval_seconds,
+                          probe_headers_only,
+                          probe_mode,
                           latency_threshold_ms,
                           consecutive_fail_threshold,
                           consecutive_failures,
@@ -309,20 +653,21 @@ def update_endpoint(
                 """,
                 params,
             )
-            row = cur.fetchone()
-            conn.commit()
+            row = await cur.fetchone()
+            await notify_endpoint_change(cur, endpoint_id)
+            await conn.commit()
 
     return row
 
 
 @app.delete("/api/endpoints/{endpoint_id}")
-def delete_endpoint(
+async def delete_endpoint(
     endpoint_id: int,
     current_user=Depends(get_current_user),
 ):
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 DELETE FROM endpoints
                 WHERE id = %s AND user_id = %s
@@ -330,45 +675,107 @@ def delete_endpoint(
                 """,
                 (endpoint_id, current_user["id"]),
             )
-            row = cur.fetchone()
+            row = await cur.fetchone()
             if row is None:
                 raise HTTPException(status_code=404, detail="Endpoint not found")
-            conn.commit()
+            await notify_endpoint_change(cur, endpoint_id)
+            await conn.commit()
 
     return {"message": "Endpoint deleted"}
 
 
+# ================================
+# HISTORY PAGINATION (keyset cursors)
+# ================================
+
+# Hard cap on rows per page, whatever limit the client asks for
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "500"))
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        ts, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(ts), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def history_filters(ts_column: str, since, until, cursor):
+    """
+    WHERE clauses + params for a newest-first page on (ts_column, id):
+    since <= ts < until, and strictly older than the cursor (the last row
+    of the previous page). Pages are read straight off the
+    (..., ts DESC, id DESC) indexes, so every page costs the same however
+    far back it is.
+    """
+    clauses = []
+    params = []
+    if since is not None:
+        clauses.append(f"{ts_column} >= %s")
+        params.append(since)
+    if until is not None:
+        clauses.append(f"{ts_column} < %s")
+        params.append(until)
+    if cursor is not None:
+        ts, row_id = decode_cursor(cursor)
+        # The plain bound lets Postgres skip newer partitions
+        clauses.append(f"{ts_column} <= %s AND ({ts_column}, id) < (%s, %s)")
+        params.extend([ts, ts, row_id])
+    return clauses, params
+
+
+def page_of(rows, limit: int, ts_column: str):
+    """
+    Pages are fetched with limit + 1 rows to tell whether there is more.
+    Returns (rows, next_cursor).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][ts_column], rows[-1]["id"])
+
+
 # ================================
 # MEASUREMENTS (generic list + worker insert)
 # ================================
 
 @app.get("/api/measurements")
-def list_measurements(endpoint_id: Optional[int] = None, limit: int = 50):
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            if endpoint_id is not None:
-                cur.execute(
-                    """
-                    SELECT m.id, m.endpoint_id, m.latency_ms, m.status, m.observed_at
-                    FROM measurements m
-                    WHERE m.endpoint_id=%s
-                    ORDER BY m.observed_at DESC
-                    LIMIT %s;
-                    """,
-                    (endpoint_id, limit),
-                )
-            else:
-                cur.execute(
-                    """
-                    SELECT m.id, m.endpoint_id, m.latency_ms, m.status, m.observed_at
-                    FROM measurements m
-                    ORDER BY m.observed_at DESC
-                    LIMIT %s;
-                    """,
-                    (limit,),
-                )
-            rows = cur.fetchall()
-    return {"measurements": rows}
+async def list_measurements(
+    endpoint_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=PAGE_MAX_LIMIT),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    Newest first. Pass back next_cursor as ?cursor= to get the next page.
+    """
+    clauses, params = history_filters("m.observed_at", since, until, cursor)
+    if endpoint_id is not None:
+        clauses.insert(0, "m.endpoint_id = %s")
+        params.insert(0, endpoint_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"""
+                SELECT m.id, m.endpoint_id, m.latency_ms, m.status, m.observed_at
+                FROM measurements m
+                {where}
+                ORDER BY m.observed_at DESC, m.id DESC
+                LIMIT %s;
+                """,
+                [*params, limit + 1],
+            )
+            rows = await cur.fetchall()
+
+    rows, next_cursor = page_of(rows, limit, "observed_at")
+    return {"measurements": rows, "next_cursor": next_cursor}
 
 
 class NewMeasurement(BaseModel):
@@ -378,27 +785,611 @@ class NewMeasurement(BaseModel):
 
 
 @app.post("/api/measurements")
-def add_measurement(m: NewMeasurement):
+async def add_measurement(m: NewMeasurement, x_ingest_key: Optional[str] = Header(None)):
+    # Without a configured key the route stays open as before, but what it
+    # stores is not evaluated for alerts
+    keyed = check_ingest_key(x_ingest_key)
     if m.status not in ("up", "down"):
         raise HTTPException(400, "status must be 'up' or 'down'")
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1 FROM endpoints WHERE id=%s;", (m.endpoint_id,))
-            if cur.fetchone() is None:
-                raise HTTPException(404, "endpoint not found")
-            cur.execute(
-                """
-                INSERT INTO measurements (endpoint_id, latency_ms, status)
-                VALUES (%s, %s, %s)
-                RETURNING id, endpoint_id, latency_ms, status, observed_at;
-                """,
-                (m.endpoint_id, m.latency_ms, m.status),
-            )
-            row = cur.fetchone()
-            conn.commit()
+    if m.endpoint_id not in await endpoint_ids.known([m.endpoint_id]):
+        raise HTTPException(404, "endpoint not found")
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            if keyed:
+                await cur.execute(
+                    """
+                    WITH m AS (
+                      INSERT INTO measurements (endpoint_id, latency_ms, status)
+                      VALUES (%s, %s, %s)
+                      RETURNING id, endpoint_id, latency_ms, status, observed_at
+                    ), queued AS (
+                      INSERT INTO probe_inbox (endpoint_id, latency_ms, status, observed_at)
+                      SELECT endpoint_id, latency_ms, status, observed_at FROM m
+                    )
+                    SELECT * FROM m;
+                    """,
+                    (m.endpoint_id, m.latency_ms, m.status),
+                )
+                row = await cur.fetchone()
+                await cur.execute("SELECT pg_notify('probe_inbox', '');")
+            else:
+                await cur.execute(
+                    """
+                    INSERT INTO measurements (endpoint_id, latency_ms, status)
+                    VALUES (%s, %s, %s)
+                    RETURNING id, endpoint_id, latency_ms, status, observed_at;
+                    """,
+                    (m.endpoint_id, m.latency_ms, m.status),
+                )
+                row = await cur.fetchone()
+            await conn.commit()
     return row
 
 
+# ================================
+# BULK INGEST (external probes: JSON array or NDJSON, written with COPY)
+# ================================
+
+# Upper bound on rows per request; split bigger uploads
+INGEST_MAX_ROWS = int(os.getenv("INGEST_MAX_ROWS", "50000"))
+# observed_at must fall within [now - max age, now + max skew]; older rows
+# would land in partitions already past retention
+INGEST_MAX_AGE_HOURS = float(os.getenv("INGEST_MAX_AGE_HOURS", "24"))
+INGEST_MAX_SKEW_SECONDS = float(os.getenv("INGEST_MAX_SKEW_SECONDS", "300"))
+# Pushed results raise alerts, so the bulk endpoint only runs with a key
+# configured and both ingest endpoints then require it in X-Ingest-Key
+INGEST_API_KEY = os.getenv("INGEST_API_KEY")
+# An endpoint id seen to exist is trusted this long before it is checked
+# again (see EndpointIdCache)
+ENDPOINT_ID_CACHE_TTL_SECONDS = float(os.getenv("ENDPOINT_ID_CACHE_TTL_SECONDS", "30"))
+
+INGEST_STAGE_TABLE = """
+CREATE TEMP TABLE IF NOT EXISTS ingest_stage (
+  endpoint_id INT NOT NULL,
+  latency_ms INT,
+  status TEXT NOT NULL,
+  observed_at TIMESTAMPTZ NOT NULL
+) ON COMMIT DELETE ROWS;
+"""
+
+
+# endpoint_id / latency_ms are INT columns; a larger value would abort the
+# whole COPY instead of being rejected on its own
+PG_INT_MAX = 2**31 - 1
+
+
+def check_ingest_key(key: Optional[str], required: bool = False) -> bool:
+    """
+    Check X-Ingest-Key against INGEST_API_KEY. Returns whether the caller
+    presented the configured key; with no key configured that is False,
+    or a 503 when the route needs one.
+    """
+    if not INGEST_API_KEY:
+        if required:
+            raise HTTPException(status_code=503, detail="Ingest is disabled: INGEST_API_KEY is not set")
+        return False
+    if key is None or not hmac.compare_digest(key.encode(), INGEST_API_KEY.encode()):
+        raise HTTPException(status_code=401, detail="Invalid ingest key")
+    return True
+
+
+class EndpointIdCache:
+    """
+    Endpoint ids known to exist, so ingest does not look every row up.
+    Only the ids a batch names are checked (one indexed ANY() lookup for
+    those not already known); ids found are trusted for
+    ENDPOINT_ID_CACHE_TTL_SECONDS. Unknown ids are not cached, so an
+    endpoint created on another replica is accepted on its first batch.
+    Ids deleted in the meantime are filtered by the INSERT ... SELECT
+    join, not here.
+    """
+
+    def __init__(self, ttl: float = ENDPOINT_ID_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._seen = {}  # id -> monotonic time it was last found
+        self._pruned_at = time.monotonic()
+        self.stats = {"lookups": 0, "hits": 0}
+
+    async def known(self, ids) -> frozenset:
+        """Return the subset of ids that exist."""
+        ids = set(ids)
+        now = time.monotonic()
+        found = {i for i in ids if now - self._seen.get(i, -math.inf) <= self.ttl}
+        self.stats["hits"] += len(found)
+        unknown = ids - found
+        if unknown:
+            async with get_conn() as conn:
+                async with conn.cursor(row_factory=tuple_row) as cur:
+                    await cur.execute("SELECT id FROM endpoints WHERE id = ANY(%s);", (list(unknown),))
+                    rows = await cur.fetchall()
+            self.stats["lookups"] += 1
+            for (endpoint_id,) in rows:
+                self._seen[endpoint_id] = now
+                found.add(endpoint_id)
+        if now - self._pruned_at > self.ttl:
+            # Forget ids nobody pushed for a while (e.g. deleted endpoints)
+            self._seen = {i: t for i, t in self._seen.items() if now - t <= self.ttl}
+            self._pruned_at = now
+        return frozenset(found)
+
+
+endpoint_ids = EndpointIdCache()
+
+
+def parse_ingest_row(obj, now: datetime) -> tuple:
+    """
+    Validate one pushed measurement, return it as a COPY row
+    (endpoint_id, latency_ms, status, observed_at). Raises ValueError.
+    observed_at is optional (defaults to now); naive timestamps are UTC.
+    """
+    if not isinstance(obj, dict):
+        raise ValueError("expected an object")
+    endpoint_id = obj.get("endpoint_id")
+    if type(endpoint_id) is not int or not 0 < endpoint_id <= PG_INT_MAX:
+        raise ValueError("endpoint_id must be a positive 32-bit integer")
+    status = obj.get("status")
+    if status not in ("up", "down"):
+        raise ValueError("status must be 'up' or 'down'")
+    latency_ms = obj.get("latency_ms")
+    if latency_ms is not None and (type(latency_ms) is not int or not 0 <= latency_ms <= PG_INT_MAX):
+        raise ValueError("latency_ms must be a non-negative 32-bit integer or null")
+
+    observed_at = obj.get("observed_at")
+    if observed_at is None:
+        observed_at = now
+    else:
+        if not isinstance(observed_at, str):
+            raise ValueError("observed_at must be an ISO 8601 string")
+        observed_at = datetime.fromisoformat(observed_at)
+        if observed_at.tzinfo is None:
+            observed_at = observed_at.replace(tzinfo=timezone.utc)
+        if not (
+            now - timedelta(hours=INGEST_MAX_AGE_HOURS)
+            <= observed_at
+            <= now + timedelta(seconds=INGEST_MAX_SKEW_SECONDS)
+        ):
+            raise ValueError("observed_at out of the accepted range")
+
+    return (endpoint_id, latency_ms, status, observed_at)
+
+
+async def read_ingest_body(request: Request):
+    """
+    Yield the pushed objects: a JSON array (or {"measurements": [...]}),
+    or NDJSON when the content type says so, parsed line by line as the
+    body streams in.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        # Only the new chunk is split; the unterminated tail is kept in
+        # pieces and joined once its newline arrives, so a long line
+        # spread over many chunks is not re-scanned for every one of them
+        tail = []
+        async for chunk in request.stream():
+            *lines, rest = chunk.split(b"\n")
+            if lines:
+                lines[0] = b"".join((*tail, lines[0]))
+                tail.clear()
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+            if rest:
+                tail.append(rest)
+        last = b"".join(tail)
+        if last.strip():
+            yield json.loads(last)
+        return
+
+    body = json.loads(await request.body())
+    if isinstance(body, dict):
+        body = body.get("measurements")
+    if not isinstance(body, list):
+        raise ValueError("expected a JSON array of measurements")
+    for obj in body:
+        yield obj
+
+
+@app.post("/api/measurements/bulk")
+async def ingest_measurements(request: Request, x_ingest_key: Optional[str] = Header(None)):
+    """
+    Batch ingest for external probes. Send a JSON array of
+    {"endpoint_id", "status", "latency_ms", "observed_at"?} objects, or
+    the same objects as NDJSON (Content-Type: application/x-ndjson).
+
+    Valid rows are written with one COPY; rows that fail validation or
+    name an unknown endpoint are skipped and reported by index. Accepted
+    rows go through the same alert evaluation as the worker's own probes
+    (via probe_inbox, see init.sql), so the route needs INGEST_API_KEY.
+    """
+    check_ingest_key(x_ingest_key, required=True)
+    now = datetime.now(timezone.utc)
+    rows, rejected = [], []
+    index = -1
+    try:
+        async for obj in read_ingest_body(request):
+            index += 1
+            if index >= INGEST_MAX_ROWS:
+                raise HTTPException(413, f"at most {INGEST_MAX_ROWS} measurements per request")
+            try:
+                rows.append((index, parse_ingest_row(obj, now)))
+            except ValueError as e:
+                rejected.append({"index": index, "error": str(e)})
+    except ValueError as e:
+        # Malformed JSON (json.JSONDecodeError is a ValueError)
+        raise HTTPException(400, f"invalid body after {index + 1} measurements: {e}")
+
+    known = await endpoint_ids.known(r[0] for _, r in rows)
+    valid = []
+    for i, row in rows:
+        if row[0] in known:
+            valid.append(row)
+        else:
+            rejected.append({"index": i, "error": "endpoint not found"})
+    rejected.sort(key=lambda r: r["index"])
+
+    accepted = 0
+    if valid:
+        async with get_conn() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(INGEST_STAGE_TABLE)
+                async with cur.copy(
+                    "COPY ingest_stage (endpoint_id, latency_ms, status, observed_at) FROM STDIN"
+                ) as copy:
+                    for row in valid:
+                        await copy.write_row(row)
+                await cur.execute(
+                    """
+                    WITH m AS (
+                      INSERT INTO measurements (endpoint_id, latency_ms, status, observed_at)
+                      SELECT s.endpoint_id, s.latency_ms, s.status, s.observed_at
+                      FROM ingest_stage s
+                      JOIN endpoints e ON e.id = s.endpoint_id
+                      RETURNING endpoint_id, latency_ms, status, observed_at
+                    )
+                    INSERT INTO probe_inbox (endpoint_id, latency_ms, status, observed_at)
+                    SELECT endpoint_id, latency_ms, status, observed_at
+                    FROM m
+                    ORDER BY observed_at;
+                    """
+                )
+                accepted = cur.rowcount
+                await cur.execute("SELECT pg_notify('probe_inbox', '');")
+                await conn.commit()
+
+    return {
+        "accepted": accepted,
+        # Valid rows whose endpoint was deleted since the cache was loaded
+        "dropped": len(valid) - accepted,
+        "rejected": rejected,
+    }
+
+
+# ================================
+# EXPORT (streamed raw history: CSV / NDJSON / Parquet)
+# ================================
+
+# Exports run on their own connections (not the pool) so a long download
+# never starves request handlers; this caps how many run at once per process
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+# Rows per server-side cursor fetch / Parquet row group
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+EXPORT_CHUNK_BYTES = 256 * 1024
+
+export_slots = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class _ChunkSink:
+    """
+    Write-only file object for pyarrow: collects what the Parquet writer
+    emits so it can be handed to the response chunk by chunk.
+    """
+
+    def __init__(self):
+        self.closed = False
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def _export_rows(query: str, params):
+    """
+    Yield batches of (id, endpoint_id, observed_at, status, latency_ms)
+    tuples from a server-side cursor, so memory stays flat however many
+    rows match.
+    """
+    async with await psycopg.AsyncConnection.connect(DB_CONNINFO) as conn:
+        async with conn.cursor(name="export") as cur:
+            await cur.execute(query, params)
+            while True:
+                rows = await cur.fetchmany(EXPORT_BATCH_ROWS)
+                if not rows:
+                    break
+                yield rows
+
+
+async def _export_csv(query: str, params):
+    async with await psycopg.AsyncConnection.connect(DB_CONNINFO) as conn:
+        await conn.execute("SET TIME ZONE 'UTC';")
+        async with conn.cursor() as cur:
+            async with cur.copy(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", params) as copy:
+                # COPY hands out one row per message; send fewer, bigger chunks
+                buf = bytearray()
+                async for data in copy:
+                    buf += data
+                    if len(buf) >= EXPORT_CHUNK_BYTES:
+                        yield bytes(buf)
+                        buf.clear()
+                yield bytes(buf)
+
+
+async def _export_ndjson(query: str, params):
+    async for rows in _export_rows(query, params):
+        yield "".join(
+            json.dumps({
+                "id": r[0],
+                "endpoint_id": r[1],
+                "observed_at": r[2].isoformat(),
+                "status": r[3],
+                "latency_ms": r[4],
+            }, separators=(",", ":")) + "\n"
+            for r in rows
+        ).encode()
+
+
+async def _export_parquet(query: str, params):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("endpoint_id", pa.int32()),
+        ("observed_at", pa.timestamp("us", tz="UTC")),
+        ("status", pa.dictionary(pa.int8(), pa.string())),
+        ("latency_ms", pa.int32()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in _export_rows(query, params):
+            ids, endpoint_ids, observed_at, status, latency_ms = zip(*rows)
+            batch = pa.record_batch(
+                [
+                    pa.array(ids, pa.int64()),
+                    pa.array(endpoint_ids, pa.int32()),
+                    pa.array(observed_at, pa.timestamp("us", tz="UTC")),
+                    pa.array(status, pa.string()).dictionary_encode().cast(schema.field("status").type),
+                    pa.array(latency_ms, pa.int32()),
+                ],
+                schema=schema,
+            )
+            # One row group per batch; its bytes go out right away
+            writer.write_batch(batch, row_group_size=EXPORT_BATCH_ROWS)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+@app.get("/api/measurements/export")
+async def export_measurements(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    endpoint_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user=Depends(get_current_user),
+):
+    """
+    Stream the raw measurements of the current user's endpoints (or of one
+    endpoint) in CSV, NDJSON or Parquet. Rows come partition by partition,
+    i.e. roughly oldest first. CSV is produced by COPY TO STDOUT, the others
+    from a server-side cursor; nothing is buffered beyond one batch.
+    """
+    clauses, params = history_filters("m.observed_at", since, until, None)
+    clauses.insert(0, "e.user_id = %s")
+    params.insert(0, current_user["id"])
+    if endpoint_id is not None:
+        async with get_conn() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "SELECT id FROM endpoints WHERE id = %s AND user_id = %s;",
+                    (endpoint_id, current_user["id"]),
+                )
+                if await cur.fetchone() is None:
+                    raise HTTPException(status_code=404, detail="Endpoint not found")
+        clauses.insert(0, "m.endpoint_id = %s")
+        params.insert(0, endpoint_id)
+
+    query = f"""
+        SELECT m.id, m.endpoint_id, m.observed_at, m.status, m.latency_ms
+        FROM measurements m
+        JOIN endpoints e ON e.id = m.endpoint_id
+        WHERE {" AND ".join(clauses)}
+    """
+    producer = {"csv": _export_csv, "ndjson": _export_ndjson, "parquet": _export_parquet}[format]
+
+    # The slot is taken here, not once streaming starts, so requests over
+    # the cap get their 429 instead of queueing with a connection held open
+    if export_slots.locked():
+        raise HTTPException(status_code=429, detail="Too many exports running, try again later")
+    await export_slots.acquire()  # a slot is free, this does not wait
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            export_slots.release()
+
+    async def body():
+        try:
+            async for chunk in producer(query, params):
+                if chunk:
+                    yield chunk
+        finally:
+            release()
+
+    filename = f"measurements{'-' + str(endpoint_id) if endpoint_id else ''}.{format}"
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        # Also runs when the client leaves before the body was started
+        background=BackgroundTask(release),
+    )
+
+
+# ================================
+# RESPONSE CACHE (ETag / conditional GET)
+# ================================
+
+# Read routes whose data only changes when the worker (or a user) writes
+# go through cached_response. Their ETag is derived from the data_versions
+# the route depends on (bumped by triggers, see init.sql), so an unchanged
+# poll costs one version lookup and gets a 304; the rendered bodies are
+# also kept in response_cache, shared by every API replica.
+# RESPONSE_CACHE_SHARED=false keeps the ETags / 304s but stores no bodies.
+RESPONSE_CACHE_SHARED = os.getenv("RESPONSE_CACHE_SHARED", "true").lower() in ("1", "true", "yes")
+
+# Per-process counters for /metrics
+response_cache_stats = {"not_modified": 0, "hits": 0, "misses": 0}
+
+# Current tag (kind:version list) and, in the same round trip, the body
+# cached at that tag if any
+RESPONSE_CACHE_LOOKUP_SQL = """
+SELECT v.tag, c.body
+FROM (
+  SELECT COALESCE(string_agg(kind || ':' || version, ',' ORDER BY kind), '') AS tag
+  FROM data_versions
+  WHERE user_id = %(user_id)s AND kind = ANY(%(kinds)s)
+) v
+LEFT JOIN response_cache c
+  ON %(shared)s AND c.user_id = %(user_id)s AND c.key = %(key)s AND c.tag = v.tag;
+"""
+
+# Store a freshly rendered body only if its tag is still the current one:
+# routes built on measurements see their tag move on every worker flush,
+# and a body stored after that would never be served (nor would it
+# replace an older one anybody could still hit)
+RESPONSE_CACHE_STORE_SQL = """
+INSERT INTO response_cache (user_id, key, tag, body)
+SELECT %(user_id)s, %(key)s, %(tag)s, %(body)s
+WHERE %(tag)s = (
+  SELECT COALESCE(string_agg(kind || ':' || version, ',' ORDER BY kind), '')
+  FROM data_versions
+  WHERE user_id = %(user_id)s AND kind = ANY(%(kinds)s)
+)
+ON CONFLICT (user_id, key) DO UPDATE
+SET tag = EXCLUDED.tag, body = EXCLUDED.body, stored_at = NOW();
+"""
+
+
+def _json_default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def response_cache_key(request: Request, extra=()) -> str:
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    return "|".join([request.url.path, query, *map(str, extra)])
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (t.strip() for t in header.split(","))
+
+
+async def cached_response(request: Request, user_id: int, kinds, compute, extra=(), encode=None) -> Response:
+    """
+    Serve a JSON read route through the data version stamps:
+      - If-None-Match carries the current ETag: 304
+      - response_cache has the body at the current versions: that body
+      - otherwise await compute() (the route's payload), store and send it
+    kinds: the data_versions kinds the payload is built from; extra: any
+    other input that is not in the URL (e.g. a window start that moves
+    with the clock).
+    History routes pass encode(payload, fmt) -> bytes to get the format
+    negotiation and compression of negotiated_response; each format is
+    cached under its own key.
+    """
+    fmt = "json"
+    if encode is not None:
+        fmt = response_format(request)
+        extra = (*extra, fmt)
+    key = response_cache_key(request, extra)
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                RESPONSE_CACHE_LOOKUP_SQL,
+                {"user_id": user_id, "kinds": list(kinds), "key": key, "shared": RESPONSE_CACHE_SHARED},
+            )
+            row = await cur.fetchone()
+
+    tag = row["tag"]
+    etag = 'W/"' + hashlib.blake2b(f"{key}#{tag}".encode(), digest_size=12).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if encode is not None:
+        headers["Vary"] = "Accept, Accept-Encoding"
+    if etag_matches(request, etag):
+        response_cache_stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+
+    body = row["body"]
+    if body is not None:
+        response_cache_stats["hits"] += 1
+    else:
+        # The tag was read before computing, so the body is at least that
+        # fresh; if data moved meanwhile it is sent but not stored
+        response_cache_stats["misses"] += 1
+        body = await render_and_store(user_id, key, tag, list(kinds), compute, encode, fmt)
+
+    if encode is not None:
+        return compressed_response(request, body, FORMAT_MEDIA_TYPES[fmt], headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def render_and_store(user_id: int, key: str, tag: str, kinds, compute, encode, fmt: str) -> bytes:
+    payload = await compute()
+    if encode is None:
+        body = orjson.dumps(payload, default=_json_default)
+    else:
+        body = encode(payload, fmt)
+    if RESPONSE_CACHE_SHARED:
+        async with get_conn() as conn:
+            await conn.execute(
+                RESPONSE_CACHE_STORE_SQL,
+                {"user_id": user_id, "key": key, "tag": tag, "kinds": kinds, "body": body},
+            )
+            await conn.commit()
+    return body
+
+
 # ================================
 # SUMMARY (latest measurement per endpoint)
 # ================================
@@ -413,39 +1404,54 @@ class EndpointSummary(BaseModel):
     alert: bool = False
 
 
+# Per-process counters for /metrics: summary rows found in endpoint_status
+# vs. endpoints with no row there (never measured)
+summary_cache = {"hits": 0, "misses": 0}
+
+
 @app.get("/api/endpoints/summary")
-def endpoints_summary(current_user=Depends(get_current_user)):
+async def endpoints_summary(request: Request, current_user=Depends(get_current_user)):
     """
     Returns one row per endpoint (OWNED BY THE CURRENT USER)
     with its latest measurement (if any) and alert flag.
     Perfect for the dashboard main table.
+
+    The latest measurement comes from endpoint_status, which the DB keeps
+    current on every insert into measurements, so history is never read.
+    Conditional: see cached_response.
     """
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
+    return await cached_response(
+        request, current_user["id"], ("endpoints", "measurements"),
+        lambda: build_summary(current_user["id"]),
+    )
+
+
+async def build_summary(user_id: int) -> dict:
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 SELECT
                     e.id,
                     e.name,
                     e.url,
                     e.alert_active AS alert,
-                    m.status AS last_status,
-                    m.latency_ms AS last_latency_ms,
-                    m.observed_at AS last_observed_at
+                    s.endpoint_id IS NOT NULL AS cached,
+                    s.last_status,
+                    s.last_latency_ms,
+                    s.last_observed_at
                 FROM endpoints e
-                LEFT JOIN LATERAL (
-                    SELECT status, latency_ms, observed_at
-                    FROM measurements
-                    WHERE endpoint_id = e.id
-                    ORDER BY observed_at DESC
-                    LIMIT 1
-                ) m ON TRUE
+                LEFT JOIN endpoint_status s ON s.endpoint_id = e.id
                 WHERE e.user_id = %s
                 ORDER BY e.id;
                 """,
-                (current_user["id"],),
+                (user_id,),
             )
-            rows = cur.fetchall()
+            rows = await cur.fetchall()
+
+    hits = sum(1 for row in rows if row["cached"])
+    summary_cache["hits"] += hits
+    summary_cache["misses"] += len(rows) - hits
 
     summaries = [EndpointSummary(**row) for row in rows]
     return {"endpoints": summaries}
@@ -455,185 +1461,877 @@ def endpoints_summary(current_user=Depends(get_current_user)):
 # MANUAL MEASURE (API-triggered)
 # ================================
 
+# A measurement of the endpoint newer than this (by anyone: the worker, a
+# push, another replica) is returned instead of probing again
+MANUAL_MEASURE_FRESH_SECONDS = float(os.getenv("MANUAL_MEASURE_FRESH_SECONDS", "5"))
+
+# Per-user budget of manual probes (per API process; fresh and coalesced
+# answers are free): this many per minute on average, in bursts of up
+# to MANUAL_MEASURE_BURST
+MANUAL_MEASURE_RATE_PER_MINUTE = float(os.getenv("MANUAL_MEASURE_RATE_PER_MINUTE", "30"))
+MANUAL_MEASURE_BURST = int(os.getenv("MANUAL_MEASURE_BURST", "5"))
+
+
+class UserRateLimiter:
+    """
+    One token bucket per user, kept in a bounded LRU like UserCache; a user
+    evicted from it simply starts over with a full bucket.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_size: int = USER_CACHE_MAX_SIZE):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self.stats = {"allowed": 0, "limited": 0}
+
+    def take(self, user_id: int) -> float:
+        """
+        Spend one token. Returns 0 if allowed, otherwise the seconds until
+        the next token.
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        self._buckets[user_id] = (tokens - 1 if allowed else tokens, now)
+        self._buckets.move_to_end(user_id)
+        while len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+
+        if allowed:
+            self.stats["allowed"] += 1
+            return 0.0
+        self.stats["limited"] += 1
+        return (1 - tokens) / self.rate
+
+
+class MeasureFlights:
+    """
+    Single-flight manual probes: concurrent measure calls for the same
+    (url, probe_mode) in this process share one outbound request, and every
+    endpoint stores the shared result once (concurrent calls for the same
+    endpoint get the same row). A flight is forgotten once its probe
+    completes; later calls rely on the freshness window.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.stats = {"probes": 0, "coalesced": 0, "fresh": 0}
+
+    def in_flight(self, url: str, probe_mode: str) -> bool:
+        return (url, probe_mode) in self._flights
+
+    async def measure(self, endpoint_id: int, url: str, probe_mode: str, store):
+        """
+        Probe `url` (or join the flight in progress) and store the result
+        for `endpoint_id` with `await store(endpoint_id, latency_ms, status)`.
+        Returns the stored row.
+        """
+        key = (url, probe_mode)
+        flight = self._flights.get(key)
+        if flight is None:
+            self.stats["probes"] += 1
+            flight = {"probe": asyncio.create_task(probe_url(url, probe_mode)), "stored": {}}
+            self._flights[key] = flight
+            flight["probe"].add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+
+        stored = flight["stored"].get(endpoint_id)
+        if stored is None:
+            stored = asyncio.create_task(self._store(flight["probe"], endpoint_id, store))
+            flight["stored"][endpoint_id] = stored
+        # One caller going away must not cancel the probe for the others
+        return await asyncio.shield(stored)
+
+    @staticmethod
+    async def _store(probe, endpoint_id: int, store):
+        latency_ms, status = await probe
+        return await store(endpoint_id, latency_ms, status)
+
+
+measure_limiter = UserRateLimiter(MANUAL_MEASURE_RATE_PER_MINUTE, MANUAL_MEASURE_BURST)
+measure_flights = MeasureFlights()
+
+
+async def probe_url(url: str, probe_mode: str):
+    """
+    One GET of `url` (without holding a thread). Returns (latency_ms, status).
+    """
+    session = cold_http_session if probe_mode == "cold" else http_session
+    start = time.perf_counter()
+    try:
+        async with session.get(url) as resp:
+            await resp.read()
+        # Same rule as the worker's probes (worker/probe.py): the result is
+        # evaluated against the state built from those
+        return int((time.perf_counter() - start) * 1000), "up" if 200 <= resp.status < 400 else "down"
+    except Exception:
+        return None, "down"
+
+
+async def store_manual_measurement(endpoint_id: int, latency_ms, status: str) -> dict:
+    """
+    Insert the measurement and queue it in probe_inbox, so the owning
+    worker runs it through alert evaluation like its own probes.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                WITH m AS (
+                  INSERT INTO measurements (endpoint_id, latency_ms, status)
+                  VALUES (%s, %s, %s)
+                  RETURNING id, endpoint_id, latency_ms, status, observed_at
+                ), queued AS (
+                  INSERT INTO probe_inbox (endpoint_id, latency_ms, status, observed_at)
+                  SELECT endpoint_id, latency_ms, status, observed_at FROM m
+                )
+                SELECT * FROM m;
+                """,
+                (endpoint_id, latency_ms, status),
+            )
+            row = await cur.fetchone()
+            await cur.execute("SELECT pg_notify('probe_inbox', '');")
+            await conn.commit()
+    return row
+
+
 @app.post("/api/endpoints/{endpoint_id}/measure")
-def manual_measure(
+async def manual_measure(
     endpoint_id: int,
     current_user=Depends(get_current_user),
 ):
     """
     Trigger an immediate measurement for a given endpoint
     owned by the authenticated user.
+
+    Returns the endpoint's latest measurement instead if it is less than
+    MANUAL_MEASURE_FRESH_SECONDS old, joins a probe of the same URL already
+    in flight (see MeasureFlights), and answers 429 past the user's
+    MANUAL_MEASURE_RATE_PER_MINUTE. Only calls that start a probe count
+    against that budget. The result goes through the worker's alert
+    evaluation.
     """
-    # 1) Confirm ownership and get URL
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
+    # 1) Confirm ownership, get URL and any fresh measurement
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
-                SELECT url
-                FROM endpoints
-                WHERE id = %s AND user_id = %s;
+                SELECT e.url, e.probe_mode,
+                       m.id, m.latency_ms, m.status, m.observed_at
+                FROM endpoints e
+                LEFT JOIN LATERAL (
+                  SELECT id, latency_ms, status, observed_at
+                  FROM measurements
+                  WHERE endpoint_id = e.id
+                    AND observed_at > NOW() - make_interval(secs => %s)
+                  ORDER BY observed_at DESC, id DESC
+                  LIMIT 1
+                ) m ON TRUE
+                WHERE e.id = %s AND e.user_id = %s;
                 """,
-                (endpoint_id, current_user["id"]),
+                (MANUAL_MEASURE_FRESH_SECONDS, endpoint_id, current_user["id"]),
             )
-            row = cur.fetchone()
+            row = await cur.fetchone()
 
     if row is None:
         raise HTTPException(status_code=404, detail="Endpoint not found")
 
-    url = row["url"]
-
-    # 2) Perform HTTP request and measure latency
-    start = time.time()
-    try:
-        resp = requests.get(url, timeout=5)
-        latency_ms = int((time.time() - start) * 1000)
-        status = "up" if resp.status_code < 500 else "down"
-    except Exception:
-        latency_ms = None
-        status = "down"
+    if row["id"] is not None:
+        measure_flights.stats["fresh"] += 1
+        return {
+            "id": row["id"],
+            "endpoint_id": endpoint_id,
+            "latency_ms": row["latency_ms"],
+            "status": row["status"],
+            "observed_at": row["observed_at"],
+        }
 
-    # 3) Store measurement in DB
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO measurements (endpoint_id, latency_ms, status)
-                VALUES (%s, %s, %s)
-                RETURNING id, endpoint_id, latency_ms, status, observed_at;
-                """,
-                (endpoint_id, latency_ms, status),
+    # 2) Probe (or join the probe in flight) and store; no await between
+    # the check and measure(), so the flight cannot finish in between
+    if not measure_flights.in_flight(row["url"], row["probe_mode"]):
+        retry_after = measure_limiter.take(current_user["id"])
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many measurements, try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
             )
-            measurement_row = cur.fetchone()
-            conn.commit()
+    return await measure_flights.measure(
+        endpoint_id, row["url"], row["probe_mode"], store_manual_measurement
+    )
+
+
+# ================================
+# RESPONSE FORMATS (history / series content negotiation)
+# ================================
+
+# History and series responses are picked by the Accept header:
+#   application/json (default)           orjson-encoded
+#   application/msgpack                  columnar: parallel arrays, times as
+#                                        t0_ms + dt_ms (epoch ms deltas)
+#   application/vnd.apache.arrow.stream  columnar: one Arrow IPC record
+#                                        batch, metadata in the schema
+# and compressed with zstd or gzip when Accept-Encoding allows it.
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Bodies smaller than this are not worth compressing
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_ZSTD_LEVEL = int(os.getenv("RESPONSE_ZSTD_LEVEL", "3"))
+
+zstd_compressor = zstandard.ZstdCompressor(level=RESPONSE_ZSTD_LEVEL)
 
-    return measurement_row
+
+def accepted(header: Optional[str]) -> list:
+    """
+    Tokens of an Accept / Accept-Encoding header, highest q first
+    (q=0 dropped, ties keep header order).
+    """
+    tokens = []
+    for i, part in enumerate((header or "").split(",")):
+        token, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for p in params:
+            if p.startswith("q="):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    q = 0.0
+        if token and q > 0:
+            tokens.append((-q, i, token.lower()))
+    return [token for _, _, token in sorted(tokens)]
+
+
+def response_format(request: Request) -> str:
+    """'json', 'msgpack' or 'arrow'."""
+    for media_type in accepted(request.headers.get("accept")):
+        if media_type in MSGPACK_MEDIA_TYPES:
+            return "msgpack"
+        if media_type == ARROW_MEDIA_TYPE:
+            return "arrow"
+        if media_type in ("application/json", "application/*", "*/*"):
+            return "json"
+    return "json"
+
+
+def delta_encode(times) -> tuple:
+    """
+    (t0_ms, dt_ms): the first timestamp in epoch milliseconds and the
+    difference of each timestamp to the one before it (dt_ms[0] is 0), so
+    t[i] = t0_ms + sum(dt_ms[:i + 1]). Small deltas pack into 1-2 bytes.
+    """
+    if not times:
+        return None, []
+    ms = [round(t.timestamp() * 1000) for t in times]
+    return ms[0], [0] + [b - a for a, b in zip(ms, ms[1:])]
+
+
+def _arrow_body(meta: dict, time_column: str, columns: dict) -> bytes:
+    import pyarrow as pa
+
+    table = pa.table({
+        name: pa.array(values, pa.timestamp("us", tz="UTC") if name == time_column else None)
+        for name, values in columns.items()
+    })
+    table = table.replace_schema_metadata({"meta": orjson.dumps(meta)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+FORMAT_MEDIA_TYPES = {
+    "json": "application/json",
+    "msgpack": MSGPACK_MEDIA_TYPES[0],
+    "arrow": ARROW_MEDIA_TYPE,
+}
+
+
+def encode_page(fmt: str, json_body, meta: dict, time_column: str, columns) -> bytes:
+    """
+    Encode a history / series page in `fmt` (see response_format).
+    json_body is sent as is for JSON. The binary formats get `meta` plus
+    the parallel arrays returned by columns() (only called for them);
+    time_column holds datetimes.
+    """
+    if fmt == "msgpack":
+        arrays = dict(columns())
+        t0_ms, dt_ms = delta_encode(arrays.pop(time_column))
+        return msgpack.packb(
+            {**meta, "t0_ms": t0_ms, "dt_ms": dt_ms, **arrays},
+            datetime=True,
+        )
+    if fmt == "arrow":
+        return _arrow_body(meta, time_column, columns())
+    return orjson.dumps(json_body)
+
+
+def negotiated_response(request: Request, json_body, meta: dict, time_column: str, columns) -> Response:
+    """
+    A history / series page in the format the client asked for, see
+    encode_page and compressed_response.
+    """
+    fmt = response_format(request)
+    body = encode_page(fmt, json_body, meta, time_column, columns)
+    return compressed_response(request, body, FORMAT_MEDIA_TYPES[fmt])
+
+
+def compressed_response(request: Request, body: bytes, media_type: str, headers: dict = None) -> Response:
+    """
+    Send body with zstd or gzip if Accept-Encoding allows it and it is
+    worth it.
+    """
+    headers = {**(headers or {}), "Vary": "Accept, Accept-Encoding"}
+    if len(body) >= RESPONSE_COMPRESS_MIN_BYTES:
+        for encoding in accepted(request.headers.get("accept-encoding")):
+            if encoding == "zstd":
+                body = zstd_compressor.compress(body)
+            elif encoding == "gzip":
+                body = gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+            else:
+                continue
+            headers["Content-Encoding"] = encoding
+            break
+    return Response(body, media_type=media_type, headers=headers)
 
 
 # ================================
 # HISTORICAL MEASUREMENTS (per endpoint + auth)
 # ================================
 
+# Probe phases the worker records as <phase>_us columns (worker/probe.py)
+PROBE_PHASES = ("dns", "connect", "tls", "ttfb", "total")
+
+# Columns of a history page, in response order
+HISTORY_COLUMNS = (
+    "id", "status", "latency_ms", "observed_at",
+    "dns_us", "connect_us", "tls_us", "ttfb_us", "total_us",
+)
+
+
 @app.get("/api/endpoints/{endpoint_id}/measurements")
-def get_endpoint_measurements(
+async def get_endpoint_measurements(
+    request: Request,
     endpoint_id: int,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=PAGE_MAX_LIMIT),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     current_user=Depends(get_current_user),
 ):
     """
     Returns the last N measurements for a given endpoint,
     but only if it belongs to the authenticated user.
+    Older pages: pass back next_cursor as ?cursor=.
+    Probe phase timings (*_us, see PROBE_PHASES) are null for failed and
+    pushed checks. JSON, MessagePack or Arrow, see negotiated_response.
     """
-    with get_conn() as conn:
-        with conn.cursor() as cur:
+    clauses, params = history_filters("observed_at", since, until, cursor)
+
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
             # Check ownership
-            cur.execute(
+            await cur.execute(
                 "SELECT id FROM endpoints WHERE id = %s AND user_id = %s;",
                 (endpoint_id, current_user["id"]),
             )
-            owned = cur.fetchone()
+            owned = await cur.fetchone()
             if owned is None:
                 raise HTTPException(status_code=404, detail="Endpoint not found")
 
             # Get last measurements
-            cur.execute(
-                """
-                SELECT status, latency_ms, observed_at
+            await cur.execute(
+                f"""
+                SELECT {", ".join(HISTORY_COLUMNS)}
                 FROM measurements
-                WHERE endpoint_id = %s
-                ORDER BY observed_at DESC
+                WHERE {" AND ".join(["endpoint_id = %s", *clauses])}
+                ORDER BY observed_at DESC, id DESC
                 LIMIT %s;
                 """,
-                (endpoint_id, limit),
+                [endpoint_id, *params, limit + 1],
             )
-            rows = cur.fetchall()
+            rows = await cur.fetchall()
+
+    rows, next_cursor = page_of(rows, limit, "observed_at")
+    meta = {"endpoint_id": endpoint_id, "next_cursor": next_cursor}
+    return negotiated_response(
+        request,
+        # JSON rows go out as fetched; orjson writes the timestamps
+        {**meta, "measurements": rows},
+        meta,
+        "observed_at",
+        lambda: {column: [r[column] for r in rows] for column in HISTORY_COLUMNS},
+    )
+
+
+# ================================
+# STATS (UPTIME + LATENCY) FROM ROLLUPS
+# ================================
+
+# /stats reads the measurement_rollups maintained by the DB, picking the
+# coarsest bucket size that still fits the window; rows read are bounded
+# by ~2880 (minute, up to 48h) / ~1440 (hour, up to 60 days) / one per day.
+# Must stay within the worker's ROLLUP_*_RETENTION_DAYS.
+STATS_MINUTE_MAX_HOURS = int(os.getenv("STATS_MINUTE_MAX_HOURS", "48"))
+STATS_HOUR_MAX_HOURS = int(os.getenv("STATS_HOUR_MAX_HOURS", str(60 * 24)))
+# Longest window any route takes as ?hours= (422 beyond); far larger
+# values overflow the window start, in Python and in make_interval
+STATS_MAX_HOURS = int(os.getenv("STATS_MAX_HOURS", str(24 * 365 * 10)))
+
 
+def rollup_resolution(hours: int) -> str:
+    if hours <= STATS_MINUTE_MAX_HOURS:
+        return "minute"
+    if hours <= STATS_HOUR_MAX_HOURS:
+        return "hour"
+    return "day"
+
+
+def window_start(hours: int) -> datetime:
+    """
+    Start of a `hours` window ending now, rounded down to its rollup
+    resolution as the window SQL does.
+    """
+    start = datetime.now(timezone.utc) - timedelta(hours=hours)
+    resolution = rollup_resolution(hours)
+    if resolution == "minute":
+        return start.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return start.replace(minute=0, second=0, microsecond=0)
+    return start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# Percentiles come from the latency sketches kept in each rollup bucket
+# (see init.sql); estimates are within this relative error of the exact value
+SKETCH_RELATIVE_ACCURACY = 0.01
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def quantile_key(q: float) -> str:
+    return f"p{q * 100:g}"
+
+
+# Both queries take a list of endpoint ids (%(ids)s) so the detail bundle
+# can answer many endpoints at once; rows come back per endpoint_id.
+WINDOW_STATS_SQL = """
+SELECT
+  endpoint_id,
+  sum(checks) AS total_checks,
+  sum(up_checks) AS up_checks,
+  sum(latency_sum)::float / NULLIF(sum(latency_count), 0) AS avg_latency_ms,
+  min(latency_min) AS min_latency_ms,
+  max(latency_max) AS max_latency_ms,
+  sum(timing_count) AS timing_count,
+  sum(dns_us_sum)::float / NULLIF(sum(timing_count), 0) AS avg_dns_us,
+  sum(connect_us_sum)::float / NULLIF(sum(timing_count), 0) AS avg_connect_us,
+  sum(tls_us_sum)::float / NULLIF(sum(timing_count), 0) AS avg_tls_us,
+  sum(ttfb_us_sum)::float / NULLIF(sum(timing_count), 0) AS avg_ttfb_us,
+  sum(total_us_sum)::float / NULLIF(sum(timing_count), 0) AS avg_total_us
+FROM measurement_rollups
+WHERE endpoint_id = ANY(%(ids)s::int[])
+  AND resolution = %(resolution)s
+  AND bucket_start >= date_trunc(
+        %(resolution)s, NOW() - make_interval(hours => %(hours)s), 'UTC'
+      )
+GROUP BY endpoint_id;
+"""
+
+# Merge the latency sketches of the window's buckets and read each
+# quantile off the cumulative bin counts. A bin's representative value
+# can sit up to 1% past the latencies in it, so quantiles are clamped to
+# the window's exact min / max (p100 is never above max_latency_ms).
+WINDOW_PERCENTILES_SQL = """
+WITH win AS (
+  SELECT endpoint_id, latency_min, latency_max, latency_sketch
+  FROM measurement_rollups
+  WHERE endpoint_id = ANY(%(ids)s::int[])
+    AND resolution = %(resolution)s
+    AND bucket_start >= date_trunc(
+          %(resolution)s, NOW() - make_interval(hours => %(hours)s), 'UTC'
+        )
+),
+bounds AS (
+  SELECT endpoint_id, min(latency_min) AS lo, max(latency_max) AS hi
+  FROM win
+  GROUP BY 1
+),
+bins AS (
+  SELECT w.endpoint_id, b.key::int AS bin, sum(b.value::bigint) AS n
+  FROM win w
+  CROSS JOIN jsonb_each_text(w.latency_sketch) AS b
+  GROUP BY 1, 2
+),
+cum AS (
+  SELECT
+    endpoint_id,
+    bin,
+    sum(n) OVER (PARTITION BY endpoint_id ORDER BY bin) AS running,
+    sum(n) OVER (PARTITION BY endpoint_id) AS total
+  FROM bins
+)
+SELECT
+  q.endpoint_id,
+  q.q,
+  LEAST(GREATEST(q.value, bd.lo), bd.hi) AS value
+FROM (
+  SELECT c.endpoint_id, q.q, latency_sketch_value(min(c.bin)) AS value
+  FROM cum c
+  CROSS JOIN unnest(%(quantiles)s::float8[]) AS q(q)
+  WHERE c.running > q.q * (c.total - 1)
+  GROUP BY 1, 2
+) q
+JOIN bounds bd USING (endpoint_id);
+"""
+
+
+def window_params(endpoint_ids, hours: int, quantiles=DEFAULT_QUANTILES) -> dict:
     return {
-        "endpoint_id": endpoint_id,
-        "measurements": [
-            {
-                "status": r["status"],
-                "latency_ms": r["latency_ms"],
-                "observed_at": r["observed_at"].isoformat() if r["observed_at"] else None,
-            }
-            for r in rows
-        ],
+        "ids": list(endpoint_ids),
+        "resolution": rollup_resolution(hours),
+        "hours": hours,
+        "quantiles": list(quantiles),
     }
 
 
-# ================================
-# 24-HOUR STATS (UPTIME + AVG LATENCY)
-# ================================
+def percentiles_by_endpoint(rows, endpoint_ids, quantiles) -> dict:
+    """
+    {endpoint_id: {"p50": ms, ...}} from WINDOW_PERCENTILES_SQL rows;
+    None where the window has no latency.
+    """
+    result = {
+        ep_id: {quantile_key(q): None for q in quantiles}
+        for ep_id in endpoint_ids
+    }
+    for r in rows:
+        result[r["endpoint_id"]][quantile_key(r["q"])] = round(r["value"], 1)
+    return result
+
+
+def avg_phases_ms(row) -> Optional[dict]:
+    """
+    Mean of each probe phase in ms (sub-millisecond precision) over the
+    checks that had a timing breakdown; None if there were none.
+    """
+    if not row or not row["timing_count"]:
+        return None
+    return {phase: round(row[f"avg_{phase}_us"] / 1000, 3) for phase in PROBE_PHASES}
+
+
+def stats_payload(endpoint_id: int, hours: int, row, percentiles: dict) -> dict:
+    total_checks = row["total_checks"] if row else 0
+    avg_latency = row["avg_latency_ms"] if row else None
+    return {
+        "endpoint_id": endpoint_id,
+        "uptime_percent": round(row["up_checks"] * 100 / total_checks, 1) if total_checks else None,
+        "avg_latency_ms": round(avg_latency, 1) if avg_latency is not None else None,
+        "min_latency_ms": row["min_latency_ms"] if row else None,
+        "max_latency_ms": row["max_latency_ms"] if row else None,
+        "p50_latency_ms": percentiles["p50"],
+        "p95_latency_ms": percentiles["p95"],
+        "p99_latency_ms": percentiles["p99"],
+        "avg_phase_ms": avg_phases_ms(row),
+        "timed_checks": row["timing_count"] if row else 0,
+        "total_checks": total_checks,
+        "window_hours": hours,
+        "resolution": rollup_resolution(hours),
+    }
+
 
 @app.get("/api/endpoints/{endpoint_id}/stats")
-def get_endpoint_stats(
+async def get_endpoint_stats(
+    request: Request,
     endpoint_id: int,
-    hours: int = 24,
+    hours: int = Query(24, ge=1, le=STATS_MAX_HOURS),
     current_user=Depends(get_current_user),
 ):
     """
-    Compute uptime % and average latency over a time window (default 24h)
-    for a given endpoint owned by the current user.
+    Compute uptime % and latency (avg / min / max / p50 / p95 / p99) over
+    a time window (default 24h) for a given endpoint owned by the current
+    user, plus the mean of each probe phase (dns / connect / tls / ttfb /
+    total) over the checks that recorded one.
+    The window start is rounded down to the rollup resolution used.
+    Conditional: see cached_response.
     """
-    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    params = window_params([endpoint_id], hours)
+
+    async def build():
+        async with get_conn() as conn:
+            async with conn.cursor() as cur:
+                # Check ownership
+                await cur.execute(
+                    "SELECT id FROM endpoints WHERE id = %s AND user_id = %s;",
+                    (endpoint_id, current_user["id"]),
+                )
+                owned = await cur.fetchone()
+                if owned is None:
+                    raise HTTPException(status_code=404, detail="Endpoint not found")
 
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            # Check ownership
-            cur.execute(
+                # Merge the buckets within the window
+                await cur.execute(WINDOW_STATS_SQL, params)
+                row = await cur.fetchone()
+
+                await cur.execute(WINDOW_PERCENTILES_SQL, params)
+                percentiles = percentiles_by_endpoint(
+                    await cur.fetchall(), [endpoint_id], DEFAULT_QUANTILES
+                )
+
+        return stats_payload(endpoint_id, hours, row, percentiles[endpoint_id])
+
+    # The window slides with the clock, so its (rounded) start is part of
+    # the cache key as well
+    return await cached_response(
+        request, current_user["id"], ("endpoints", "measurements"), build,
+        extra=(window_start(hours).isoformat(),),
+    )
+
+
+@app.get("/api/endpoints/{endpoint_id}/percentiles")
+async def get_endpoint_percentiles(
+    endpoint_id: int,
+    hours: int = Query(24, ge=1, le=STATS_MAX_HOURS),
+    q: list[float] = Query(list(DEFAULT_QUANTILES)),
+    current_user=Depends(get_current_user),
+):
+    """
+    Latency percentiles over a time window for an endpoint owned by the
+    current user. Pass ?q=0.5&q=0.999 for other quantiles (0 <= q <= 1).
+    """
+    if any(not 0 <= x <= 1 for x in q):
+        raise HTTPException(status_code=400, detail="q must be between 0 and 1")
+    resolution = rollup_resolution(hours)
+
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 "SELECT id FROM endpoints WHERE id = %s AND user_id = %s;",
                 (endpoint_id, current_user["id"]),
             )
-            owned = cur.fetchone()
-            if owned is None:
+            if await cur.fetchone() is None:
                 raise HTTPException(status_code=404, detail="Endpoint not found")
 
-            # Get measurements within window
-            cur.execute(
-                """
-                SELECT status, latency_ms, observed_at
-                FROM measurements
-                WHERE endpoint_id = %s
-                  AND observed_at >= %s
-                ORDER BY observed_at DESC;
-                """,
-                (endpoint_id, cutoff),
-            )
-            rows = cur.fetchall()
+            await cur.execute(WINDOW_PERCENTILES_SQL, window_params([endpoint_id], hours, q))
+            percentiles = percentiles_by_endpoint(await cur.fetchall(), [endpoint_id], q)
 
-    if not rows:
-        return {
-            "endpoint_id": endpoint_id,
-            "uptime_percent": None,
-            "avg_latency_ms": None,
-            "total_checks": 0,
-            "window_hours": hours,
-        }
+    return {
+        "endpoint_id": endpoint_id,
+        "percentiles": percentiles[endpoint_id],
+        "relative_accuracy": SKETCH_RELATIVE_ACCURACY,
+        "window_hours": hours,
+        "resolution": resolution,
+    }
 
-    total_checks = len(rows)
-    up_count = sum(
-        1 for r in rows
-        if (r["status"] or "").lower() == "up"
-    )
 
-    latencies = [r["latency_ms"] for r in rows if r["latency_ms"] is not None]
-    avg_latency = sum(latencies) / len(latencies) if latencies else None
+# ================================
+# TIME SERIES (downsampled for charts)
+# ================================
+
+# A chart asks for a time range and a point count; the range is cut into
+# that many equal buckets (aligned to SERIES_ORIGIN, so refreshes land on
+# the same buckets) with min / max / avg latency and uptime each. Buckets
+# are merged from the coarsest rollup resolution that fits in one, so a
+# 30-day chart reads about as many rows as a 1-hour one; only buckets
+# under a minute fall back to raw measurements (short ranges).
+SERIES_MAX_POINTS = int(os.getenv("SERIES_MAX_POINTS", "2000"))
+SERIES_ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+# Coarsest first, with how far back they are kept (see rollup_resolution)
+SERIES_RESOLUTIONS = (
+    ("day", 86400, None),
+    ("hour", 3600, STATS_HOUR_MAX_HOURS),
+    ("minute", 60, STATS_MINUTE_MAX_HOURS),
+)
 
-    return {
+# Both queries return SERIES_COLUMNS, one row per non-empty bucket
+SERIES_COLUMNS = (
+    "t", "avg_latency_ms", "min_latency_ms", "max_latency_ms", "uptime_percent", "checks",
+)
+
+SERIES_ROLLUP_SQL = """
+SELECT
+  date_bin(make_interval(secs => %(step)s), bucket_start, %(origin)s) AS t,
+  round(sum(latency_sum)::numeric / NULLIF(sum(latency_count), 0), 1)::float AS avg_latency_ms,
+  min(latency_min) AS min_latency_ms,
+  max(latency_max) AS max_latency_ms,
+  round(sum(up_checks) * 100.0 / sum(checks), 1)::float AS uptime_percent,
+  sum(checks) AS checks
+FROM measurement_rollups
+WHERE endpoint_id = %(endpoint_id)s
+  AND resolution = %(resolution)s
+  AND bucket_start >= date_bin(make_interval(secs => %(step)s), %(from)s, %(origin)s)
+  AND bucket_start < %(to)s
+GROUP BY 1
+ORDER BY 1;
+"""
+
+SERIES_RAW_SQL = """
+SELECT
+  date_bin(make_interval(secs => %(step)s), observed_at, %(origin)s) AS t,
+  round(avg(latency_ms), 1)::float AS avg_latency_ms,
+  min(latency_ms) AS min_latency_ms,
+  max(latency_ms) AS max_latency_ms,
+  round(count(*) FILTER (WHERE status = 'up') * 100.0 / count(*), 1)::float AS uptime_percent,
+  count(*) AS checks
+FROM measurements
+WHERE endpoint_id = %(endpoint_id)s
+  AND observed_at >= date_bin(make_interval(secs => %(step)s), %(from)s, %(origin)s)
+  AND observed_at < %(to)s
+GROUP BY 1
+ORDER BY 1;
+"""
+
+
+def series_source(start: datetime, end: datetime, points: int):
+    """
+    (resolution, step_seconds) for a chart of `points` buckets over
+    [start, end). resolution is a rollup resolution or "raw"; the step is
+    a whole multiple of it so every rollup bucket falls in one chart
+    bucket. Resolutions no longer kept for `start` are skipped, at the
+    cost of fewer, wider buckets.
+    """
+    step = max(1, math.ceil((end - start).total_seconds() / points))
+    age_hours = (datetime.now(timezone.utc) - start).total_seconds() / 3600
+
+    kept = [
+        (resolution, size)
+        for resolution, size, max_hours in SERIES_RESOLUTIONS
+        if max_hours is None or age_hours <= max_hours
+    ]
+    for resolution, size in kept:
+        if size <= step:
+            return resolution, math.ceil(step / size) * size
+    if step < 60:
+        return "raw", step
+    resolution, size = kept[-1]
+    return resolution, size
+
+
+@app.get("/api/endpoints/{endpoint_id}/series")
+async def get_endpoint_series(
+    request: Request,
+    endpoint_id: int,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    points: int = Query(200, ge=1, le=SERIES_MAX_POINTS),
+    current_user=Depends(get_current_user),
+):
+    """
+    Latency / uptime series of an endpoint owned by the current user,
+    downsampled to at most `points` buckets between from and to (default:
+    the last 24h). Columnar: one list per field, empty buckets left out.
+    JSON, MessagePack or Arrow, see negotiated_response.
+    """
+    # Naive timestamps are taken as UTC
+    end = to or datetime.now(timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    start = from_ or end - timedelta(hours=24)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="from must be before to")
+
+    resolution, step = series_source(start, end, points)
+    params = {
         "endpoint_id": endpoint_id,
-        "uptime_percent": round(up_count * 100 / total_checks, 1),
-        "avg_latency_ms": round(avg_latency, 1) if avg_latency is not None else None,
-        "total_checks": total_checks,
-        "window_hours": hours,
+        "resolution": resolution,
+        "step": step,
+        "origin": SERIES_ORIGIN,
+        "from": start,
+        "to": end,
     }
 
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT id FROM endpoints WHERE id = %s AND user_id = %s;",
+                (endpoint_id, current_user["id"]),
+            )
+            if await cur.fetchone() is None:
+                raise HTTPException(status_code=404, detail="Endpoint not found")
+
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(SERIES_RAW_SQL if resolution == "raw" else SERIES_ROLLUP_SQL, params)
+            rows = await cur.fetchall()
+
+    meta = {
+        "endpoint_id": endpoint_id,
+        "from": start,
+        "to": end,
+        "step_seconds": step,
+        "resolution": resolution,
+    }
+    columns = dict(zip(SERIES_COLUMNS, map(list, zip(*rows)))) or {c: [] for c in SERIES_COLUMNS}
+    return negotiated_response(request, {**meta, **columns}, meta, "t", lambda: columns)
+
 
 # ================================
 # ALERT CONFIG + ALERT HISTORY
 # ================================
 
+# Window sizes the worker keeps state for. The worker reads the same
+# settings (worker/alerts.py) and logs any rule it has to clamp to its own
+FAILURE_RATE_MAX_WINDOW_CHECKS = int(os.getenv("FAILURE_RATE_MAX_WINDOW_CHECKS", "100"))
+LATENCY_PERCENTILE_MAX_WINDOW_MINUTES = int(os.getenv("LATENCY_PERCENTILE_MAX_WINDOW_MINUTES", "1440"))
+# A percentile window must fit in the worker's per-endpoint latency ring
+# (LATENCY_WINDOW_MAX_SAMPLES) at the endpoint's check interval, or the
+# worker's default one (POLL_INTERVAL_SECONDS)
+LATENCY_WINDOW_MAX_SAMPLES = int(os.getenv("LATENCY_WINDOW_MAX_SAMPLES", "256"))
+POLL_INTERVAL_SECONDS = int(os.getenv("POLL_INTERVAL_SECONDS", "60"))
+
+
+def percentile_window_error(window_minutes, check_interval_seconds) -> Optional[str]:
+    """Why a latency percentile window does not fit, or None if it does."""
+    if window_minutes is None:
+        return None
+    interval = check_interval_seconds or POLL_INTERVAL_SECONDS
+    samples = math.ceil(window_minutes * 60 / interval)
+    if samples <= LATENCY_WINDOW_MAX_SAMPLES:
+        return None
+    return (
+        f"a {window_minutes} min latency percentile window at a {interval} s check "
+        f"interval needs {samples} samples; at most {LATENCY_WINDOW_MAX_SAMPLES} are kept"
+    )
+
+# Sliding-window rules: all columns of a rule are set or cleared together
+ALERT_RULE_FIELDS = {
+    "failure_rate": ("failure_rate_threshold_pct", "failure_rate_window_checks"),
+    "latency_percentile": (
+        "latency_percentile",
+        "latency_percentile_window_minutes",
+        "latency_percentile_threshold_ms",
+    ),
+}
+
+ALERT_CONFIG_COLUMNS = """
+    latency_threshold_ms,
+    consecutive_fail_threshold,
+    failure_rate_threshold_pct,
+    failure_rate_window_checks,
+    latency_percentile,
+    latency_percentile_window_minutes,
+    latency_percentile_threshold_ms,
+    consecutive_failures,
+    alert_active,
+    last_alert_at
+"""
+
+
 class AlertConfig(BaseModel):
     latency_threshold_ms: int
     consecutive_fail_threshold: int
+    # "alert when >= threshold_pct % of the last window_checks checks failed"
+    failure_rate_threshold_pct: Optional[int] = Field(None, ge=1, le=100)
+    failure_rate_window_checks: Optional[int] = Field(None, ge=2, le=FAILURE_RATE_MAX_WINDOW_CHECKS)
+    # "alert when the p<percentile> latency of the last window_minutes > threshold_ms"
+    latency_percentile: Optional[float] = Field(None, gt=0, lt=100)
+    latency_percentile_window_minutes: Optional[int] = Field(
+        None, ge=1, le=LATENCY_PERCENTILE_MAX_WINDOW_MINUTES
+    )
+    latency_percentile_threshold_ms: Optional[int] = Field(None, ge=0)
 
 
 class AlertConfigOut(AlertConfig):
@@ -643,80 +2341,103 @@ class AlertConfigOut(AlertConfig):
 
 
 @app.get("/api/endpoints/{endpoint_id}/alert-config", response_model=AlertConfigOut)
-def get_alert_config(
+async def get_alert_config(
+    request: Request,
     endpoint_id: int,
     current_user=Depends(get_current_user),
 ):
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    latency_threshold_ms,
-                    consecutive_fail_threshold,
-                    consecutive_failures,
-                    alert_active,
-                    last_alert_at
-                FROM endpoints
-                WHERE id = %s AND user_id = %s;
-                """,
-                (endpoint_id, current_user["id"]),
-            )
-            row = cur.fetchone()
+    """
+    Conditional: see cached_response.
+    """
+    async def build():
+        async with get_conn() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    f"""
+                    SELECT {ALERT_CONFIG_COLUMNS}
+                    FROM endpoints
+                    WHERE id = %s AND user_id = %s;
+                    """,
+                    (endpoint_id, current_user["id"]),
+                )
+                row = await cur.fetchone()
 
-    if row is None:
-        raise HTTPException(status_code=404, detail="Endpoint not found")
+        if row is None:
+            raise HTTPException(status_code=404, detail="Endpoint not found")
 
-    return {
-        "latency_threshold_ms": row["latency_threshold_ms"],
-        "consecutive_fail_threshold": row["consecutive_fail_threshold"],
-        "consecutive_failures": row["consecutive_failures"],
-        "alert_active": row["alert_active"],
-        "last_alert_at": row["last_alert_at"],
-    }
+        return AlertConfigOut(**row)
+
+    return await cached_response(request, current_user["id"], ("endpoints",), build)
 
 
 @app.put("/api/endpoints/{endpoint_id}/alert-config", response_model=AlertConfigOut)
-def update_alert_config(
+async def update_alert_config(
     endpoint_id: int,
     cfg: AlertConfig,
     current_user=Depends(get_current_user),
 ):
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
+    """
+    Window rules are only touched when their fields are sent, so clients
+    that only know the two threshold fields keep working. Send all fields
+    of a rule to set it, or all of them as null to turn it off.
+    """
+    columns = ["latency_threshold_ms", "consecutive_fail_threshold"]
+    for rule, fields in ALERT_RULE_FIELDS.items():
+        sent = [f for f in fields if f in cfg.model_fields_set]
+        if not sent:
+            continue
+        values = [getattr(cfg, f) for f in fields]
+        if len(sent) != len(fields) or (None in values and any(v is not None for v in values)):
+            raise HTTPException(
+                status_code=400,
+                detail=f"{rule} rule needs all of {', '.join(fields)} (or all null)",
+            )
+        columns.extend(fields)
+
+    assignments = ", ".join(f"{c} = %({c})s" for c in columns)
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            if "latency_percentile_window_minutes" in columns:
+                # Locked so the interval cannot change under the check
+                await cur.execute(
+                    """
+                    SELECT check_interval_seconds FROM endpoints
+                    WHERE id = %s AND user_id = %s
+                    FOR UPDATE;
+                    """,
+                    (endpoint_id, current_user["id"]),
+                )
+                current = await cur.fetchone()
+                if current is None:
+                    raise HTTPException(status_code=404, detail="Endpoint not found")
+                error = percentile_window_error(
+                    cfg.latency_percentile_window_minutes, current["check_interval_seconds"]
+                )
+                if error:
+                    raise HTTPException(status_code=422, detail=error)
+
+            await cur.execute(
+                f"""
                 UPDATE endpoints
-                SET latency_threshold_ms = %s,
-                    consecutive_fail_threshold = %s
-                WHERE id = %s AND user_id = %s
-                RETURNING
-                    latency_threshold_ms,
-                    consecutive_fail_threshold,
-                    consecutive_failures,
-                    alert_active,
-                    last_alert_at;
+                SET {assignments}
+                WHERE id = %(id)s AND user_id = %(user_id)s
+                RETURNING {ALERT_CONFIG_COLUMNS};
                 """,
-                (
-                    cfg.latency_threshold_ms,
-                    cfg.consecutive_fail_threshold,
-                    endpoint_id,
-                    current_user["id"],
-                ),
+                {
+                    **{c: getattr(cfg, c) for c in columns},
+                    "id": endpoint_id,
+                    "user_id": current_user["id"],
+                },
             )
-            row = cur.fetchone()
-            conn.commit()
+            row = await cur.fetchone()
+            if row is not None:
+                await notify_endpoint_change(cur, endpoint_id)
+            await conn.commit()
 
     if row is None:
         raise HTTPException(status_code=404, detail="Endpoint not found")
 
-    return {
-        "latency_threshold_ms": row["latency_threshold_ms"],
-        "consecutive_fail_threshold": row["consecutive_fail_threshold"],
-        "consecutive_failures": row["consecutive_failures"],
-        "alert_active": row["alert_active"],
-        "last_alert_at": row["last_alert_at"],
-    }
+    return row
 
 
 class AlertOut(BaseModel):
@@ -728,37 +2449,193 @@ class AlertOut(BaseModel):
     created_at: datetime
 
 
+# Columns of an alert history page in the columnar formats (the endpoint
+# id is in the metadata)
+ALERT_COLUMNS = ("id", "type", "message", "value", "created_at")
+
+
 @app.get("/api/endpoints/{endpoint_id}/alerts")
-def get_endpoint_alerts(
+async def get_endpoint_alerts(
+    request: Request,
     endpoint_id: int,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=PAGE_MAX_LIMIT),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     current_user=Depends(get_current_user),
 ):
     """
     Returns the most recent alert events for a given endpoint.
+    Older pages: pass back next_cursor as ?cursor=.
+    JSON, MessagePack or Arrow, see negotiated_response; conditional, see
+    cached_response.
     """
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            # Check ownership
-            cur.execute(
-                "SELECT id FROM endpoints WHERE id = %s AND user_id = %s;",
-                (endpoint_id, current_user["id"]),
-            )
-            owned = cur.fetchone()
-            if owned is None:
-                raise HTTPException(status_code=404, detail="Endpoint not found")
+    clauses, params = history_filters("created_at", since, until, cursor)
+
+    async def build():
+        async with get_conn() as conn:
+            async with conn.cursor() as cur:
+                # Check ownership
+                await cur.execute(
+                    "SELECT id FROM endpoints WHERE id = %s AND user_id = %s;",
+                    (endpoint_id, current_user["id"]),
+                )
+                owned = await cur.fetchone()
+                if owned is None:
+                    raise HTTPException(status_code=404, detail="Endpoint not found")
+
+                # Get alerts
+                await cur.execute(
+                    f"""
+                    SELECT id, endpoint_id, type, message, value, created_at
+                    FROM alerts
+                    WHERE {" AND ".join(["endpoint_id = %s", *clauses])}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT %s;
+                    """,
+                    [endpoint_id, *params, limit + 1],
+                )
+                rows = await cur.fetchall()
+
+        rows, next_cursor = page_of(rows, limit, "created_at")
+        return {"endpoint_id": endpoint_id, "alerts": rows, "next_cursor": next_cursor}
+
+    def encode(page, fmt):
+        meta = {"endpoint_id": endpoint_id, "next_cursor": page["next_cursor"]}
+        return encode_page(
+            fmt, page, meta, "created_at",
+            lambda: {column: [r[column] for r in page["alerts"]] for column in ALERT_COLUMNS},
+        )
+
+    return await cached_response(
+        request, current_user["id"], ("alerts", "endpoints"), build, encode=encode
+    )
 
-            # Get alerts
-            cur.execute(
+
+# ================================
+# DETAIL BUNDLE (dashboard detail view in one round trip)
+# ================================
+
+# Most endpoints a single bundle request may ask for
+BUNDLE_MAX_ENDPOINTS = int(os.getenv("BUNDLE_MAX_ENDPOINTS", "50"))
+
+
+@app.get("/api/endpoints/details")
+async def get_endpoint_details(
+    ids: list[int] = Query(...),
+    hours: int = Query(24, ge=1, le=STATS_MAX_HOURS),
+    measurements_limit: int = Query(50, ge=0, le=PAGE_MAX_LIMIT),
+    alerts_limit: int = Query(50, ge=0, le=PAGE_MAX_LIMIT),
+    current_user=Depends(get_current_user),
+):
+    """
+    Everything the detail view needs for one or more endpoints
+    (?ids=1&ids=2...): the last measurements, the window stats, the alert
+    config and the last alerts, as the per-endpoint routes return them;
+    measurements_next_cursor / alerts_next_cursor continue each list on
+    /api/endpoints/{id}/measurements and /api/endpoints/{id}/alerts.
+
+    Runs on one connection: ownership is checked once for all ids (that
+    query also yields the alert config), then the four remaining queries
+    are pipelined. Ids that are not the user's are listed in not_found.
+    """
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BUNDLE_MAX_ENDPOINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"at most {BUNDLE_MAX_ENDPOINTS} endpoints per request",
+        )
+
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"""
+                SELECT id, {ALERT_CONFIG_COLUMNS}
+                FROM endpoints
+                WHERE id = ANY(%s::int[]) AND user_id = %s;
+                """,
+                (ids, current_user["id"]),
+            )
+            configs = {row.pop("id"): row for row in await cur.fetchall()}
+
+        owned = [ep_id for ep_id in ids if ep_id in configs]
+        if not owned:
+            raise HTTPException(status_code=404, detail="Endpoint not found")
+
+        params = window_params(owned, hours)
+        # One extra row per endpoint tells whether the list goes on (see
+        # page_of); a zero limit asks for no rows and no cursor
+        measurements_fetch = measurements_limit + 1 if measurements_limit else 0
+        alerts_fetch = alerts_limit + 1 if alerts_limit else 0
+        async with conn.pipeline():
+            measurements_cur = conn.cursor()
+            stats_cur = conn.cursor()
+            percentiles_cur = conn.cursor()
+            alerts_cur = conn.cursor()
+
+            await measurements_cur.execute(
+                f"""
+                SELECT e.id AS endpoint_id, {", ".join("m." + c for c in HISTORY_COLUMNS)}
+                FROM unnest(%s::int[]) AS e(id)
+                CROSS JOIN LATERAL (
+                    SELECT {", ".join(HISTORY_COLUMNS)}
+                    FROM measurements
+                    WHERE endpoint_id = e.id
+                    ORDER BY observed_at DESC, id DESC
+                    LIMIT %s
+                ) m;
+                """,
+                (owned, measurements_fetch),
+            )
+            await stats_cur.execute(WINDOW_STATS_SQL, params)
+            await percentiles_cur.execute(WINDOW_PERCENTILES_SQL, params)
+            await alerts_cur.execute(
                 """
-                SELECT id, endpoint_id, type, message, value, created_at
-                FROM alerts
-                WHERE endpoint_id = %s
-                ORDER BY created_at DESC
-                LIMIT %s;
+                SELECT a.id, a.endpoint_id, a.type, a.message, a.value, a.created_at
+                FROM unnest(%s::int[]) AS e(id)
+                CROSS JOIN LATERAL (
+                    SELECT id, endpoint_id, type, message, value, created_at
+                    FROM alerts
+                    WHERE endpoint_id = e.id
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT %s
+                ) a;
                 """,
-                (endpoint_id, limit),
+                (owned, alerts_fetch),
             )
-            rows = cur.fetchall()
 
-    return {"endpoint_id": endpoint_id, "alerts": rows}
+            measurement_rows = await measurements_cur.fetchall()
+            stats_rows = {r["endpoint_id"]: r for r in await stats_cur.fetchall()}
+            percentiles = percentiles_by_endpoint(
+                await percentiles_cur.fetchall(), owned, DEFAULT_QUANTILES
+            )
+            alert_rows = await alerts_cur.fetchall()
+
+    bundles = {
+        ep_id: {
+            "endpoint_id": ep_id,
+            "measurements": [],
+            "measurements_next_cursor": None,
+            "stats": stats_payload(ep_id, hours, stats_rows.get(ep_id), percentiles[ep_id]),
+            "alert_config": configs[ep_id],
+            "alerts": [],
+            "alerts_next_cursor": None,
+        }
+        for ep_id in owned
+    }
+    for r in measurement_rows:
+        bundles[r.pop("endpoint_id")]["measurements"].append(r)
+    for r in alert_rows:
+        bundles[r["endpoint_id"]]["alerts"].append(r)
+    for bundle in bundles.values():
+        bundle["measurements"], bundle["measurements_next_cursor"] = page_of(
+            bundle["measurements"], measurements_limit, "observed_at"
+        )
+        bundle["alerts"], bundle["alerts_next_cursor"] = page_of(
+            bundle["alerts"], alerts_limit, "created_at"
+        )
+
+    return {
+        "endpoints": list(bundles.values()),
+        "not_found": [ep_id for ep_id in ids if ep_id not in configs],
+    }
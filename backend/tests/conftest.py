@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Run from backend/ as uvicorn does (app.main); no database is needed to
+# import it, the pool only opens at startup
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
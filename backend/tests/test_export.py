@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app import main
+
+USER = {"id": 1, "email": "a@example.com"}
+
+
+async def _start_export():
+    return await main.export_measurements(
+        format="csv", endpoint_id=None, since=None, until=None, current_user=USER
+    )
+
+
+def test_export_over_the_cap_is_a_429_until_a_slot_is_released(monkeypatch):
+    async def fake_csv(query, params):
+        yield b"id\n"
+
+    monkeypatch.setattr(main, "_export_csv", fake_csv)
+
+    async def run():
+        monkeypatch.setattr(main, "export_slots", asyncio.Semaphore(2))
+        # Neither response has started streaming yet; both hold their slot
+        first, second = await _start_export(), await _start_export()
+        with pytest.raises(HTTPException) as e:
+            await _start_export()
+        assert e.value.status_code == 429
+
+        # Finishing the body frees the slot; the background task that
+        # follows must not free a second one
+        assert [chunk async for chunk in first.body_iterator] == [b"id\n"]
+        await first.background()
+        third = await _start_export()
+        with pytest.raises(HTTPException):
+            await _start_export()
+
+        # A response whose body never started frees its slot too
+        await second.background()
+        await third.background()
+        assert main.export_slots._value == 2
+
+    asyncio.run(run())
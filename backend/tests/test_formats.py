@@ -0,0 +1,127 @@
+import gzip
+from datetime import datetime, timedelta, timezone
+
+import msgpack
+import orjson
+import pyarrow as pa
+import pytest
+import zstandard
+from fastapi import Request
+
+from app import main
+from app.main import HISTORY_COLUMNS, accepted, compressed_response, negotiated_response, response_format
+
+T0 = datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+
+
+def request(accept=None, accept_encoding=None) -> Request:
+    headers = [(b"accept", accept), (b"accept-encoding", accept_encoding)]
+    return Request({"type": "http", "headers": [(k, v.encode()) for k, v in headers if v is not None]})
+
+
+def history_page(n=40):
+    rows = [
+        {
+            "id": 1000 - i,
+            "status": "down" if i % 7 == 0 else "up",
+            "latency_ms": None if i % 7 == 0 else 20 + i,
+            "observed_at": T0 - timedelta(seconds=30 * i, milliseconds=i),
+            "dns_us": None, "connect_us": 900 + i, "tls_us": None, "ttfb_us": 5000, "total_us": 6000 + i,
+        }
+        for i in range(n)
+    ]
+    meta = {"endpoint_id": 3, "next_cursor": "abc"}
+    return rows, meta
+
+
+def respond(req, rows, meta):
+    return negotiated_response(
+        req,
+        {**meta, "measurements": rows},
+        meta,
+        "observed_at",
+        lambda: {column: [r[column] for r in rows] for column in HISTORY_COLUMNS},
+    )
+
+
+def test_accepted_orders_by_q_and_drops_q_zero():
+    assert accepted("gzip;q=0.5, zstd, br;q=0, deflate;q=0.5") == ["zstd", "gzip", "deflate"]
+    assert accepted("text/html;q=bogus, Application/JSON") == ["application/json"]
+    assert accepted(None) == []
+
+
+@pytest.mark.parametrize(
+    "accept, fmt",
+    [
+        (None, "json"),
+        ("text/html", "json"),
+        ("application/json, application/msgpack;q=0.9", "json"),
+        ("application/json;q=0.5, application/x-msgpack", "msgpack"),
+        ("*/*;q=0.1, application/vnd.apache.arrow.stream", "arrow"),
+        ("application/vnd.apache.arrow.stream;q=0, */*", "json"),
+    ],
+)
+def test_response_format_follows_accept_q_values(accept, fmt):
+    assert response_format(request(accept)) == fmt
+
+
+def test_msgpack_page_decodes_to_the_json_page():
+    rows, meta = history_page()
+    as_json = orjson.loads(respond(request(), rows, meta).body)
+    response = respond(request("application/msgpack"), rows, meta)
+    assert response.media_type == "application/msgpack"
+    packed = msgpack.unpackb(response.body)
+
+    t, times = packed.pop("t0_ms"), []
+    for dt in packed.pop("dt_ms"):
+        t += dt
+        times.append(datetime.fromtimestamp(t / 1000, timezone.utc))
+    assert packed["endpoint_id"] == 3 and packed["next_cursor"] == "abc"
+    assert times == [datetime.fromisoformat(r["observed_at"]) for r in as_json["measurements"]]
+    for column in HISTORY_COLUMNS:
+        if column != "observed_at":
+            assert packed[column] == [r[column] for r in as_json["measurements"]]
+
+    empty = msgpack.unpackb(respond(request("application/msgpack"), [], meta).body)
+    assert empty["t0_ms"] is None and empty["dt_ms"] == []
+
+
+def test_arrow_page_decodes_to_the_json_page_with_meta_in_the_schema():
+    rows, meta = history_page()
+    as_json = orjson.loads(respond(request(), rows, meta).body)
+    response = respond(request("application/vnd.apache.arrow.stream"), rows, meta)
+    table = pa.ipc.open_stream(response.body).read_all()
+
+    assert orjson.loads(table.schema.metadata[b"meta"]) == meta
+    assert table.schema.field("observed_at").type == pa.timestamp("us", tz="UTC")
+    decoded = table.to_pylist()
+    for row in decoded:
+        row["observed_at"] = row["observed_at"].isoformat()
+    assert decoded == [
+        {**r, "observed_at": datetime.fromisoformat(r["observed_at"]).isoformat()}
+        for r in as_json["measurements"]
+    ]
+
+
+def test_compression_is_negotiated_and_skipped_for_small_bodies():
+    rows, meta = history_page()
+    plain = respond(request(), rows, meta).body
+    assert len(plain) >= main.RESPONSE_COMPRESS_MIN_BYTES
+
+    zstd = respond(request(accept_encoding="gzip;q=0.8, zstd"), rows, meta)
+    assert zstd.headers["content-encoding"] == "zstd"
+    assert zstandard.ZstdDecompressor().decompress(zstd.body) == plain
+    assert len(zstd.body) < len(plain)
+
+    gz = respond(request(accept_encoding="zstd;q=0.5, gzip"), rows, meta)
+    assert gz.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(gz.body) == plain
+
+    assert "content-encoding" not in respond(request(accept_encoding="br"), rows, meta).headers
+    assert "accept-encoding" in respond(request(), rows, meta).headers["vary"].lower()
+
+    small = b"x" * (main.RESPONSE_COMPRESS_MIN_BYTES - 1)
+    response = compressed_response(request(accept_encoding="zstd, gzip"), small, "application/json")
+    assert "content-encoding" not in response.headers and response.body == small
+    response = compressed_response(request(accept_encoding="zstd"), small + b"x", "application/json")
+    assert response.headers["content-encoding"] == "zstd"
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app import main
+from app.main import PG_INT_MAX, check_ingest_key, parse_ingest_row
+
+NOW = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+def test_parse_ingest_row_defaults_and_normalizes_observed_at():
+    assert parse_ingest_row({"endpoint_id": 1, "status": "up", "latency_ms": 12}, NOW) == (1, 12, "up", NOW)
+    assert parse_ingest_row({"endpoint_id": 1, "status": "down", "latency_ms": None}, NOW) == (1, None, "down", NOW)
+
+    naive = (NOW - timedelta(minutes=5)).replace(tzinfo=None).isoformat()
+    row = parse_ingest_row({"endpoint_id": 1, "status": "up", "observed_at": naive}, NOW)
+    assert row[3] == NOW - timedelta(minutes=5)
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        [1, "up"],
+        {"endpoint_id": "1", "status": "up"},
+        {"endpoint_id": True, "status": "up"},
+        {"endpoint_id": 0, "status": "up"},
+        {"endpoint_id": PG_INT_MAX + 1, "status": "up"},
+        {"endpoint_id": 1, "status": "UP"},
+        {"endpoint_id": 1, "status": "up", "latency_ms": -1},
+        {"endpoint_id": 1, "status": "up", "latency_ms": 1.5},
+        {"endpoint_id": 1, "status": "up", "latency_ms": 2**40},
+        {"endpoint_id": 1, "status": "up", "observed_at": 1767322000},
+        {"endpoint_id": 1, "status": "up", "observed_at": "yesterday"},
+        {"endpoint_id": 1, "status": "up", "observed_at": (NOW - timedelta(days=2)).isoformat()},
+        {"endpoint_id": 1, "status": "up", "observed_at": (NOW + timedelta(hours=1)).isoformat()},
+    ],
+)
+def test_parse_ingest_row_rejects_what_the_copy_cannot_take(obj):
+    with pytest.raises(ValueError):
+        parse_ingest_row(obj, NOW)
+
+
+def test_parse_ingest_row_accepts_the_int_column_bounds():
+    assert parse_ingest_row({"endpoint_id": PG_INT_MAX, "status": "up", "latency_ms": PG_INT_MAX}, NOW)[:2] == (
+        PG_INT_MAX,
+        PG_INT_MAX,
+    )
+
+
+def test_ingest_key_is_required_for_bulk_and_checked_when_set(monkeypatch):
+    monkeypatch.setattr(main, "INGEST_API_KEY", None)
+    assert check_ingest_key(None) is False
+    with pytest.raises(HTTPException) as e:
+        check_ingest_key("anything", required=True)
+    assert e.value.status_code == 503
+
+    monkeypatch.setattr(main, "INGEST_API_KEY", "s3cret")
+    assert check_ingest_key("s3cret", required=True) is True
+    for key in (None, "", "s3cre", "s3cret2"):
+        with pytest.raises(HTTPException) as e:
+            check_ingest_key(key)
+        assert e.value.status_code == 401
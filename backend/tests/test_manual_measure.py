@@ -0,0 +1,182 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app import main
+from app.main import MeasureFlights, UserRateLimiter
+
+USER = {"id": 1, "email": "a@example.com"}
+OBSERVED = datetime(2026, 1, 2, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_rate_limiter_allows_a_burst_then_reports_the_wait(clock):
+    limiter = UserRateLimiter(rate_per_minute=30, burst=3)
+    assert [limiter.take(1) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.take(1) == pytest.approx(2.0)
+    assert limiter.take(2) == 0.0
+
+    clock[0] += 1.5
+    assert limiter.take(1) == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert limiter.take(1) == 0.0
+    assert limiter.stats == {"allowed": 5, "limited": 2}
+
+
+def test_rate_limiter_forgets_the_least_recent_user(clock):
+    limiter = UserRateLimiter(rate_per_minute=1, burst=1, max_size=2)
+    limiter.take(1)
+    limiter.take(2)
+    limiter.take(3)
+    assert limiter.take(1) == 0.0
+    assert limiter.take(3) > 0
+
+
+class FakeProbes:
+    """probe_url stand-in whose probes finish when `release` is set."""
+
+    def __init__(self, result=(42, "up")):
+        self.result = result
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, url, probe_mode):
+        self.calls.append((url, probe_mode))
+        await self.release.wait()
+        return self.result
+
+
+def store_into(rows):
+    async def store(endpoint_id, latency_ms, status):
+        rows.append((endpoint_id, latency_ms, status))
+        return {"id": len(rows), "endpoint_id": endpoint_id, "latency_ms": latency_ms, "status": status}
+
+    return store
+
+
+def test_concurrent_measures_share_one_probe_and_one_row_per_endpoint(monkeypatch):
+    async def run():
+        probes, rows = FakeProbes(), []
+        monkeypatch.setattr(main, "probe_url", probes)
+        flights, store = MeasureFlights(), store_into(rows)
+
+        calls = [
+            asyncio.create_task(flights.measure(ep, "https://x", "warm", store))
+            for ep in (1, 1, 2)
+        ]
+        await asyncio.sleep(0)
+        assert flights.in_flight("https://x", "warm")
+        assert not flights.in_flight("https://x", "cold")
+        probes.release.set()
+        first, again, other = await asyncio.gather(*calls)
+
+        assert probes.calls == [("https://x", "warm")]
+        assert first == again and first["endpoint_id"] == 1 and other["endpoint_id"] == 2
+        assert sorted(rows) == [(1, 42, "up"), (2, 42, "up")]
+        assert flights.stats == {"probes": 1, "coalesced": 2, "fresh": 0}
+
+        # The finished flight is forgotten; the next call probes again
+        assert not flights.in_flight("https://x", "warm")
+        await flights.measure(1, "https://x", "warm", store)
+        assert len(probes.calls) == 2
+
+    asyncio.run(run())
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_probe(monkeypatch):
+    async def run():
+        probes, rows = FakeProbes(), []
+        monkeypatch.setattr(main, "probe_url", probes)
+        flights, store = MeasureFlights(), store_into(rows)
+
+        leaver = asyncio.create_task(flights.measure(1, "https://x", "warm", store))
+        stayer = asyncio.create_task(flights.measure(1, "https://x", "warm", store))
+        await asyncio.sleep(0)
+        leaver.cancel()
+        await asyncio.sleep(0)
+        probes.release.set()
+
+        assert (await stayer)["latency_ms"] == 42
+        assert leaver.cancelled()
+        assert rows == [(1, 42, "up")]
+
+    asyncio.run(run())
+
+
+class FakeConn:
+    """get_conn stand-in answering manual_measure's ownership query."""
+
+    def __init__(self, row):
+        self.row = row
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    async def execute(self, sql, params=None):
+        pass
+
+    async def fetchone(self):
+        return self.row
+
+
+def endpoint_row(url, fresh=False):
+    return {
+        "url": url,
+        "probe_mode": "warm",
+        "id": 9 if fresh else None,
+        "latency_ms": 7 if fresh else None,
+        "status": "up" if fresh else None,
+        "observed_at": OBSERVED if fresh else None,
+    }
+
+
+def test_only_calls_that_start_a_probe_are_charged(monkeypatch):
+    async def run():
+        probes, rows = FakeProbes(), []
+        limiter = UserRateLimiter(rate_per_minute=6, burst=1)
+        monkeypatch.setattr(main, "probe_url", probes)
+        monkeypatch.setattr(main, "measure_flights", MeasureFlights())
+        monkeypatch.setattr(main, "measure_limiter", limiter)
+        monkeypatch.setattr(main, "store_manual_measurement", store_into(rows))
+        conn = FakeConn(endpoint_row("https://x"))
+        monkeypatch.setattr(main, "get_conn", lambda: conn)
+
+        # Spends the only token
+        first = asyncio.create_task(main.manual_measure(1, current_user=USER))
+        await asyncio.sleep(0)
+        # Joins the flight in progress: free
+        joined = asyncio.create_task(main.manual_measure(1, current_user=USER))
+        await asyncio.sleep(0)
+
+        # A fresh measurement is returned as is: free
+        conn.row = endpoint_row("https://y", fresh=True)
+        fresh = await main.manual_measure(2, current_user=USER)
+        assert fresh["id"] == 9 and fresh["latency_ms"] == 7
+
+        # A probe of another URL would start a new flight: limited
+        conn.row = endpoint_row("https://z")
+        with pytest.raises(HTTPException) as e:
+            await main.manual_measure(3, current_user=USER)
+        assert e.value.status_code == 429
+        assert e.value.headers["Retry-After"] == "10"
+
+        probes.release.set()
+        assert (await first) == (await joined)
+        assert probes.calls == [("https://x", "warm")]
+        assert limiter.stats == {"allowed": 1, "limited": 1}
+
+    asyncio.run(run())
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.main import decode_cursor, encode_cursor, history_filters, page_of
+
+T0 = datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+
+
+def test_cursor_round_trip_keeps_microseconds_and_zone():
+    ts, row_id = decode_cursor(encode_cursor(T0, 42))
+    assert (ts, row_id) == (T0, 42)
+    assert ts.tzinfo is not None
+
+    other = T0.astimezone(timezone(timedelta(hours=-5)))
+    assert decode_cursor(encode_cursor(other, 7)) == (T0, 7)
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "bm9waXBl", "MjAyNnw=", "eHx5"])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+def test_history_filters_bound_the_page_strictly_below_the_cursor():
+    since, until = T0 - timedelta(days=1), T0 + timedelta(days=1)
+    clauses, params = history_filters("observed_at", since, until, encode_cursor(T0, 9))
+    assert clauses == [
+        "observed_at >= %s",
+        "observed_at < %s",
+        "observed_at <= %s AND (observed_at, id) < (%s, %s)",
+    ]
+    assert params == [since, until, T0, T0, 9]
+
+    assert history_filters("created_at", None, None, None) == ([], [])
+
+
+def test_page_of_cursor_points_at_the_last_row_returned():
+    rows = [{"id": 10 - i, "created_at": T0 - timedelta(minutes=i)} for i in range(4)]
+
+    page, cursor = page_of(rows, 3, "created_at")
+    assert page == rows[:3]
+    assert decode_cursor(cursor) == (rows[2]["created_at"], rows[2]["id"])
+
+    page, cursor = page_of(rows[:3], 3, "created_at")
+    assert page == rows[:3] and cursor is None
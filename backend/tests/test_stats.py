@@ -0,0 +1,31 @@
+import pytest
+
+from app.main import STATS_MAX_HOURS, app, window_start
+
+
+def validate_hours(path: str, value):
+    """Run ?hours=value through the route's own query validation."""
+    route = next(r for r in app.routes if getattr(r, "path", None) == path)
+    field = next(p for p in route.dependant.query_params if p.name == "hours")
+    _, errors = field.validate(value, {}, loc=("query", "hours"))
+    return errors
+
+
+def test_window_start_holds_up_to_the_longest_accepted_window():
+    assert window_start(STATS_MAX_HOURS) < window_start(1)
+    with pytest.raises(OverflowError):
+        window_start(10**9)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/endpoints/{endpoint_id}/stats",
+        "/api/endpoints/{endpoint_id}/percentiles",
+        "/api/endpoints/details",
+    ],
+)
+def test_hours_beyond_the_cap_is_a_validation_error(path):
+    assert not validate_hours(path, STATS_MAX_HOURS)
+    for value in (0, STATS_MAX_HOURS + 1, 10**9):
+        assert validate_hours(path, value)
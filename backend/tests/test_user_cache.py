@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app import main
+from app.main import UserCache, create_access_token
+
+CREATED = datetime(2026, 1, 2, tzinfo=timezone.utc)
+
+
+def user(user_id):
+    return {"id": user_id, "email": f"u{user_id}@example.com", "created_at": CREATED}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = UserCache(ttl=60, max_size=10)
+    cache.put(user(1))
+    clock[0] += 60
+    assert cache.get(1) == user(1)
+    clock[0] += 0.001
+    assert cache.get(1) is None
+    assert cache.snapshot()["hits"] == 1 and cache.snapshot()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_first(clock):
+    cache = UserCache(ttl=60, max_size=2)
+    cache.put(user(1))
+    cache.put(user(2))
+    cache.get(1)
+    cache.put(user(3))
+    assert cache.get(2) is None
+    assert cache.get(1) == user(1) and cache.get(3) == user(3)
+    assert cache.snapshot()["evictions"] == 1 and cache.snapshot()["size"] == 2
+
+
+class _FakeListenConn:
+    """
+    Stands in for LiveHub's LISTEN connection: runs `before` once the
+    listener waits for notifications, then delivers `notifies`.
+    """
+
+    def __init__(self, notifies, before=lambda: None):
+        self._notifies = notifies
+        self._before = before
+        self.listening = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql):
+        self.listening.append(sql)
+
+    async def notifies(self):
+        self._before()
+        for channel, payload in self._notifies:
+            yield SimpleNamespace(channel=channel, payload=payload)
+        # Stop LiveHub.run instead of letting it reconnect
+        raise asyncio.CancelledError
+
+
+def run_listener(monkeypatch, conn):
+    async def connect(*args, **kwargs):
+        return conn
+
+    monkeypatch.setattr(main.psycopg.AsyncConnection, "connect", connect)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main.LiveHub().run())
+
+
+def test_user_changes_notify_drops_only_that_user(monkeypatch, clock):
+    cache = UserCache(ttl=60, max_size=10)
+    monkeypatch.setattr(main, "user_cache", cache)
+    conn = _FakeListenConn(
+        [("user_changes", "2"), ("user_changes", "not an id")],
+        before=lambda: [cache.put(user(u)) for u in (1, 2, 3)],
+    )
+    run_listener(monkeypatch, conn)
+
+    assert "LISTEN user_changes;" in conn.listening
+    assert cache.get(2) is None
+    assert cache.get(1) == user(1) and cache.get(3) == user(3)
+
+
+def test_reconnecting_listener_starts_from_an_empty_cache(monkeypatch, clock):
+    cache = UserCache(ttl=60, max_size=10)
+    cache.put(user(1))
+    monkeypatch.setattr(main, "user_cache", cache)
+    run_listener(monkeypatch, _FakeListenConn([]))
+    assert cache.snapshot()["size"] == 0
+
+
+def test_trusted_claims_skip_the_lookup_but_older_tokens_still_resolve(monkeypatch, clock):
+    cache = UserCache(ttl=60, max_size=10)
+    lookups = []
+
+    async def get_user_by_id(user_id):
+        lookups.append(user_id)
+        return {**user(user_id), "password_hash": "x"} if user_id == 7 else None
+
+    monkeypatch.setattr(main, "user_cache", cache)
+    monkeypatch.setattr(main, "get_user_by_id", get_user_by_id)
+    monkeypatch.setattr(main, "AUTH_TRUST_TOKEN_CLAIMS", True)
+
+    async def run():
+        trusted = await main.get_current_user(create_access_token({"sub": "7", "email": "u7@example.com"}))
+        assert trusted == {"id": 7, "email": "u7@example.com"}
+        assert lookups == [] and cache.stats["trusted_claims"] == 1
+
+        # Tokens issued before the email claim was added fall back to the
+        # cached lookup, and the cached user never carries the hash
+        older = create_access_token({"sub": "7"})
+        assert await main.get_current_user(older) == user(7)
+        assert await main.get_current_user(older) == user(7)
+        assert lookups == [7]
+
+        with pytest.raises(HTTPException) as e:
+            await main.get_current_user(create_access_token({"sub": "8"}))
+        assert e.value.status_code == 401
+
+    asyncio.run(run())
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import "./App.css";
 
 // Chart.js
@@ -39,6 +39,7 @@ function App() {
   // history + stats + alerts UI
   const [selectedEndpointId, setSelectedEndpointId] = useState(null);
   const [history, setHistory] = useState([]);
+  const [series, setSeries] = useState(null);
   const [stats, setStats] = useState(null);
 
   const [alertConfig, setAlertConfig] = useState(null);
@@ -53,12 +54,97 @@ function App() {
   const isLoggedIn = !!token;
   const isLogin = authMode === "login";
 
+  // the live stream handlers need the current selection, not the one
+  // captured when the stream was opened
+  const selectedRef = useRef(null);
+  useEffect(() => {
+    selectedRef.current = selectedEndpointId;
+  }, [selectedEndpointId]);
+
   useEffect(() => {
     if (!token) return;
     fetchEndpoints();
     fetchSummary();
   }, [token]);
 
+  // ============================
+  // LIVE UPDATES (SSE)
+  // ============================
+
+  useEffect(() => {
+    if (!token) return;
+
+    const es = new EventSource(
+      `${API_BASE}/api/stream?token=${encodeURIComponent(token)}`
+    );
+
+    es.addEventListener("measurement", (e) => {
+      const d = JSON.parse(e.data);
+      setSummary((prev) =>
+        prev.map((ep) =>
+          ep.id === d.endpoint_id
+            ? {
+                ...ep,
+                last_status: d.status,
+                last_latency_ms: d.latency_ms,
+                last_observed_at: d.observed_at,
+              }
+            : ep
+        )
+      );
+      if (selectedRef.current === d.endpoint_id) {
+        setHistory((prev) =>
+          [
+            {
+              status: d.status,
+              latency_ms: d.latency_ms,
+              observed_at: d.observed_at,
+            },
+            ...prev,
+          ].slice(0, 50)
+        );
+      }
+    });
+
+    es.addEventListener("alert", (e) => {
+      const d = JSON.parse(e.data);
+      if (selectedRef.current === d.endpoint_id) {
+        setAlerts((prev) => [d.alert, ...prev].slice(0, 50));
+      }
+    });
+
+    es.addEventListener("state", (e) => {
+      const d = JSON.parse(e.data);
+      setSummary((prev) =>
+        prev.map((ep) =>
+          ep.id === d.endpoint_id ? { ...ep, alert: d.alert_active } : ep
+        )
+      );
+      if (selectedRef.current === d.endpoint_id) {
+        setAlertConfig((prev) =>
+          prev
+            ? {
+                ...prev,
+                alert_active: d.alert_active,
+                consecutive_failures: d.consecutive_failures,
+                last_alert_at: d.last_alert_at,
+              }
+            : prev
+        );
+      }
+    });
+
+    // we may have missed events (server reconnected or we fell behind)
+    es.addEventListener("resync", () => {
+      fetchSummary();
+      if (selectedRef.current !== null) {
+        openDetails(selectedRef.current);
+      }
+    });
+
+    return () => es.close();
+  }, [token]);
+
   // ============================
   // AUTH
   // ============================
@@ -174,6 +260,7 @@ function App() {
       if (selectedEndpointId === id) {
         setSelectedEndpointId(null);
         setHistory([]);
+        setSeries(null);
         setStats(null);
         setAlertConfig(null);
         setAlerts([]);
@@ -190,12 +277,14 @@ function App() {
         headers: { Authorization: `Bearer ${token}` },
       });
 
-      if (!res.ok) return alert("Failed to measure");
-
-      await fetchSummary();
-      if (selectedEndpointId === id) {
-        await openDetails(id);
+      if (res.status === 429) {
+        return alert(
+          `Too many measurements, try again in ${res.headers.get("Retry-After") || "a few"} s`
+        );
       }
+      if (!res.ok) return alert("Failed to measure");
+      // the new measurement arrives over the live stream (a fresh result
+      // returned instead of a new probe is already there)
     } catch (err) {
       console.error(err);
     }
@@ -208,6 +297,7 @@ function App() {
     setSummary([]);
     setSelectedEndpointId(null);
     setHistory([]);
+    setSeries(null);
     setStats(null);
     setAlertConfig(null);
     setAlerts([]);
@@ -220,44 +310,38 @@ function App() {
   async function openDetails(id) {
     setSelectedEndpointId(id);
     try {
-      const [histRes, statsRes, configRes, alertsRes] = await Promise.all([
-        fetch(`${API_BASE}/api/endpoints/${id}/measurements?limit=50`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        fetch(`${API_BASE}/api/endpoints/${id}/stats?hours=24`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        fetch(`${API_BASE}/api/endpoints/${id}/alert-config`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        fetch(`${API_BASE}/api/endpoints/${id}/alerts?limit=50`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-      ]);
-
-      if (histRes.ok) {
-        const data = await histRes.json();
-        setHistory(data.measurements || []);
-      }
-
-      if (statsRes.ok) {
-        const s = await statsRes.json();
-        setStats(s);
-      }
+      // history, 24h stats, alert config and alerts in one request
+      const res = await fetch(
+        `${API_BASE}/api/endpoints/details?ids=${id}&hours=24&measurements_limit=50&alerts_limit=50`,
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
 
-      if (configRes.ok) {
-        const c = await configRes.json();
-        setAlertConfig(c);
-      } else {
+      if (!res.ok) {
         setAlertConfig(null);
-      }
-
-      if (alertsRes.ok) {
-        const a = await alertsRes.json();
-        setAlerts(a.alerts || []);
-      } else {
         setAlerts([]);
+        return;
       }
+
+      const data = await res.json();
+      const d = data.endpoints[0];
+      setHistory(d.measurements || []);
+      loadSeries(id);
+      setStats(d.stats);
+      setAlertConfig(d.alert_config);
+      setAlerts(d.alerts || []);
+    } catch (err) {
+      console.error(err);
+    }
+  }
+
+  // last 24h latency, downsampled by the API to a fixed number of points
+  async function loadSeries(id) {
+    try {
+      const res = await fetch(
+        `${API_BASE}/api/endpoints/${id}/series?points=120`,
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      setSeries(res.ok ? await res.json() : null);
     } catch (err) {
       console.error(err);
     }
@@ -637,21 +721,30 @@ function App() {
             )}
 
             {/* LATENCY CHART */}
-            {history.length > 0 && (
+            {series && series.t.length > 0 && (
               <div className="chart-box" style={{ marginBottom: "1.5rem" }}>
                 <Line
                   data={{
-                    labels: history.map((h) =>
-                      new Date(h.observed_at).toLocaleTimeString()
+                    labels: series.t.map((t) =>
+                      new Date(t).toLocaleTimeString()
                     ),
                     datasets: [
                       {
-                        label: "Latency (ms)",
-                        data: history.map((h) => h.latency_ms || 0),
+                        label: "Avg latency (ms)",
+                        data: series.avg_latency_ms,
                         fill: false,
                         borderColor: "#22c55e",
                         tension: 0.2,
                       },
+                      {
+                        label: "Max latency (ms)",
+                        data: series.max_latency_ms,
+                        fill: false,
+                        borderColor: "#f97316",
+                        borderDash: [4, 4],
+                        pointRadius: 0,
+                        tension: 0.2,
+                      },
                     ],
                   }}
                   options={{
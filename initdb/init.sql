@@ -14,6 +14,9 @@ CREATE TABLE IF NOT EXISTS endpoints (
   url TEXT NOT NULL,
   created_at TIMESTAMPTZ DEFAULT NOW(),
 
+  -- PROBE SCHEDULE (NULL = worker default, POLL_INTERVAL_SECONDS)
+  check_interval_seconds INT CHECK (check_interval_seconds > 0),
+
   -- ALERT CONFIG
   latency_threshold_ms INT NOT NULL DEFAULT 300,
   consecutive_fail_threshold INT NOT NULL DEFAULT 3,
@@ -24,25 +27,803 @@ CREATE TABLE IF NOT EXISTS endpoints (
   last_alert_at TIMESTAMPTZ
 );
 
+-- Upgrade path for databases created before the column existed
+ALTER TABLE endpoints
+  ADD COLUMN IF NOT EXISTS check_interval_seconds INT CHECK (check_interval_seconds > 0);
+
+-- Stop each probe at the response headers instead of downloading the body
+-- (the connection is closed rather than reused)
+ALTER TABLE endpoints
+  ADD COLUMN IF NOT EXISTS probe_headers_only BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- 'warm': probes reuse keep-alive connections, cached DNS answers and TLS
+-- sessions; 'cold': every probe pays for DNS, TCP connect and a full TLS
+-- handshake (see worker/probe.py)
+ALTER TABLE endpoints
+  ADD COLUMN IF NOT EXISTS probe_mode TEXT NOT NULL DEFAULT 'warm'
+    CHECK (probe_mode IN ('warm', 'cold'));
+
+-- Sliding-window alert rules (NULL = rule off; all columns of a rule are
+-- set together, see /api/endpoints/{id}/alert-config):
+--   failure_rate_*: alert when >= threshold_pct % of the last
+--                   window_checks checks were "down"
+--   latency_percentile_*: alert when the given percentile of the
+--                   latencies of the last window_minutes exceeds threshold_ms
+ALTER TABLE endpoints
+  ADD COLUMN IF NOT EXISTS failure_rate_threshold_pct INT
+    CHECK (failure_rate_threshold_pct BETWEEN 1 AND 100),
+  ADD COLUMN IF NOT EXISTS failure_rate_window_checks INT
+    CHECK (failure_rate_window_checks >= 2),
+  ADD COLUMN IF NOT EXISTS latency_percentile REAL
+    CHECK (latency_percentile > 0 AND latency_percentile < 100),
+  ADD COLUMN IF NOT EXISTS latency_percentile_window_minutes INT
+    CHECK (latency_percentile_window_minutes >= 1),
+  ADD COLUMN IF NOT EXISTS latency_percentile_threshold_ms INT
+    CHECK (latency_percentile_threshold_ms >= 0);
+
+-- ============================================================
+-- Time partitioning for measurements / alerts
+-- ============================================================
+-- measurements are split into daily partitions and alerts into monthly
+-- ones (UTC boundaries, named <table>_pYYYYMMDD / <table>_pYYYYMM). The
+-- worker creates partitions ahead of time and drops expired ones
+-- (see worker/maintenance.py); rows outside every partition land in
+-- <table>_default and are moved out when their partition is created.
+
+CREATE OR REPLACE FUNCTION ensure_time_partitions(
+  parent regclass,
+  step interval,             -- '1 day' or '1 month'
+  from_ts timestamptz,
+  to_ts timestamptz
+) RETURNS int
+LANGUAGE plpgsql AS $$
+DECLARE
+  unit text := CASE WHEN step >= interval '1 month' THEN 'month' ELSE 'day' END;
+  fmt text := CASE WHEN step >= interval '1 month' THEN 'YYYYMM' ELSE 'YYYYMMDD' END;
+  key_col text;
+  lo timestamp := date_trunc(unit, from_ts AT TIME ZONE 'UTC');
+  hi timestamp;
+  part text;
+  default_part text := parent::text || '_default';
+  created int := 0;
+BEGIN
+  SELECT a.attname INTO key_col
+  FROM pg_partitioned_table p
+  JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+  WHERE p.partrelid = parent;
+
+  WHILE lo < to_ts AT TIME ZONE 'UTC' LOOP
+    hi := lo + step;
+    part := parent::text || '_p' || to_char(lo, fmt);
+
+    IF to_regclass(part) IS NULL THEN
+      -- Park rows that already landed in the default partition, otherwise
+      -- the new partition cannot be created. They go back straight into
+      -- the new partition: the statement triggers on the parent (rollups,
+      -- endpoint_status, live updates, data versions) have seen them already
+      EXECUTE format(
+        'CREATE TEMP TABLE partition_backlog ON COMMIT DROP AS
+           WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *)
+           SELECT * FROM moved',
+        default_part, key_col, lo AT TIME ZONE 'UTC', key_col, hi AT TIME ZONE 'UTC'
+      );
+      EXECUTE format(
+        'CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+        part, parent, lo AT TIME ZONE 'UTC', hi AT TIME ZONE 'UTC'
+      );
+      EXECUTE format('INSERT INTO %I SELECT * FROM partition_backlog', part);
+      DROP TABLE partition_backlog;
+      created := created + 1;
+    END IF;
+
+    lo := hi;
+  END LOOP;
+
+  RETURN created;
+END;
+$$;
+
+-- Drop whole partitions whose range ends on or before older_than.
+-- Much cheaper than DELETE: no dead tuples, no vacuum afterwards.
+CREATE OR REPLACE FUNCTION drop_time_partitions(
+  parent regclass,
+  step interval,
+  older_than timestamptz
+) RETURNS int
+LANGUAGE plpgsql AS $$
+DECLARE
+  fmt text := CASE WHEN step >= interval '1 month' THEN 'YYYYMM' ELSE 'YYYYMMDD' END;
+  part record;
+  dropped int := 0;
+BEGIN
+  FOR part IN
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = parent
+      AND c.relname ~ ('^' || parent::text || '_p[0-9]+$')
+  LOOP
+    IF (to_timestamp(substring(part.relname FROM '_p([0-9]+)$'), fmt)::timestamp + step)
+         AT TIME ZONE 'UTC' <= older_than THEN
+      EXECUTE format('DROP TABLE %I', part.relname);
+      dropped := dropped + 1;
+    END IF;
+  END LOOP;
+
+  RETURN dropped;
+END;
+$$;
+
+-- Upgrade path: tables created by an older init.sql are plain heap tables.
+-- Move them aside here; their rows are copied into the partitioned tables
+-- further down and the old tables dropped.
+DO $$
+DECLARE
+  t text;
+BEGIN
+  FOREACH t IN ARRAY ARRAY['measurements', 'alerts'] LOOP
+    IF EXISTS (
+      SELECT 1 FROM pg_class
+      WHERE oid = to_regclass(t) AND relkind = 'r'
+    ) THEN
+      EXECUTE format('ALTER TABLE %I RENAME TO %I', t, t || '_unpartitioned');
+      EXECUTE format('ALTER TABLE %I RENAME CONSTRAINT %I TO %I',
+                     t || '_unpartitioned', t || '_pkey', t || '_unpartitioned_pkey');
+      EXECUTE format('ALTER SEQUENCE %I RENAME TO %I',
+                     t || '_id_seq', t || '_unpartitioned_id_seq');
+    END IF;
+  END LOOP;
+END;
+$$;
+
 -- Measurements produced by the worker
 CREATE TABLE IF NOT EXISTS measurements (
-  id SERIAL PRIMARY KEY,
+  id SERIAL,
   endpoint_id INT NOT NULL REFERENCES endpoints(id) ON DELETE CASCADE,
   latency_ms INT,
   status TEXT CHECK (status IN ('up','down')) NOT NULL,
-  observed_at TIMESTAMPTZ DEFAULT NOW()
-);
+  observed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, observed_at)
+) PARTITION BY RANGE (observed_at);
+
+CREATE TABLE IF NOT EXISTS measurements_default PARTITION OF measurements DEFAULT;
+
+-- Phase breakdown of worker probes in microseconds (see worker/probe.py):
+-- DNS, TCP connect, TLS handshake, connection ready -> response headers,
+-- and the whole check. NULL for failed checks and pushed results; NULLs
+-- take no space in the row, so the columns are cheap when unused.
+ALTER TABLE measurements
+  ADD COLUMN IF NOT EXISTS dns_us INT,
+  ADD COLUMN IF NOT EXISTS connect_us INT,
+  ADD COLUMN IF NOT EXISTS tls_us INT,
+  ADD COLUMN IF NOT EXISTS ttfb_us INT,
+  ADD COLUMN IF NOT EXISTS total_us INT;
+
+-- Every read is "this endpoint, newest first"; id breaks ties for the
+-- keyset pagination cursors (observed_at, id)
+DROP INDEX IF EXISTS measurements_endpoint_observed_idx;
+CREATE INDEX IF NOT EXISTS measurements_endpoint_observed_id_idx
+  ON measurements (endpoint_id, observed_at DESC, id DESC);
+
+-- Paging through all endpoints at once (GET /api/measurements)
+CREATE INDEX IF NOT EXISTS measurements_observed_id_idx
+  ON measurements (observed_at DESC, id DESC);
 
 -- Alert events history
 CREATE TABLE IF NOT EXISTS alerts (
-  id SERIAL PRIMARY KEY,
+  id SERIAL,
   endpoint_id INT NOT NULL REFERENCES endpoints(id) ON DELETE CASCADE,
-  type TEXT NOT NULL,          -- 'down' | 'latency'
+  type TEXT NOT NULL,          -- 'down' | 'latency' | 'failure_rate' | 'latency_percentile'
   message TEXT NOT NULL,
   value INT,
-  created_at TIMESTAMPTZ DEFAULT NOW()
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE IF NOT EXISTS alerts_default PARTITION OF alerts DEFAULT;
+
+DROP INDEX IF EXISTS alerts_endpoint_created_idx;
+CREATE INDEX IF NOT EXISTS alerts_endpoint_created_id_idx
+  ON alerts (endpoint_id, created_at DESC, id DESC);
+
+SELECT ensure_time_partitions('measurements', '1 day', NOW() - interval '1 day', NOW() + interval '7 days');
+SELECT ensure_time_partitions('alerts', '1 month', NOW(), NOW() + interval '2 months');
+
+-- Finish the upgrade: copy old rows (keeping their ids) and drop the old tables
+DO $$
+DECLARE
+  lo timestamptz;
+  hi timestamptz;
+BEGIN
+  IF to_regclass('measurements_unpartitioned') IS NOT NULL THEN
+    SELECT min(observed_at), max(observed_at) INTO lo, hi FROM measurements_unpartitioned;
+    IF lo IS NOT NULL THEN
+      PERFORM ensure_time_partitions('measurements', '1 day', lo, hi + interval '1 day');
+    END IF;
+    INSERT INTO measurements (id, endpoint_id, latency_ms, status, observed_at)
+    SELECT id, endpoint_id, latency_ms, status, COALESCE(observed_at, NOW())
+    FROM measurements_unpartitioned;
+    PERFORM setval('measurements_id_seq', GREATEST((SELECT max(id) FROM measurements), 1));
+    DROP TABLE measurements_unpartitioned;
+  END IF;
+
+  IF to_regclass('alerts_unpartitioned') IS NOT NULL THEN
+    SELECT min(created_at), max(created_at) INTO lo, hi FROM alerts_unpartitioned;
+    IF lo IS NOT NULL THEN
+      PERFORM ensure_time_partitions('alerts', '1 month', lo, hi + interval '1 day');
+    END IF;
+    INSERT INTO alerts (id, endpoint_id, type, message, value, created_at)
+    SELECT id, endpoint_id, type, message, value, COALESCE(created_at, NOW())
+    FROM alerts_unpartitioned;
+    PERFORM setval('alerts_id_seq', GREATEST((SELECT max(id) FROM alerts), 1));
+    DROP TABLE alerts_unpartitioned;
+  END IF;
+END;
+$$;
+
+-- ============================================================
+-- Latency sketches (percentiles)
+-- ============================================================
+-- DDSketch-style quantile summary: a latency x >= 1 ms falls in bin
+-- ceil(log_gamma(x)) with gamma = (1 + a) / (1 - a) for a relative accuracy
+-- a of 1%; 0 ms goes in bin -1. A sketch is a JSONB {"bin": count} object,
+-- so merging sketches is a SUM per bin and any percentile of a merged
+-- sketch is within 1% of the exact value.
+CREATE OR REPLACE FUNCTION latency_sketch_gamma()
+RETURNS float8
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT (1 + 0.01) / (1 - 0.01)
+$$;
+
+CREATE OR REPLACE FUNCTION latency_sketch_bin(latency_ms INT)
+RETURNS INT
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT CASE
+           WHEN latency_ms < 1 THEN -1
+           ELSE ceil(ln(latency_ms) / ln(latency_sketch_gamma()))
+         END::int
+$$;
+
+-- Representative value of a bin (relative error <= 1% for its members)
+CREATE OR REPLACE FUNCTION latency_sketch_value(bin INT)
+RETURNS float8
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT CASE
+           WHEN bin < 0 THEN 0
+           ELSE 2 * power(latency_sketch_gamma(), bin) / (latency_sketch_gamma() + 1)
+         END
+$$;
+
+CREATE OR REPLACE FUNCTION latency_sketch_merge(a JSONB, b JSONB)
+RETURNS JSONB
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT COALESCE(jsonb_object_agg(bin, n), '{}')
+  FROM (
+    SELECT key AS bin, sum(value::int) AS n
+    FROM (
+      SELECT * FROM jsonb_each_text(a)
+      UNION ALL
+      SELECT * FROM jsonb_each_text(b)
+    ) e
+    GROUP BY key
+  ) m
+$$;
+
+-- ============================================================
+-- Rollups: per-endpoint aggregates in 1 minute / 1 hour / 1 day buckets
+-- ============================================================
+-- Maintained incrementally from every insert into measurements (worker
+-- flushes, manual measures, POST /api/measurements) so /stats reads a
+-- bounded number of buckets instead of raw rows. Buckets are UTC aligned.
+-- Old minute / hour buckets are pruned by the worker (maintenance.py).
+CREATE TABLE IF NOT EXISTS measurement_rollups (
+  endpoint_id INT NOT NULL REFERENCES endpoints(id) ON DELETE CASCADE,
+  resolution TEXT NOT NULL CHECK (resolution IN ('minute','hour','day')),
+  bucket_start TIMESTAMPTZ NOT NULL,
+  checks INT NOT NULL,
+  up_checks INT NOT NULL,
+  latency_count INT NOT NULL,      -- checks that produced a latency
+  latency_sum BIGINT NOT NULL,
+  latency_min INT,
+  latency_max INT,
+  latency_sketch JSONB NOT NULL DEFAULT '{}',
+  PRIMARY KEY (endpoint_id, resolution, bucket_start)
 );
 
+-- Per-phase sums of the checks with a timing breakdown, so each phase
+-- averages separately (sum / timing_count). Older buckets stay at 0.
+ALTER TABLE measurement_rollups
+  ADD COLUMN IF NOT EXISTS timing_count INT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS dns_us_sum BIGINT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS connect_us_sum BIGINT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS tls_us_sum BIGINT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS ttfb_us_sum BIGINT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS total_us_sum BIGINT NOT NULL DEFAULT 0;
+
+-- Upgrade path for rollups created before latency_sketch existed
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name = 'measurement_rollups' AND column_name = 'latency_sketch'
+  ) THEN
+    LOCK TABLE measurements IN SHARE ROW EXCLUSIVE MODE;
+    ALTER TABLE measurement_rollups ADD COLUMN latency_sketch JSONB NOT NULL DEFAULT '{}';
+
+    UPDATE measurement_rollups r
+    SET latency_sketch = s.sketch
+    FROM (
+      SELECT endpoint_id, resolution, bucket_start, jsonb_object_agg(bin, n) AS sketch
+      FROM (
+        SELECT
+          m.endpoint_id,
+          res.resolution,
+          date_trunc(res.resolution, m.observed_at, 'UTC') AS bucket_start,
+          latency_sketch_bin(m.latency_ms) AS bin,
+          count(*) AS n
+        FROM measurements m
+        CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS res(resolution)
+        WHERE m.latency_ms IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+      ) b
+      GROUP BY 1, 2, 3
+    ) s
+    WHERE r.endpoint_id = s.endpoint_id
+      AND r.resolution = s.resolution
+      AND r.bucket_start = s.bucket_start;
+  END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION measurement_rollups_apply()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO measurement_rollups AS r (
+    endpoint_id, resolution, bucket_start,
+    checks, up_checks, latency_count, latency_sum, latency_min, latency_max,
+    latency_sketch,
+    timing_count, dns_us_sum, connect_us_sum, tls_us_sum, ttfb_us_sum, total_us_sum
+  )
+  SELECT
+    b.endpoint_id,
+    b.resolution,
+    b.bucket_start,
+    sum(b.checks),
+    sum(b.up_checks),
+    sum(b.latency_count),
+    COALESCE(sum(b.latency_sum), 0),
+    min(b.latency_min),
+    max(b.latency_max),
+    COALESCE(jsonb_object_agg(b.bin, b.latency_count) FILTER (WHERE b.bin IS NOT NULL), '{}'),
+    sum(b.timing_count),
+    COALESCE(sum(b.dns_us_sum), 0),
+    COALESCE(sum(b.connect_us_sum), 0),
+    COALESCE(sum(b.tls_us_sum), 0),
+    COALESCE(sum(b.ttfb_us_sum), 0),
+    COALESCE(sum(b.total_us_sum), 0)
+  FROM (
+    -- one row per bucket and sketch bin
+    SELECT
+      n.endpoint_id,
+      res.resolution,
+      date_trunc(res.resolution, n.observed_at, 'UTC') AS bucket_start,
+      latency_sketch_bin(n.latency_ms) AS bin,
+      count(*) AS checks,
+      count(*) FILTER (WHERE n.status = 'up') AS up_checks,
+      count(n.latency_ms) AS latency_count,
+      sum(n.latency_ms) AS latency_sum,
+      min(n.latency_ms) AS latency_min,
+      max(n.latency_ms) AS latency_max,
+      count(n.total_us) AS timing_count,
+      sum(n.dns_us) AS dns_us_sum,
+      sum(n.connect_us) AS connect_us_sum,
+      sum(n.tls_us) AS tls_us_sum,
+      sum(n.ttfb_us) AS ttfb_us_sum,
+      sum(n.total_us) AS total_us_sum
+    FROM new_measurements n
+    CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS res(resolution)
+    GROUP BY 1, 2, 3, 4
+  ) b
+  GROUP BY 1, 2, 3
+  ORDER BY 1, 2, 3    -- same lock order for concurrent writers
+  ON CONFLICT (endpoint_id, resolution, bucket_start) DO UPDATE SET
+    checks = r.checks + EXCLUDED.checks,
+    up_checks = r.up_checks + EXCLUDED.up_checks,
+    latency_count = r.latency_count + EXCLUDED.latency_count,
+    latency_sum = r.latency_sum + EXCLUDED.latency_sum,
+    latency_min = LEAST(r.latency_min, EXCLUDED.latency_min),
+    latency_max = GREATEST(r.latency_max, EXCLUDED.latency_max),
+    latency_sketch = latency_sketch_merge(r.latency_sketch, EXCLUDED.latency_sketch),
+    timing_count = r.timing_count + EXCLUDED.timing_count,
+    dns_us_sum = r.dns_us_sum + EXCLUDED.dns_us_sum,
+    connect_us_sum = r.connect_us_sum + EXCLUDED.connect_us_sum,
+    tls_us_sum = r.tls_us_sum + EXCLUDED.tls_us_sum,
+    ttfb_us_sum = r.ttfb_us_sum + EXCLUDED.ttfb_us_sum,
+    total_us_sum = r.total_us_sum + EXCLUDED.total_us_sum;
+  RETURN NULL;
+END;
+$$;
+
+-- First run: backfill from the existing rows and install the trigger in
+-- one transaction, with writers blocked so nothing is counted twice
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_trigger
+    WHERE tgname = 'measurements_rollups' AND tgrelid = 'measurements'::regclass
+  ) THEN
+    LOCK TABLE measurements IN SHARE ROW EXCLUSIVE MODE;
+
+    INSERT INTO measurement_rollups (
+      endpoint_id, resolution, bucket_start,
+      checks, up_checks, latency_count, latency_sum, latency_min, latency_max,
+      latency_sketch,
+      timing_count, dns_us_sum, connect_us_sum, tls_us_sum, ttfb_us_sum, total_us_sum
+    )
+    SELECT
+      b.endpoint_id,
+      b.resolution,
+      b.bucket_start,
+      sum(b.checks),
+      sum(b.up_checks),
+      sum(b.latency_count),
+      COALESCE(sum(b.latency_sum), 0),
+      min(b.latency_min),
+      max(b.latency_max),
+      COALESCE(jsonb_object_agg(b.bin, b.latency_count) FILTER (WHERE b.bin IS NOT NULL), '{}'),
+      sum(b.timing_count),
+      COALESCE(sum(b.dns_us_sum), 0),
+      COALESCE(sum(b.connect_us_sum), 0),
+      COALESCE(sum(b.tls_us_sum), 0),
+      COALESCE(sum(b.ttfb_us_sum), 0),
+      COALESCE(sum(b.total_us_sum), 0)
+    FROM (
+      SELECT
+        m.endpoint_id,
+        res.resolution,
+        date_trunc(res.resolution, m.observed_at, 'UTC') AS bucket_start,
+        latency_sketch_bin(m.latency_ms) AS bin,
+        count(*) AS checks,
+        count(*) FILTER (WHERE m.status = 'up') AS up_checks,
+        count(m.latency_ms) AS latency_count,
+        sum(m.latency_ms) AS latency_sum,
+        min(m.latency_ms) AS latency_min,
+        max(m.latency_ms) AS latency_max,
+        count(m.total_us) AS timing_count,
+        sum(m.dns_us) AS dns_us_sum,
+        sum(m.connect_us) AS connect_us_sum,
+        sum(m.tls_us) AS tls_us_sum,
+        sum(m.ttfb_us) AS ttfb_us_sum,
+        sum(m.total_us) AS total_us_sum
+      FROM measurements m
+      CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS res(resolution)
+      GROUP BY 1, 2, 3, 4
+    ) b
+    GROUP BY 1, 2, 3
+    ON CONFLICT DO NOTHING;
+
+    CREATE TRIGGER measurements_rollups
+      AFTER INSERT ON measurements
+      REFERENCING NEW TABLE AS new_measurements
+      FOR EACH STATEMENT
+      EXECUTE FUNCTION measurement_rollups_apply();
+  END IF;
+END;
+$$;
+
+-- ============================================================
+-- Latest state per endpoint (dashboard summary)
+-- ============================================================
+-- One row per endpoint with its newest measurement, kept current by a
+-- trigger on measurements so the summary never touches history.
+CREATE TABLE IF NOT EXISTS endpoint_status (
+  endpoint_id INT PRIMARY KEY REFERENCES endpoints(id) ON DELETE CASCADE,
+  last_status TEXT NOT NULL,
+  last_latency_ms INT,
+  last_observed_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS endpoints_user_idx ON endpoints (user_id, id);
+
+CREATE OR REPLACE FUNCTION endpoint_status_apply()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO endpoint_status AS s (endpoint_id, last_status, last_latency_ms, last_observed_at)
+  SELECT DISTINCT ON (n.endpoint_id)
+    n.endpoint_id, n.status, n.latency_ms, n.observed_at
+  FROM new_measurements n
+  ORDER BY n.endpoint_id, n.observed_at DESC
+  ON CONFLICT (endpoint_id) DO UPDATE SET
+    last_status = EXCLUDED.last_status,
+    last_latency_ms = EXCLUDED.last_latency_ms,
+    last_observed_at = EXCLUDED.last_observed_at
+  -- late / out-of-order rows never overwrite a newer result
+  WHERE EXCLUDED.last_observed_at >= s.last_observed_at;
+  RETURN NULL;
+END;
+$$;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_trigger
+    WHERE tgname = 'measurements_endpoint_status' AND tgrelid = 'measurements'::regclass
+  ) THEN
+    LOCK TABLE measurements IN SHARE ROW EXCLUSIVE MODE;
+
+    INSERT INTO endpoint_status (endpoint_id, last_status, last_latency_ms, last_observed_at)
+    SELECT e.id, m.status, m.latency_ms, m.observed_at
+    FROM endpoints e
+    JOIN LATERAL (
+      SELECT status, latency_ms, observed_at
+      FROM measurements
+      WHERE endpoint_id = e.id
+      ORDER BY observed_at DESC
+      LIMIT 1
+    ) m ON TRUE
+    ON CONFLICT DO NOTHING;
+
+    CREATE TRIGGER measurements_endpoint_status
+      AFTER INSERT ON measurements
+      REFERENCING NEW TABLE AS new_measurements
+      FOR EACH STATEMENT
+      EXECUTE FUNCTION endpoint_status_apply();
+  END IF;
+END;
+$$;
+
+-- ============================================================
+-- Live updates: NOTIFY live_updates with JSON deltas
+-- ============================================================
+-- Sent from whatever transaction wrote the row (usually a worker flush)
+-- and delivered on commit. Each API replica LISTENs once and fans the
+-- deltas out to its dashboards by user_id. Only the newest measurement
+-- per endpoint and statement is sent; payloads stay well under the 8 kB
+-- NOTIFY limit.
+CREATE OR REPLACE FUNCTION live_measurements_notify()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_notify('live_updates', json_build_object(
+    'type', 'measurement',
+    'user_id', e.user_id,
+    'endpoint_id', n.endpoint_id,
+    'status', n.status,
+    'latency_ms', n.latency_ms,
+    'observed_at', n.observed_at
+  )::text)
+  FROM (
+    SELECT DISTINCT ON (endpoint_id) endpoint_id, status, latency_ms, observed_at
+    FROM new_measurements
+    ORDER BY endpoint_id, observed_at DESC
+  ) n
+  JOIN endpoints e ON e.id = n.endpoint_id;
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION live_alerts_notify()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_notify('live_updates', json_build_object(
+    'type', 'alert',
+    'user_id', e.user_id,
+    'endpoint_id', n.endpoint_id,
+    'alert', json_build_object(
+      'id', n.id,
+      'endpoint_id', n.endpoint_id,
+      'type', n.type,
+      'message', left(n.message, 1000),
+      'value', n.value,
+      'created_at', n.created_at
+    )
+  )::text)
+  FROM new_alerts n
+  JOIN endpoints e ON e.id = n.endpoint_id;
+  RETURN NULL;
+END;
+$$;
+
+-- Alert state flips (alert_active / consecutive_failures) written by the worker
+CREATE OR REPLACE FUNCTION live_endpoint_state_notify()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_notify('live_updates', json_build_object(
+    'type', 'state',
+    'user_id', n.user_id,
+    'endpoint_id', n.id,
+    'alert_active', n.alert_active,
+    'consecutive_failures', n.consecutive_failures,
+    'last_alert_at', n.last_alert_at
+  )::text)
+  FROM new_endpoints n
+  JOIN old_endpoints o ON o.id = n.id
+  WHERE n.alert_active IS DISTINCT FROM o.alert_active
+     OR n.consecutive_failures IS DISTINCT FROM o.consecutive_failures;
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE TRIGGER measurements_live_updates
+  AFTER INSERT ON measurements
+  REFERENCING NEW TABLE AS new_measurements
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION live_measurements_notify();
+
+CREATE OR REPLACE TRIGGER alerts_live_updates
+  AFTER INSERT ON alerts
+  REFERENCING NEW TABLE AS new_alerts
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION live_alerts_notify();
+
+CREATE OR REPLACE TRIGGER endpoints_live_updates
+  AFTER UPDATE ON endpoints
+  REFERENCING OLD TABLE AS old_endpoints NEW TABLE AS new_endpoints
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION live_endpoint_state_notify();
+
+-- The API caches resolved users; tell every replica when a user row
+-- changes or goes away
+CREATE OR REPLACE FUNCTION users_changed_notify()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_notify('user_changes', OLD.id::text);
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE TRIGGER users_changed
+  AFTER UPDATE OR DELETE ON users
+  FOR EACH ROW
+  EXECUTE FUNCTION users_changed_notify();
+
+-- ============================================================
+-- Data versions + shared response cache (API conditional GETs)
+-- ============================================================
+-- One version per user and kind of data, bumped by every statement that
+-- writes that kind: 'measurements' (also drives endpoint_status and the
+-- rollups), 'alerts' and 'endpoints' (config and alert state). Versions
+-- come from one sequence, so they never repeat. The API builds ETags from
+-- the versions a route reads and answers unchanged polls with a single
+-- lookup (see cached_response in backend/app/main.py).
+-- Rows are locked in user_id order and the worker always writes
+-- measurements, then alerts, then endpoints, so concurrent writers
+-- cannot deadlock here. No FK to users: bumps may race a user deletion.
+CREATE SEQUENCE IF NOT EXISTS data_versions_seq;
+
+CREATE TABLE IF NOT EXISTS data_versions (
+  user_id INT NOT NULL,
+  kind TEXT NOT NULL CHECK (kind IN ('measurements', 'alerts', 'endpoints')),
+  version BIGINT NOT NULL,
+  PRIMARY KEY (user_id, kind)
+);
+
+-- Rows carrying endpoint_id (measurements / alerts); kind in TG_ARGV[0]
+CREATE OR REPLACE FUNCTION data_versions_bump_by_endpoint()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO data_versions AS v (user_id, kind, version)
+  SELECT u.user_id, TG_ARGV[0], nextval('data_versions_seq')
+  FROM (
+    SELECT DISTINCT e.user_id
+    FROM changed_rows c
+    JOIN endpoints e ON e.id = c.endpoint_id
+    ORDER BY 1
+  ) u
+  ON CONFLICT (user_id, kind) DO UPDATE SET version = EXCLUDED.version;
+  RETURN NULL;
+END;
+$$;
+
+-- Rows of endpoints itself
+CREATE OR REPLACE FUNCTION data_versions_bump_by_user()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO data_versions AS v (user_id, kind, version)
+  SELECT u.user_id, 'endpoints', nextval('data_versions_seq')
+  FROM (SELECT DISTINCT user_id FROM changed_rows ORDER BY 1) u
+  ON CONFLICT (user_id, kind) DO UPDATE SET version = EXCLUDED.version;
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE TRIGGER measurements_data_version
+  AFTER INSERT ON measurements
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION data_versions_bump_by_endpoint('measurements');
+
+CREATE OR REPLACE TRIGGER alerts_data_version
+  AFTER INSERT ON alerts
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION data_versions_bump_by_endpoint('alerts');
+
+CREATE OR REPLACE TRIGGER endpoints_data_version_insert
+  AFTER INSERT ON endpoints
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION data_versions_bump_by_user();
+
+CREATE OR REPLACE TRIGGER endpoints_data_version_update
+  AFTER UPDATE ON endpoints
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION data_versions_bump_by_user();
+
+CREATE OR REPLACE TRIGGER endpoints_data_version_delete
+  AFTER DELETE ON endpoints
+  REFERENCING OLD TABLE AS changed_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION data_versions_bump_by_user();
+
+-- Rendered JSON bodies of cached read routes, shared by all API replicas.
+-- `tag` is the data_versions tag the body was computed at; a row is only
+-- served while the tag still matches. Unlogged: it is only a cache, and a
+-- crash just empties it. Stale keys are pruned by the worker
+-- (maintenance.py).
+CREATE UNLOGGED TABLE IF NOT EXISTS response_cache (
+  user_id INT NOT NULL,
+  key TEXT NOT NULL,
+  tag TEXT NOT NULL,
+  body BYTEA NOT NULL,
+  stored_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (user_id, key)
+);
+
+-- Results pushed through the ingest API (POST /api/measurements[/bulk]).
+-- The rows themselves go straight into measurements; a copy waits here
+-- until the worker owning the endpoint runs it through alert evaluation
+-- and deletes it (NOTIFY probe_inbox wakes it up).
+CREATE TABLE IF NOT EXISTS probe_inbox (
+  id BIGSERIAL PRIMARY KEY,
+  endpoint_id INT NOT NULL REFERENCES endpoints(id) ON DELETE CASCADE,
+  latency_ms INT,
+  status TEXT NOT NULL,
+  observed_at TIMESTAMPTZ NOT NULL,
+  received_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Checkpoint of the worker's in-memory state for the sliding-window rules
+-- (alerts.WindowRules), so a restart or shard handover does not start
+-- from empty windows. Written every ALERT_STATE_CHECKPOINT_SECONDS by the
+-- owning worker; the windows are packed little-endian arrays, oldest
+-- first: outcomes as int8 (1 = down), latencies as float32 ms with their
+-- float64 epoch timestamps.
+CREATE TABLE IF NOT EXISTS alert_rule_state (
+  endpoint_id INT PRIMARY KEY REFERENCES endpoints(id) ON DELETE CASCADE,
+  outcomes BYTEA NOT NULL DEFAULT '',
+  latencies BYTEA NOT NULL DEFAULT '',
+  latency_times BYTEA NOT NULL DEFAULT '',
+  failure_rate_active BOOLEAN NOT NULL DEFAULT FALSE,
+  latency_percentile_active BOOLEAN NOT NULL DEFAULT FALSE,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Worker fleet: every replica heartbeats here and leases a share of the
+-- shards (endpoint id % number of rows in worker_shards). Managed by the worker.
+CREATE TABLE IF NOT EXISTS workers (
+  worker_id TEXT PRIMARY KEY,
+  heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS worker_shards (
+  shard INT PRIMARY KEY,
+  owner TEXT,
+  expires_at TIMESTAMPTZ
+);
+
+INSERT INTO worker_shards (shard)
+SELECT generate_series(0, 63)
+ON CONFLICT DO NOTHING;
+
 -- Seed one test user + endpoint so the API has something to read
 INSERT INTO users (email, password_hash)
 VALUES ('demo@example.com', 'hash-placeholder')
@@ -51,4 +832,5 @@ ON CONFLICT DO NOTHING;
 INSERT INTO endpoints (user_id, name, url)
 SELECT id, 'Example API', 'https://example.com'
 FROM users WHERE email='demo@example.com'
+  AND NOT EXISTS (SELECT 1 FROM endpoints WHERE url = 'https://example.com')
 ON CONFLICT DO NOTHING;
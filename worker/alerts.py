@@ -0,0 +1,702 @@
+import os
+import time
+from array import array
+from datetime import datetime, timezone
+
+import numpy as np
+
+from scheduler import POLL_INTERVAL_SECONDS
+
+# Longest "last W checks" window a failure-rate rule can use. The API
+# reads the same settings to validate rules; a rule past these limits
+# (the two disagree) is clamped and logged once.
+FAILURE_RATE_MAX_WINDOW_CHECKS = int(os.getenv("FAILURE_RATE_MAX_WINDOW_CHECKS", "100"))
+# Latency samples kept per endpoint for percentile rules; with a short
+# check interval and a long window only the newest ones are used
+LATENCY_WINDOW_MAX_SAMPLES = int(os.getenv("LATENCY_WINDOW_MAX_SAMPLES", "256"))
+# A percentile over fewer samples than this never fires
+LATENCY_PERCENTILE_MIN_SAMPLES = int(os.getenv("LATENCY_PERCENTILE_MIN_SAMPLES", "5"))
+
+NAN = float("nan")
+
+ALERT_DOWN = 1
+ALERT_LATENCY = 2
+
+
+def _rounds(slots):
+    """
+    Cut a batch into rounds holding at most one result per slot (round k =
+    k-th result of every slot), so per-slot order is kept while each round
+    is applied with plain fancy indexing. Usually there is a single round.
+    """
+    n = len(slots)
+    if np.bincount(slots).max() == 1:
+        return [np.arange(n)]
+
+    # Rank of each result among the results of its slot
+    order = np.argsort(slots, kind="stable")
+    sorted_slots = slots[order]
+    starts = np.empty(n, dtype=bool)
+    starts[0] = True
+    np.not_equal(sorted_slots[1:], sorted_slots[:-1], out=starts[1:])
+    positions = np.arange(n)
+    rank = positions - np.maximum.accumulate(np.where(starts, positions, 0))
+
+    by_round = order[np.argsort(rank, kind="stable")]
+    return np.split(by_round, np.cumsum(np.bincount(rank))[:-1])
+
+
+def evaluate_batch(slots, latency_ms, down, failures, active, latency_threshold, fail_threshold):
+    """
+    Apply the alert rules to a batch of results, column-wise.
+
+      slots              int array, state slot of each result (arrival order)
+      latency_ms         float array, NaN where the probe got no latency
+      down               bool array
+      failures, active   current state per slot (updated in place)
+      *_threshold        config per slot
+
+    Rules (same as the per-endpoint version this replaces):
+      - down: fail_threshold consecutive "down" and no active alert
+      - latency: an "up" slower than latency_threshold and no active alert
+      - recovery: an "up" within the threshold clears the active alert
+
+    An endpoint with several results in the batch has them applied in
+    order, see _rounds.
+
+    Returns (alert_idx, alert_type, alert_failures): result index, type
+    (ALERT_DOWN / ALERT_LATENCY) and failure count of every alert fired.
+    """
+    if len(slots) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    fired = [
+        _evaluate_round(
+            idx, slots, latency_ms, down, failures, active,
+            latency_threshold, fail_threshold,
+        )
+        for idx in _rounds(slots)
+    ]
+    if len(fired) == 1:
+        return fired[0]
+    return tuple(np.concatenate(parts) for parts in zip(*fired))
+
+
+def _evaluate_round(idx, slots, latency_ms, down, failures, active, latency_threshold, fail_threshold):
+    """One round of evaluate_batch: the results at idx, at most one per slot."""
+    s = slots[idx]
+    is_down = down[idx]
+    was_active = active[s]
+
+    new_failures = np.where(is_down, failures[s] + 1, 0)
+    fire_down = is_down & (new_failures >= fail_threshold[s]) & ~was_active
+    # NaN compares False, so results without latency never fire / always clear
+    too_slow = latency_ms[idx] > latency_threshold[s]
+    fire_latency = ~is_down & too_slow & ~was_active
+    recovered = was_active & ~is_down & ~too_slow
+
+    failures[s] = new_failures
+    active[s] = (was_active | fire_down | fire_latency) & ~recovered
+
+    fired = fire_down | fire_latency
+    return (
+        idx[fired],
+        np.where(fire_down[fired], ALERT_DOWN, ALERT_LATENCY),
+        new_failures[fired],
+    )
+
+
+class WindowRules:
+    """
+    Incremental state for the sliding-window rules of the endpoints that
+    have one configured (one row each):
+
+      - failure rate: ring buffer of the last window_checks outcomes plus
+        a running count of the "down" ones, so adding a result is O(1)
+      - latency percentile: ring buffer of the latencies of the last
+        window_minutes (at most LATENCY_WINDOW_MAX_SAMPLES) with their
+        timestamps, plus running counts of the samples in the window and
+        of those at or below threshold_ms. A sample is counted when pushed
+        and uncounted when it falls out of the window, so neither adding
+        one nor checking the rule scans the window
+
+    A rule fires when its condition becomes true and re-arms once it is
+    false again; it does not touch consecutive_failures / alert_active.
+    Rows changed since the last checkpoint() are tracked so only those
+    are written back to alert_rule_state.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._free = []
+        self._released = []
+        self._used = 0
+        self._dirty = set()
+        # (endpoint_id, rule, window) already logged as clamped
+        self._clamped = set()
+        self.endpoint_id = np.zeros(capacity, dtype=np.int64)
+        # failure rate (window_checks 0 = rule off)
+        self.rate_pct = np.zeros(capacity, dtype=np.float64)
+        self.rate_window = np.zeros(capacity, dtype=np.int64)
+        self.outcomes = np.zeros((capacity, FAILURE_RATE_MAX_WINDOW_CHECKS), dtype=np.int8)
+        self.outcome_pos = np.zeros(capacity, dtype=np.int64)
+        self.outcome_count = np.zeros(capacity, dtype=np.int64)
+        self.outcome_failures = np.zeros(capacity, dtype=np.int64)
+        self.rate_active = np.zeros(capacity, dtype=bool)
+        # latency percentile (percentile NaN = rule off)
+        self.percentile = np.full(capacity, np.nan)
+        self.pct_window_seconds = np.zeros(capacity, dtype=np.float64)
+        self.pct_threshold = np.zeros(capacity, dtype=np.float64)
+        self.latencies = np.zeros((capacity, LATENCY_WINDOW_MAX_SAMPLES), dtype=np.float32)
+        self.latency_times = np.zeros((capacity, LATENCY_WINDOW_MAX_SAMPLES), dtype=np.float64)
+        # Samples in the window sit at [latency_tail, latency_tail + latency_count)
+        self.latency_tail = np.zeros(capacity, dtype=np.int64)
+        self.latency_count = np.zeros(capacity, dtype=np.int64)
+        self.latency_within = np.zeros(capacity, dtype=np.int64)
+        self.pct_active = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        for name, value in vars(self).items():
+            if isinstance(value, np.ndarray):
+                fill = np.nan if name == "percentile" else 0
+                new = np.full((len(value) * 2, *value.shape[1:]), fill, dtype=value.dtype)
+                new[: len(value)] = value
+                setattr(self, name, new)
+
+    def _reset_rate(self, row):
+        self.outcomes[row] = 0
+        self.outcome_pos[row] = self.outcome_count[row] = self.outcome_failures[row] = 0
+        self.rate_active[row] = False
+
+    def _reset_latency(self, row):
+        self.latency_tail[row] = self.latency_count[row] = self.latency_within[row] = 0
+        self.pct_active[row] = False
+
+    def _load_outcomes(self, row, outcomes):
+        outcomes = outcomes[-self.rate_window[row]:]
+        n = len(outcomes)
+        self.outcomes[row, :n] = outcomes
+        self.outcome_pos[row] = n % self.rate_window[row]
+        self.outcome_count[row] = n
+        self.outcome_failures[row] = int(outcomes.sum())
+
+    def _outcome_history(self, row):
+        """Outcomes of the row, oldest first."""
+        window, count = self.rate_window[row], self.outcome_count[row]
+        return self.outcomes[row, (self.outcome_pos[row] - count + np.arange(count)) % window]
+
+    def _latency_history(self, row):
+        """(latencies, times) in the window of the row, oldest first."""
+        keep = (self.latency_tail[row] + np.arange(self.latency_count[row])) % LATENCY_WINDOW_MAX_SAMPLES
+        return self.latencies[row, keep], self.latency_times[row, keep]
+
+    def _load_latencies(self, row, latencies, times):
+        n = min(len(latencies), len(times), LATENCY_WINDOW_MAX_SAMPLES)
+        self.latencies[row, :n] = latencies[len(latencies) - n:]
+        self.latency_times[row, :n] = times[len(times) - n:]
+        self.latency_tail[row] = 0
+        self.latency_count[row] = n
+        self._recount_latencies(row)
+
+    def _recount_latencies(self, row):
+        """Redo the running counts after a window / threshold change."""
+        latencies, times = self._latency_history(row)
+        self.latency_within[row] = int((latencies <= self.pct_threshold[row]).sum())
+        if len(times):
+            self._expire(np.array([row]), times[-1])
+
+    def _expire(self, rows, newest):
+        """Uncount the samples of each row older than its window (newest = now)."""
+        cutoff = newest - self.pct_window_seconds[rows]
+        while len(rows):
+            tail = self.latency_tail[rows]
+            old = (self.latency_count[rows] > 0) & (self.latency_times[rows, tail] <= cutoff)
+            rows, tail, cutoff = rows[old], tail[old], cutoff[old]
+            self.latency_within[rows] -= self.latencies[rows, tail] <= self.pct_threshold[rows]
+            self.latency_tail[rows] = (tail + 1) % LATENCY_WINDOW_MAX_SAMPLES
+            self.latency_count[rows] -= 1
+
+    @staticmethod
+    def rules_of(row: dict):
+        """(failure rate, latency percentile) config of an endpoints row, None = off."""
+        rate = (row.get("failure_rate_threshold_pct"), row.get("failure_rate_window_checks"))
+        pct = (
+            row.get("latency_percentile"),
+            row.get("latency_percentile_window_minutes"),
+            row.get("latency_percentile_threshold_ms"),
+        )
+        return (
+            None if None in rate else (rate[0], min(rate[1], FAILURE_RATE_MAX_WINDOW_CHECKS)),
+            None if None in pct else pct,
+        )
+
+    def configure(self, row_index, endpoint_row: dict, from_checkpoint: bool):
+        """
+        Apply the rules of an endpoints row to its window row (allocated if
+        row_index is None). Returns the row index, or None if the endpoint
+        has no window rule. With from_checkpoint the windows are restored
+        from the alert_rule_state columns of the row.
+        """
+        rate, pct = self.rules_of(endpoint_row)
+        self._log_clamped(endpoint_row, rate, pct)
+        if rate is None and pct is None:
+            if row_index is not None:
+                self.release(row_index)
+            return None
+
+        if row_index is None:
+            if self._free:
+                row_index = self._free.pop()
+            else:
+                row_index = self._used
+                self._used += 1
+                if row_index >= len(self.endpoint_id):
+                    self._grow()
+            self.endpoint_id[row_index] = endpoint_row["id"]
+            self._reset_rate(row_index)
+            self._reset_latency(row_index)
+            self.rate_window[row_index] = 0
+            self.percentile[row_index] = np.nan
+        r = row_index
+
+        if rate is None:
+            if self.rate_window[r]:
+                self._reset_rate(r)
+            self.rate_window[r] = 0
+        else:
+            history = None
+            if from_checkpoint:
+                history = np.frombuffer(endpoint_row.get("outcomes") or b"", dtype=np.int8)
+                active = bool(endpoint_row.get("failure_rate_active"))
+            elif self.rate_window[r] != rate[1]:
+                # Window resized: keep the newest outcomes that still fit
+                history = self._outcome_history(r) if self.rate_window[r] else np.empty(0, np.int8)
+                active = self.rate_active[r]
+            if history is not None:
+                self._reset_rate(r)
+                self.rate_window[r] = rate[1]
+                self.rate_active[r] = active
+                self._load_outcomes(r, history)
+            self.rate_pct[r] = rate[0]
+
+        if pct is None:
+            if not np.isnan(self.percentile[r]):
+                self._reset_latency(r)
+            self.percentile[r] = np.nan
+        else:
+            resized = (
+                self.pct_window_seconds[r] != pct[1] * 60 or self.pct_threshold[r] != pct[2]
+            )
+            self.percentile[r] = pct[0]
+            self.pct_window_seconds[r] = pct[1] * 60
+            self.pct_threshold[r] = pct[2]
+            if from_checkpoint:
+                self._load_latencies(
+                    r,
+                    np.frombuffer(endpoint_row.get("latencies") or b"", dtype="<f4"),
+                    np.frombuffer(endpoint_row.get("latency_times") or b"", dtype="<f8"),
+                )
+                self.pct_active[r] = bool(endpoint_row.get("latency_percentile_active"))
+            elif resized:
+                self._recount_latencies(r)
+
+        self._dirty.add(r)
+        return r
+
+    def _log_clamped(self, endpoint_row: dict, rate, pct):
+        ep_id = endpoint_row["id"]
+        if rate is not None and endpoint_row["failure_rate_window_checks"] > rate[1]:
+            key = (ep_id, "failure_rate", endpoint_row["failure_rate_window_checks"])
+            if key not in self._clamped:
+                self._clamped.add(key)
+                print(
+                    f"[worker] Endpoint {ep_id}: failure rate window of {key[2]} checks "
+                    f"is clamped to FAILURE_RATE_MAX_WINDOW_CHECKS ({rate[1]})"
+                )
+        if pct is not None:
+            interval = endpoint_row.get("check_interval_seconds") or POLL_INTERVAL_SECONDS
+            samples = pct[1] * 60 / interval
+            key = (ep_id, "latency_percentile", pct[1])
+            if samples > LATENCY_WINDOW_MAX_SAMPLES and key not in self._clamped:
+                self._clamped.add(key)
+                print(
+                    f"[worker] Endpoint {ep_id}: latency percentile window of {pct[1]} min "
+                    f"needs ~{samples:.0f} samples, only the newest "
+                    f"LATENCY_WINDOW_MAX_SAMPLES ({LATENCY_WINDOW_MAX_SAMPLES}) are used"
+                )
+
+    def release(self, row_index):
+        """
+        Give a row back. It is only reused after reclaim(), so results
+        queued against it before the release cannot land on another
+        endpoint's windows.
+        """
+        self._released.append(row_index)
+        self._dirty.discard(row_index)
+
+    def reclaim(self):
+        """Make the rows released so far reusable (see AlertEvaluator.evaluate)."""
+        self._free.extend(self._released)
+        self._released = []
+
+    def update(self, rows, down, latency_ms, times):
+        """
+        Push a batch of results (at most one per row) into the windows.
+        """
+        rate_on = self.rate_window[rows] > 0
+        r = rows[rate_on]
+        if len(r):
+            d = down[rate_on].astype(np.int8)
+            pos = self.outcome_pos[r]
+            self.outcome_failures[r] += d - self.outcomes[r, pos]
+            self.outcomes[r, pos] = d
+            self.outcome_pos[r] = (pos + 1) % self.rate_window[r]
+            self.outcome_count[r] = np.minimum(self.outcome_count[r] + 1, self.rate_window[r])
+
+        sampled = ~np.isnan(self.percentile[rows]) & ~np.isnan(latency_ms)
+        r = rows[sampled]
+        if len(r):
+            # A full ring drops its oldest sample to make room
+            full = r[self.latency_count[r] == LATENCY_WINDOW_MAX_SAMPLES]
+            if len(full):
+                tail = self.latency_tail[full]
+                self.latency_within[full] -= self.latencies[full, tail] <= self.pct_threshold[full]
+                self.latency_tail[full] = (tail + 1) % LATENCY_WINDOW_MAX_SAMPLES
+                self.latency_count[full] -= 1
+
+            latency = latency_ms[sampled]
+            pos = (self.latency_tail[r] + self.latency_count[r]) % LATENCY_WINDOW_MAX_SAMPLES
+            self.latencies[r, pos] = latency
+            self.latency_times[r, pos] = times[sampled]
+            self.latency_count[r] += 1
+            self.latency_within[r] += latency <= self.pct_threshold[r]
+            self._expire(r, times[sampled])
+
+    def check(self, rows):
+        """
+        Evaluate the window rules of the given (distinct) rows. Returns
+        (rate_fired, failure_pct, pct_fired, percentile_ms) aligned with rows.
+        """
+        self._dirty.update(rows.tolist())
+        window = self.rate_window[rows]
+        failure_pct = np.where(
+            window > 0, self.outcome_failures[rows] * 100.0 / np.maximum(window, 1), 0.0
+        )
+        rate_cond = (window > 0) & (self.outcome_count[rows] >= window) & (
+            failure_pct >= self.rate_pct[rows]
+        )
+
+        pct_cond = np.zeros(len(rows), dtype=bool)
+        pct_on = np.flatnonzero(~np.isnan(self.percentile[rows]))
+        if len(pct_on):
+            r = rows[pct_on]
+            count = self.latency_count[r]
+            # Nearest-rank percentile p (always one of the samples) is above
+            # the threshold iff fewer than ceil(p * n) samples are at or
+            # below it, so the running counts are enough
+            rank = np.ceil(self.percentile[r] / 100.0 * count)
+            pct_cond[pct_on] = (count >= LATENCY_PERCENTILE_MIN_SAMPLES) & (self.latency_within[r] < rank)
+
+        rate_fired = rate_cond & ~self.rate_active[rows]
+        pct_fired = pct_cond & ~self.pct_active[rows]
+
+        # The value itself is only needed for the alerts that fire
+        percentile_ms = np.full(len(rows), np.nan)
+        for k in np.flatnonzero(pct_fired).tolist():
+            values = np.sort(self._latency_history(rows[k])[0])
+            percentile_ms[k] = values[int(np.ceil(self.percentile[rows[k]] / 100.0 * len(values))) - 1]
+
+        self.rate_active[rows] = rate_cond
+        self.pct_active[rows] = pct_cond
+        return rate_fired, failure_pct, pct_fired, percentile_ms
+
+    def checkpoint(self):
+        """
+        Rows changed since the last call, as alert_rule_state rows:
+        (endpoint_id, outcomes, latencies, latency_times,
+         failure_rate_active, latency_percentile_active).
+        """
+        out = []
+        for r in self._dirty:
+            outcomes = self._outcome_history(r) if self.rate_window[r] else np.empty(0, np.int8)
+            latencies, times = self._latency_history(r)
+            out.append((
+                int(self.endpoint_id[r]),
+                outcomes.astype(np.int8).tobytes(),
+                latencies.astype("<f4").tobytes(),
+                times.astype("<f8").tobytes(),
+                bool(self.rate_active[r]),
+                bool(self.pct_active[r]),
+            ))
+        self._dirty.clear()
+        return out
+
+
+class AlertEvaluator:
+    """
+    Alert state of the scheduled endpoints kept column-wise (one slot per
+    endpoint), plus the results recorded since the last evaluate(). The
+    worker records every probe / pushed result as it arrives and evaluates
+    them all right before each flush, so the per-cycle cost is a handful of
+    array operations instead of Python per endpoint. Sliding-window rules
+    live in WindowRules. No DB access here.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._slot = {}
+        self._free = []
+        # Slots of removed endpoints, reusable after the next evaluate()
+        self._retired = []
+        self._used = 0
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._failures = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._latency_threshold = np.zeros(capacity, dtype=np.float64)
+        self._fail_threshold = np.zeros(capacity, dtype=np.int64)
+        # Row in self.windows, -1 for endpoints without window rules
+        self._window_row = np.full(capacity, -1, dtype=np.int64)
+        self.windows = WindowRules()
+        self._clear_pending()
+
+    def __len__(self):
+        return len(self._slot)
+
+    def __contains__(self, endpoint_id):
+        return endpoint_id in self._slot
+
+    def pending(self) -> int:
+        return len(self._slots)
+
+    def _clear_pending(self):
+        # Typed buffers so evaluate() can view them as arrays without a copy
+        self._slots = array("q")
+        self._latencies = array("d")
+        self._down = array("b")
+        self._times = array("d")
+        self._observed_at = []
+
+    def _grow(self):
+        size = len(self._ids) * 2
+        for name in ("_ids", "_failures", "_active", "_latency_threshold", "_fail_threshold", "_window_row"):
+            old = getattr(self, name)
+            new = np.full(size, -1 if name == "_window_row" else 0, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def upsert(self, row):
+        """
+        Add an endpoint with the state stored in the row (and the window
+        checkpoint, if it has one), or only refresh the config of one
+        already tracked (its state is ours).
+        """
+        slot = self._slot.get(row["id"])
+        new = slot is None
+        if new:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = self._used
+                self._used += 1
+                if slot >= len(self._ids):
+                    self._grow()
+            self._slot[row["id"]] = slot
+            self._ids[slot] = row["id"]
+            self._failures[slot] = row["consecutive_failures"] or 0
+            self._active[slot] = bool(row["alert_active"])
+            self._window_row[slot] = -1
+        self._latency_threshold[slot] = row["latency_threshold_ms"]
+        self._fail_threshold[slot] = row["consecutive_fail_threshold"]
+
+        current = self._window_row[slot]
+        window_row = self.windows.configure(
+            None if current < 0 else int(current), row, from_checkpoint=new
+        )
+        self._window_row[slot] = -1 if window_row is None else window_row
+
+    def remove(self, endpoint_id: int):
+        slot = self._slot.pop(endpoint_id, None)
+        if slot is not None:
+            if self._window_row[slot] >= 0:
+                self.windows.release(int(self._window_row[slot]))
+                self._window_row[slot] = -1
+            # Results still queued for the slot are dropped by the next
+            # evaluate(); only then may another endpoint take it over
+            self._retired.append(slot)
+
+    def record(self, endpoint_id: int, latency_ms, status: str, observed_at) -> bool:
+        """Queue a result for the next evaluate(); False if not tracked."""
+        slot = self._slot.get(endpoint_id)
+        if slot is None:
+            return False
+        self._slots.append(slot)
+        self._latencies.append(NAN if latency_ms is None else latency_ms)
+        self._down.append(status == "down")
+        self._times.append(observed_at.timestamp())
+        self._observed_at.append(observed_at)
+        return True
+
+    def checkpoint(self):
+        """Window state changed since the last call, see WindowRules.checkpoint."""
+        return self.windows.checkpoint()
+
+    def evaluate(self):
+        """
+        Run the rules over everything recorded since the last call.
+        Returns (transitions, alerts):
+          transitions  [(endpoint_id, consecutive_failures, alert_active, alerted)]
+                       for endpoints whose state changed or that alerted
+          alerts       [(endpoint_id, type, message, value, created_at)]
+        """
+        slots = np.frombuffer(self._slots, dtype=np.int64)
+        latency = np.frombuffer(self._latencies, dtype=np.float64)
+        down = np.frombuffer(self._down, dtype=np.int8).astype(bool)
+        times = np.frombuffer(self._times, dtype=np.float64)
+        observed_at = self._observed_at
+        self._clear_pending()
+
+        retired, self._retired = self._retired, []
+        if retired and len(slots):
+            keep = np.flatnonzero(~np.isin(slots, retired))
+            slots, latency, down, times = slots[keep], latency[keep], down[keep], times[keep]
+            observed_at = [observed_at[i] for i in keep.tolist()]
+        self._free.extend(retired)
+        self.windows.reclaim()
+        if not len(slots):
+            return [], []
+
+        touched = np.flatnonzero(np.bincount(slots))
+        before_failures = self._failures[touched].copy()
+        before_active = self._active[touched].copy()
+
+        alert_idx, alert_type, alert_failures = evaluate_batch(
+            slots, latency, down,
+            self._failures, self._active,
+            self._latency_threshold, self._fail_threshold,
+        )
+
+        alerts = []
+        for i, kind, fails in zip(alert_idx.tolist(), alert_type.tolist(), alert_failures.tolist()):
+            ep_id = int(self._ids[slots[i]])
+            if kind == ALERT_DOWN:
+                alerts.append((
+                    ep_id, "down",
+                    f"Endpoint is DOWN for {fails} consecutive checks",
+                    None, observed_at[i],
+                ))
+            else:
+                latency_ms = int(latency[i])
+                threshold = int(self._latency_threshold[slots[i]])
+                alerts.append((
+                    ep_id, "latency",
+                    f"Latency {latency_ms} ms exceeded threshold {threshold} ms",
+                    latency_ms, observed_at[i],
+                ))
+        alerted_slots = [slots[alert_idx]]
+
+        windowed = np.flatnonzero(self._window_row[slots] >= 0)
+        if len(windowed):
+            alerted_slots.append(self._evaluate_windows(slots, latency, down, times, observed_at, windowed, alerts))
+
+        alerted = np.isin(touched, np.concatenate(alerted_slots))
+        changed = (
+            (self._failures[touched] != before_failures)
+            | (self._active[touched] != before_active)
+            | alerted
+        )
+        touched = touched[changed]
+        transitions = list(zip(
+            self._ids[touched].tolist(),
+            self._failures[touched].tolist(),
+            self._active[touched].tolist(),
+            alerted[changed].tolist(),
+        ))
+        return transitions, alerts
+
+    def _evaluate_windows(self, slots, latency, down, times, observed_at, windowed, alerts):
+        """
+        Push the results at `windowed` into the window rules, evaluate them
+        once per endpoint and append the alerts fired. Returns the slots
+        that alerted.
+        """
+        w = self.windows
+        rows = self._window_row[slots[windowed]]
+        for idx in _rounds(rows):
+            at = windowed[idx]
+            w.update(rows[idx], down[at], latency[at], times[at])
+
+        # Alerts are stamped with the endpoint's last result in the batch
+        last = np.full(len(w.endpoint_id), -1, dtype=np.int64)
+        np.maximum.at(last, rows, windowed)
+        checked = np.flatnonzero(last >= 0)
+        rate_fired, failure_pct, pct_fired, percentile_ms = w.check(checked)
+
+        for k in np.flatnonzero(rate_fired).tolist():
+            r = checked[k]
+            pct = int(round(failure_pct[k]))
+            alerts.append((
+                int(w.endpoint_id[r]), "failure_rate",
+                f"{pct}% of the last {w.rate_window[r]} checks failed "
+                f"(threshold {w.rate_pct[r]:g}%)",
+                pct, observed_at[last[r]],
+            ))
+        for k in np.flatnonzero(pct_fired).tolist():
+            r = checked[k]
+            value = int(percentile_ms[k])
+            alerts.append((
+                int(w.endpoint_id[r]), "latency_percentile",
+                f"p{w.percentile[r]:g} latency {value} ms over the last "
+                f"{w.pct_window_seconds[r] / 60:g} min exceeded threshold {w.pct_threshold[r]:g} ms",
+                value, observed_at[last[r]],
+            ))
+        return slots[last[checked[rate_fired | pct_fired]]]
+
+
+def bench(endpoints: int = 100_000, results_per_endpoint: int = 1, windowed: int = 0):
+    """
+    Time one evaluate() over `endpoints` endpoints with random results, the
+    first `windowed` of them with both window rules configured
+    (python alerts.py [endpoints] [results per endpoint] [windowed]).
+    """
+    rng = np.random.default_rng(0)
+    evaluator = AlertEvaluator()
+    for ep_id in range(1, endpoints + 1):
+        evaluator.upsert({
+            "id": ep_id,
+            "consecutive_failures": 0,
+            "alert_active": bool(rng.random() < 0.01),
+            "latency_threshold_ms": 300,
+            "consecutive_fail_threshold": 3,
+            **({
+                "failure_rate_threshold_pct": 20,
+                "failure_rate_window_checks": 50,
+                "latency_percentile": 95,
+                "latency_percentile_window_minutes": 15,
+                "latency_percentile_threshold_ms": 250,
+            } if ep_id <= windowed else {}),
+        })
+
+    n = endpoints * results_per_endpoint
+    ids = rng.permutation(np.tile(np.arange(1, endpoints + 1), results_per_endpoint)).tolist()
+    latencies = rng.gamma(2.0, 40.0, n).astype(int).tolist()
+    downs = (rng.random(n) < 0.01).tolist()
+    now = datetime.now(timezone.utc)
+
+    start = time.perf_counter()
+    for ep_id, latency_ms, is_down in zip(ids, latencies, downs):
+        evaluator.record(ep_id, None if is_down else latency_ms, "down" if is_down else "up", now)
+    recorded = time.perf_counter()
+    transitions, alerts = evaluator.evaluate()
+    done = time.perf_counter()
+
+    print(
+        f"{n} results / {endpoints} endpoints ({windowed} with window rules): "
+        f"record {(recorded - start) * 1000:.1f} ms, "
+        f"evaluate {(done - recorded) * 1000:.1f} ms "
+        f"({len(transitions)} transitions, {len(alerts)} alerts)"
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    bench(*(int(a) for a in sys.argv[1:4]))
@@ -0,0 +1,106 @@
+import os
+
+# Raw rows older than this are dropped a whole partition at a time
+MEASUREMENT_RETENTION_DAYS = int(os.getenv("MEASUREMENT_RETENTION_DAYS", "90"))
+ALERT_RETENTION_DAYS = int(os.getenv("ALERT_RETENTION_DAYS", "365"))
+
+# Rollup buckets finer than a day are only read for short windows (see
+# /stats), so they are kept for less time; day buckets are kept forever
+ROLLUP_MINUTE_RETENTION_DAYS = int(os.getenv("ROLLUP_MINUTE_RETENTION_DAYS", "7"))
+ROLLUP_HOUR_RETENTION_DAYS = int(os.getenv("ROLLUP_HOUR_RETENTION_DAYS", "90"))
+
+# Pushed results nobody evaluated (no worker owned the endpoint) are
+# dropped from probe_inbox after this; the measurements are kept
+PROBE_INBOX_RETENTION_HOURS = float(os.getenv("PROBE_INBOX_RETENTION_HOURS", "24"))
+
+# Rendered API responses (response_cache) not refreshed for this long are
+# dropped; they are only reused while the data versions are unchanged
+RESPONSE_CACHE_RETENTION_HOURS = float(os.getenv("RESPONSE_CACHE_RETENTION_HOURS", "24"))
+
+# Daily measurement partitions are created this many days ahead
+PARTITION_PREMAKE_DAYS = int(os.getenv("PARTITION_PREMAKE_DAYS", "7"))
+
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "3600"))
+
+# Arbitrary key for pg_try_advisory_xact_lock so only one replica runs
+# maintenance at a time
+MAINTENANCE_LOCK_KEY = 7_400_001
+
+
+async def maintain_partitions(conn):
+    """
+    Create upcoming partitions and drop the ones past retention for
+    measurements (daily) and alerts (monthly), see ensure_time_partitions /
+    drop_time_partitions in init.sql, and prune old rollup buckets, stale
+    probe_inbox rows and stale response_cache entries.
+    Returns None if another replica holds the maintenance lock, otherwise
+    a dict with the number of partitions created / dropped and rollup /
+    inbox / cache rows deleted.
+    """
+    async with conn.transaction():
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT pg_try_advisory_xact_lock(%s) AS locked;",
+                (MAINTENANCE_LOCK_KEY,),
+            )
+            if not (await cur.fetchone())["locked"]:
+                return None
+
+            await cur.execute(
+                """
+                SELECT
+                  ensure_time_partitions(
+                    'measurements', '1 day',
+                    NOW() - interval '1 day',
+                    NOW() + make_interval(days => %(premake)s)
+                  ) + ensure_time_partitions(
+                    'alerts', '1 month',
+                    NOW(),
+                    NOW() + interval '2 months'
+                  ) AS created,
+                  drop_time_partitions(
+                    'measurements', '1 day',
+                    NOW() - make_interval(days => %(measurement_days)s)
+                  ) + drop_time_partitions(
+                    'alerts', '1 month',
+                    NOW() - make_interval(days => %(alert_days)s)
+                  ) AS dropped;
+                """,
+                {
+                    "premake": PARTITION_PREMAKE_DAYS,
+                    "measurement_days": MEASUREMENT_RETENTION_DAYS,
+                    "alert_days": ALERT_RETENTION_DAYS,
+                },
+            )
+            result = await cur.fetchone()
+
+            await cur.execute(
+                """
+                DELETE FROM measurement_rollups
+                WHERE (resolution = 'minute'
+                       AND bucket_start < NOW() - make_interval(days => %s))
+                   OR (resolution = 'hour'
+                       AND bucket_start < NOW() - make_interval(days => %s));
+                """,
+                (ROLLUP_MINUTE_RETENTION_DAYS, ROLLUP_HOUR_RETENTION_DAYS),
+            )
+            result["rollups_deleted"] = cur.rowcount
+
+            await cur.execute(
+                """
+                DELETE FROM probe_inbox
+                WHERE received_at < NOW() - make_interval(secs => %s);
+                """,
+                (PROBE_INBOX_RETENTION_HOURS * 3600,),
+            )
+            result["inbox_deleted"] = cur.rowcount
+
+            await cur.execute(
+                """
+                DELETE FROM response_cache
+                WHERE stored_at < NOW() - make_interval(secs => %s);
+                """,
+                (RESPONSE_CACHE_RETENTION_HOURS * 3600,),
+            )
+            result["cache_deleted"] = cur.rowcount
+            return result
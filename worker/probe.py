@@ -0,0 +1,319 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import ssl
+import time
+from collections import Counter, OrderedDict
+
+import aiohttp
+from yarl import URL
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "5.0"))
+
+# Max probes in flight across all hosts / against a single host
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "200"))
+PROBE_CONCURRENCY_PER_HOST = int(os.getenv("PROBE_CONCURRENCY_PER_HOST", "10"))
+
+# How long an idle keep-alive connection stays in the pool
+PROBE_KEEPALIVE_SECONDS = float(os.getenv("PROBE_KEEPALIVE_SECONDS", "75"))
+
+# Resolved addresses are reused for this long by warm probes. getaddrinfo
+# does not expose record TTLs, so keep this at or below the shortest TTL
+# of the monitored hosts; the system resolver honours TTLs underneath.
+DNS_CACHE_TTL_SECONDS = float(os.getenv("DNS_CACHE_TTL_SECONDS", "30"))
+
+# TLS sessions kept for resumption by warm probes (one per host)
+TLS_SESSION_CACHE_SIZE = int(os.getenv("TLS_SESSION_CACHE_SIZE", "10000"))
+
+# Probe modes (endpoints.probe_mode):
+#   warm  pooled keep-alive connections, DNS cache, TLS session resumption;
+#         what a returning client sees
+#   cold  every probe resolves, connects and does a full TLS handshake on a
+#         fresh connection; what a first-time client sees
+PROBE_MODES = ("warm", "cold")
+
+# Phase timings reported by ProbeEngine.probe, in microseconds, in this
+# order (the measurements columns of the same name):
+#   dns_us      host resolution (0 on a DNS cache hit / reused connection)
+#   connect_us  TCP connect (0 on a reused connection)
+#   tls_us      TLS handshake (0 for plain http / reused connection)
+#   ttfb_us     connection ready -> response headers (request + server time)
+#   total_us    whole probe, body included unless headers_only
+PHASES = ("dns_us", "connect_us", "tls_us", "ttfb_us", "total_us")
+
+# Timings dict of the probe running in the current task, for TimedConnector
+_probe_timings = contextvars.ContextVar("probe_timings", default=None)
+
+
+def _stamp(name: str, first: bool = True):
+    """
+    TraceConfig callback recording perf_counter() under `name` in the
+    probe's timings dict (passed as trace_request_ctx). With first=True
+    only the first occurrence counts, i.e. the first hop of a redirect.
+    """
+    async def on_signal(session, ctx, params):
+        timings = ctx.trace_request_ctx
+        if timings is None:
+            return
+        if first:
+            timings.setdefault(name, time.perf_counter())
+        else:
+            timings[name] = time.perf_counter()
+    return on_signal
+
+
+def _trace_config():
+    trace = aiohttp.TraceConfig()
+    trace.on_dns_resolvehost_start.append(_stamp("dns_start"))
+    trace.on_dns_resolvehost_end.append(_stamp("dns_end"))
+    trace.on_dns_cache_hit.append(_stamp("dns_hit"))
+    trace.on_connection_create_start.append(_stamp("connect_start"))
+    trace.on_connection_create_end.append(_stamp("ready"))
+    trace.on_connection_reuseconn.append(_stamp("ready"))
+    # Sent once the final response's headers are in
+    trace.on_request_end.append(_stamp("headers", first=False))
+    return trace
+
+
+class TimedConnector(aiohttp.TCPConnector):
+    """
+    TCPConnector that also marks the end of the TCP connect, so connection
+    setup splits into connect and TLS handshake: the protocol factory is
+    called once the socket is connected, before any TLS handshake starts.
+    Tracing only reports the connection as a whole. The SSL object of a
+    new TLS connection is kept too, for ResumingSSLContext.save().
+    """
+
+    async def _wrap_create_connection(self, *args, **kwargs):
+        timings = _probe_timings.get()
+        if timings is not None and args:
+            factory = args[0]
+
+            def timed_factory():
+                timings.setdefault("tcp_done", time.perf_counter())
+                return factory()
+
+            args = (timed_factory, *args[1:])
+        transport, protocol = await super()._wrap_create_connection(*args, **kwargs)
+        if timings is not None:
+            timings.setdefault("ssl_object", transport.get_extra_info("ssl_object"))
+        return transport, protocol
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """
+    Client SSLContext that resumes TLS sessions: the last session seen for
+    a host is offered on the next handshake to it (wrap_bio is what asyncio
+    calls for every new TLS connection). asyncio has no session parameter
+    of its own, so sessions are saved by the prober after each new
+    connection, see save().
+    """
+
+    def __new__(cls, size: int = TLS_SESSION_CACHE_SIZE):
+        return super().__new__(cls, ssl.PROTOCOL_TLS_CLIENT)
+
+    def __init__(self, size: int = TLS_SESSION_CACHE_SIZE):
+        self.load_default_certs()
+        self.size = size
+        self.sessions = OrderedDict()
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        if session is None and not server_side:
+            session = self.sessions.get(server_hostname)
+        return super().wrap_bio(incoming, outgoing, server_side, server_hostname, session)
+
+    def save(self, host: str, ssl_object) -> bool:
+        """
+        Keep the session of a newly established connection to `host`.
+        Returns whether the handshake resumed the session we offered.
+        """
+        if ssl_object.session is not None:
+            self.sessions[host] = ssl_object.session
+            self.sessions.move_to_end(host)
+            if len(self.sessions) > self.size:
+                self.sessions.popitem(last=False)
+        return ssl_object.session_reused
+
+
+def phase_timings(timings: dict, secure: bool):
+    """
+    (dns_us, connect_us, tls_us, ttfb_us, total_us) from the timestamps
+    recorded during a probe, see PHASES. For plain http (secure=False) all
+    of connection setup counts as connect.
+    """
+    def us(a, b):
+        return max(0, round((b - a) * 1_000_000))
+
+    start, end = timings["start"], timings["end"]
+    ready = timings.get("ready", start)
+    headers = timings.get("headers", end)
+
+    dns = connect = tls = 0
+    if "dns_end" in timings:
+        dns = us(timings["dns_start"], timings["dns_end"])
+    if "connect_start" in timings:
+        # Resolution happens inside connection setup; keep it out of connect
+        connect_from = timings.get("dns_end", timings["connect_start"])
+        tcp_done = timings.get("tcp_done", ready) if secure else ready
+        connect = us(connect_from, tcp_done)
+        tls = us(tcp_done, ready)
+
+    return (dns, connect, tls, us(ready, headers), us(start, end))
+
+
+class ProbeEngine:
+    """
+    Async HTTP prober shared by the whole worker.
+
+    One aiohttp session (and therefore one keep-alive connection pool) is
+    reused across rounds. Concurrency is bounded globally and per host with
+    semaphores, so the latency we record starts once a slot is granted and
+    never includes time spent queued behind other probes.
+
+    Every probe is split into phases (see PHASES) with perf_counter
+    timestamps taken from aiohttp's request tracing.
+
+    Warm and cold probes (see PROBE_MODES) go through separate sessions;
+    the cold one never pools connections, caches DNS or resumes TLS.
+    How often the warm caches pay off is counted, see take_stats().
+    """
+
+    def __init__(
+        self,
+        concurrency: int = PROBE_CONCURRENCY,
+        per_host: int = PROBE_CONCURRENCY_PER_HOST,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+    ):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._global = asyncio.Semaphore(concurrency)
+        # Per-host semaphores exist only while a probe of the host holds or
+        # waits for one, so hosts no longer probed are not kept around
+        self._hosts = {}
+        self._host_users = Counter()
+        self._tls = ResumingSSLContext()
+        self._stats = Counter()
+        self._session = None
+        self._cold_session = None
+
+    async def __aenter__(self):
+        warm = TimedConnector(
+            limit=self.concurrency,
+            limit_per_host=self.per_host,
+            keepalive_timeout=PROBE_KEEPALIVE_SECONDS,
+            ttl_dns_cache=DNS_CACHE_TTL_SECONDS,
+            ssl=self._tls,
+        )
+        cold = TimedConnector(
+            limit=self.concurrency,
+            limit_per_host=self.per_host,
+            force_close=True,
+            use_dns_cache=False,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=warm,
+            timeout=self.timeout,
+            trace_configs=[_trace_config()],
+        )
+        self._cold_session = aiohttp.ClientSession(
+            connector=cold,
+            timeout=self.timeout,
+            trace_configs=[_trace_config()],
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        await self._cold_session.close()
+
+    def take_stats(self) -> dict:
+        """
+        Counters since the last call: warm / cold probes, and for warm ones
+        connections reused vs opened, DNS cache hits vs lookups and TLS
+        handshakes resumed vs full.
+        """
+        stats, self._stats = self._stats, Counter()
+        return stats
+
+    def _count(self, resp, timings: dict):
+        stats = self._stats
+        if "connect_start" not in timings:
+            stats["conn_reused"] += 1
+            return
+        stats["conn_new"] += 1
+        if "dns_hit" in timings:
+            stats["dns_hit"] += 1
+        elif "dns_end" in timings:
+            stats["dns_lookup"] += 1
+        # Saved once the response is in: TLS 1.3 tickets arrive after the
+        # handshake. Redirects may have connected to another host.
+        ssl_object = timings.get("ssl_object")
+        if ssl_object is not None and not resp.history:
+            resumed = self._tls.save(resp.url.host, ssl_object)
+            stats["tls_resumed" if resumed else "tls_full"] += 1
+
+    @contextlib.asynccontextmanager
+    async def _host_slot(self, url: str):
+        try:
+            host = URL(url).host or url
+        except ValueError:
+            host = url
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        self._host_users[host] += 1
+        try:
+            async with sem:
+                yield
+        finally:
+            self._host_users[host] -= 1
+            if not self._host_users[host]:
+                del self._hosts[host], self._host_users[host]
+
+    async def probe(self, url: str, headers_only: bool = False, mode: str = "warm"):
+        """
+        Returns (latency_ms, status_str, timings).
+        status_str is 'up' if HTTP 2xx/3xx, otherwise 'down'.
+        timings is the PHASES tuple in microseconds.
+        With headers_only the probe stops at the response headers: the body
+        is not read and the connection is closed instead of drained.
+        mode is 'warm' or 'cold', see PROBE_MODES.
+        Never raises: any failure is reported as (None, 'down', None).
+        """
+        cold = mode == "cold"
+        session = self._cold_session if cold else self._session
+        secure = url.startswith("https:")
+        # Per-host slot first: probes queued behind a slow host must not sit
+        # on global slots the other hosts need
+        async with self._host_slot(url), self._global:
+            timings = {}
+            token = _probe_timings.set(timings)
+            try:
+                timings["start"] = time.perf_counter()
+                async with session.get(url, trace_request_ctx=timings) as resp:
+                    if headers_only:
+                        resp.close()
+                    else:
+                        # Read the body so the connection goes back to the pool
+                        await resp.read()
+                timings["end"] = time.perf_counter()
+                if cold:
+                    self._stats["cold"] += 1
+                else:
+                    self._stats["warm"] += 1
+                    self._count(resp, timings)
+                phases = phase_timings(timings, secure)
+                elapsed_ms = phases[-1] // 1000
+
+                if 200 <= resp.status < 400:
+                    return elapsed_ms, "up", phases
+                else:
+                    return elapsed_ms, "down", phases
+            except Exception as e:
+                # Could not reach endpoint (timeouts included)
+                print(f"[worker] Error reaching {url}: {e!r}")
+                return None, "down", None
+            finally:
+                _probe_timings.reset(token)
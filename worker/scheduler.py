@@ -0,0 +1,254 @@
+import heapq
+import itertools
+import os
+import random
+import time
+
+# Probe interval for endpoints without their own check_interval_seconds
+POLL_INTERVAL_SECONDS = int(os.getenv("POLL_INTERVAL_SECONDS", "60"))
+
+# Each firing is delayed by a random fraction of the interval (0 - ratio)
+# so endpoints sharing an interval do not all fire in the same tick.
+SCHEDULE_JITTER_RATIO = float(os.getenv("SCHEDULE_JITTER_RATIO", "0.1"))
+
+# Adaptive cadence (off by default): every result moves an endpoint's
+# interval between ADAPTIVE_FAST_FACTOR and ADAPTIVE_MAX_FACTOR times its
+# configured one. A failure, or a latency at ADAPTIVE_NEAR_THRESHOLD_RATIO
+# of latency_threshold_ms or more, switches to the fast cadence right away
+# (never below ADAPTIVE_MIN_INTERVAL_SECONDS); the first healthy result
+# goes back to 1x, and every ADAPTIVE_STABLE_CHECKS healthy results in a
+# row double the interval up to the max factor.
+ADAPTIVE_CADENCE = os.getenv("ADAPTIVE_CADENCE", "false").lower() in ("1", "true", "yes")
+ADAPTIVE_FAST_FACTOR = float(os.getenv("ADAPTIVE_FAST_FACTOR", "0.25"))
+ADAPTIVE_MAX_FACTOR = float(os.getenv("ADAPTIVE_MAX_FACTOR", "2"))
+ADAPTIVE_MIN_INTERVAL_SECONDS = float(os.getenv("ADAPTIVE_MIN_INTERVAL_SECONDS", "5"))
+ADAPTIVE_STABLE_CHECKS = int(os.getenv("ADAPTIVE_STABLE_CHECKS", "10"))
+ADAPTIVE_NEAR_THRESHOLD_RATIO = float(os.getenv("ADAPTIVE_NEAR_THRESHOLD_RATIO", "0.8"))
+
+# Cap on probes fired per second by this worker (0 = no cap), with bursts
+# of up to PROBE_BURST. Due probes over the cap wait for the next token.
+PROBE_MAX_PER_SECOND = float(os.getenv("PROBE_MAX_PER_SECOND", "0"))
+PROBE_BURST = int(os.getenv("PROBE_BURST", "0")) or None
+
+# Fields the API can change; everything else (alert state) is owned by the
+# worker while the endpoint is scheduled.
+CONFIG_FIELDS = (
+    "name",
+    "url",
+    "latency_threshold_ms",
+    "consecutive_fail_threshold",
+    "check_interval_seconds",
+    "probe_headers_only",
+    "probe_mode",
+)
+
+
+class TokenBucket:
+    """
+    Allows `rate` takes per second on average and up to `burst` (default:
+    one second worth, at least 1) at once.
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, wanted: int, now: float = None) -> int:
+        """Take up to `wanted` whole tokens; returns how many were granted."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        granted = min(wanted, int(self._tokens))
+        self._tokens -= granted
+        return granted
+
+    def seconds_until_available(self, now: float = None) -> float:
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class Scheduler:
+    """
+    Heap-based per-endpoint scheduler.
+
+    Every endpoint has a base due time that advances by exactly its interval
+    each time it fires, so the period does not drift with probe duration.
+    The heap is keyed on base due time + jitter. Updates and removals are
+    lazy: each entry carries a generation number and stale entries are
+    skipped when popped.
+
+    With `adaptive` the interval also follows the results fed to observe()
+    (see ADAPTIVE_CADENCE), and with a `max_per_second` cap pop_due only
+    hands out as many endpoints as the token bucket allows; the rest stay
+    due and go first once tokens are back.
+    """
+
+    def __init__(
+        self,
+        default_interval: int = POLL_INTERVAL_SECONDS,
+        jitter_ratio: float = SCHEDULE_JITTER_RATIO,
+        adaptive: bool = ADAPTIVE_CADENCE,
+        max_per_second: float = PROBE_MAX_PER_SECOND,
+    ):
+        self.default_interval = default_interval
+        self.jitter_ratio = jitter_ratio
+        self.adaptive = adaptive
+        self.bucket = TokenBucket(max_per_second, PROBE_BURST) if max_per_second > 0 else None
+        self._heap = []
+        self._endpoints = {}
+        self._base_due = {}
+        self._generation = {}
+        self._factor = {}
+        self._healthy_streak = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._endpoints)
+
+    def __contains__(self, endpoint_id):
+        return endpoint_id in self._endpoints
+
+    def get(self, endpoint_id):
+        return self._endpoints.get(endpoint_id)
+
+    def ids(self):
+        return set(self._endpoints)
+
+    def base_interval(self, ep) -> float:
+        return ep.get("check_interval_seconds") or self.default_interval
+
+    def interval(self, ep) -> float:
+        base = self.base_interval(ep)
+        factor = self._factor.get(ep["id"], 1.0)
+        if factor >= 1.0:
+            return base * factor
+        return max(base * factor, min(base, ADAPTIVE_MIN_INTERVAL_SECONDS))
+
+    def factors(self):
+        """Endpoint counts per adaptive factor, e.g. {0.25: 3, 1.0: 40}."""
+        counts = {}
+        for ep_id in self._endpoints:
+            factor = self._factor.get(ep_id, 1.0)
+            counts[factor] = counts.get(factor, 0) + 1
+        return counts
+
+    def _reanchor(self, endpoint_id: int, old_interval: float, now: float):
+        # Re-anchor on the new period instead of waiting out the old one
+        last_fired = self._base_due[endpoint_id] - old_interval
+        self._push(endpoint_id, max(now, last_fired + self.interval(self._endpoints[endpoint_id])))
+
+    def observe(self, endpoint_id: int, latency_ms, status: str, now: float = None):
+        """
+        Adapt the endpoint's interval to a probe result (adaptive mode only).
+        """
+        ep = self._endpoints.get(endpoint_id)
+        if not self.adaptive or ep is None:
+            return
+        threshold = ep.get("latency_threshold_ms")
+        degraded = status != "up" or (
+            threshold is not None and latency_ms is not None
+            and latency_ms >= threshold * ADAPTIVE_NEAR_THRESHOLD_RATIO
+        )
+
+        old_factor = self._factor.get(endpoint_id, 1.0)
+        if degraded:
+            factor = ADAPTIVE_FAST_FACTOR
+            self._healthy_streak[endpoint_id] = 0
+        elif old_factor < 1.0:
+            factor = 1.0
+            self._healthy_streak[endpoint_id] = 0
+        else:
+            factor = old_factor
+            streak = self._healthy_streak.get(endpoint_id, 0) + 1
+            if streak >= ADAPTIVE_STABLE_CHECKS:
+                factor = min(old_factor * 2, ADAPTIVE_MAX_FACTOR)
+                streak = 0
+            self._healthy_streak[endpoint_id] = streak
+
+        if factor != old_factor:
+            old_interval = self.interval(ep)
+            self._factor[endpoint_id] = factor
+            self._reanchor(endpoint_id, old_interval, time.monotonic() if now is None else now)
+
+    def _push(self, endpoint_id: int, base_due: float):
+        gen = next(self._seq)
+        self._generation[endpoint_id] = gen
+        self._base_due[endpoint_id] = base_due
+        interval = self.interval(self._endpoints[endpoint_id])
+        fire_at = base_due + random.uniform(0, self.jitter_ratio * interval)
+        heapq.heappush(self._heap, (fire_at, gen, endpoint_id))
+
+    def upsert(self, row, now: float = None):
+        """
+        Add an endpoint or refresh its configuration. For endpoints already
+        scheduled only CONFIG_FIELDS are copied, so in-memory alert state is
+        kept. New endpoints get a random first slot within their interval.
+        """
+        now = time.monotonic() if now is None else now
+        ep_id = row["id"]
+        current = self._endpoints.get(ep_id)
+
+        if current is None:
+            self._endpoints[ep_id] = dict(row)
+            if self.adaptive and row.get("consecutive_failures"):
+                # Already failing when we took it over
+                self._factor[ep_id] = ADAPTIVE_FAST_FACTOR
+            self._push(ep_id, now + random.uniform(0, self.interval(row)))
+            return
+
+        old_interval = self.interval(current)
+        for field in CONFIG_FIELDS:
+            if field in row:
+                current[field] = row[field]
+
+        if self.interval(current) != old_interval:
+            self._reanchor(ep_id, old_interval, now)
+
+    def remove(self, endpoint_id: int):
+        self._endpoints.pop(endpoint_id, None)
+        self._base_due.pop(endpoint_id, None)
+        self._generation.pop(endpoint_id, None)
+        self._factor.pop(endpoint_id, None)
+        self._healthy_streak.pop(endpoint_id, None)
+
+    def pop_due(self, now: float = None):
+        """
+        Return the endpoints whose slot has come and schedule their next one.
+        Slots missed while the worker was busy are skipped, not replayed.
+        """
+        now = time.monotonic() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, gen, ep_id = self._heap[0]
+            if self._generation.get(ep_id) != gen:
+                heapq.heappop(self._heap)
+                continue
+            if self.bucket is not None and not self.bucket.take(1, now):
+                break
+            heapq.heappop(self._heap)
+
+            ep = self._endpoints[ep_id]
+            interval = self.interval(ep)
+            base = self._base_due[ep_id] + interval
+            if base <= now:
+                base += ((now - base) // interval + 1) * interval
+            self._push(ep_id, base)
+            due.append(ep)
+        return due
+
+    def seconds_until_next(self, now: float = None) -> float:
+        now = time.monotonic() if now is None else now
+        while self._heap and self._generation.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return float("inf")
+        wait = max(0.0, self._heap[0][0] - now)
+        if self.bucket is not None and wait == 0.0:
+            wait = self.bucket.seconds_until_available(now)
+        return wait
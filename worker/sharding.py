@@ -0,0 +1,149 @@
+import math
+import os
+import socket
+import time
+
+# Must be unique per replica; the pod hostname is in Kubernetes.
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+# A replica that has not renewed its leases within this window is
+# considered dead and its shards are taken over by the others.
+LEASE_TTL_SECONDS = int(os.getenv("LEASE_TTL_SECONDS", "30"))
+HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("HEARTBEAT_INTERVAL_SECONDS", "10"))
+
+
+class ShardLeases:
+    """
+    Lease-based split of the endpoints table across worker replicas.
+
+    Endpoints are hashed into a fixed set of shards (endpoint id % number of
+    rows in worker_shards). Every heartbeat a replica renews its leases and
+    then moves towards its fair share, ceil(shards / live replicas): it
+    releases surplus shards or claims free / expired ones. A shard has at
+    most one unexpired owner, so no endpoint is probed twice; when a
+    replica dies its leases expire and the survivors pick them up.
+
+    A replica that cannot renew stops treating its shards as owned once the
+    lease would have expired on the server side (see `valid`).
+    """
+
+    def __init__(self, worker_id: str = WORKER_ID, ttl: int = LEASE_TTL_SECONDS):
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self.shard_count = 0
+        self.owned = set()
+        self._valid_until = 0.0
+
+    @property
+    def valid(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    def shard_of(self, endpoint_id: int) -> int:
+        return endpoint_id % self.shard_count
+
+    def owns(self, endpoint_id: int) -> bool:
+        return self.valid and self.shard_count > 0 and self.shard_of(endpoint_id) in self.owned
+
+    async def heartbeat(self, conn):
+        """
+        Renew / rebalance leases in one transaction.
+        Returns (acquired, released) shard sets.
+        """
+        started = time.monotonic()
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    INSERT INTO workers (worker_id, heartbeat_at)
+                    VALUES (%s, NOW())
+                    ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = NOW();
+                    """,
+                    (self.worker_id,),
+                )
+                await cur.execute(
+                    """
+                    SELECT
+                      (SELECT count(*) FROM worker_shards) AS shard_count,
+                      (SELECT count(*) FROM workers
+                       WHERE heartbeat_at > NOW() - make_interval(secs => %s)) AS live;
+                    """,
+                    (self.ttl,),
+                )
+                row = await cur.fetchone()
+                shard_count, live = row["shard_count"], max(row["live"], 1)
+                target = math.ceil(shard_count / live)
+
+                await cur.execute(
+                    """
+                    UPDATE worker_shards
+                    SET expires_at = NOW() + make_interval(secs => %s)
+                    WHERE owner = %s
+                    RETURNING shard;
+                    """,
+                    (self.ttl, self.worker_id),
+                )
+                owned = {r["shard"] for r in await cur.fetchall()}
+
+                if len(owned) > target:
+                    surplus = sorted(owned)[target:]
+                    await cur.execute(
+                        """
+                        UPDATE worker_shards
+                        SET owner = NULL, expires_at = NULL
+                        WHERE shard = ANY(%s) AND owner = %s;
+                        """,
+                        (surplus, self.worker_id),
+                    )
+                    owned -= set(surplus)
+                elif len(owned) < target:
+                    await cur.execute(
+                        """
+                        UPDATE worker_shards
+                        SET owner = %s,
+                            expires_at = NOW() + make_interval(secs => %s)
+                        WHERE shard IN (
+                          SELECT shard FROM worker_shards
+                          WHERE owner IS NULL OR expires_at < NOW()
+                          ORDER BY shard
+                          LIMIT %s
+                          FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING shard;
+                        """,
+                        (self.worker_id, self.ttl, target - len(owned)),
+                    )
+                    owned |= {r["shard"] for r in await cur.fetchall()}
+
+                # Forget replicas that have been gone for a while
+                await cur.execute(
+                    """
+                    DELETE FROM workers
+                    WHERE heartbeat_at < NOW() - make_interval(secs => %s);
+                    """,
+                    (self.ttl * 10,),
+                )
+
+        acquired, released = owned - self.owned, self.owned - owned
+        if shard_count != self.shard_count:
+            # Shard layout changed: every endpoint has to be re-placed
+            acquired, released = owned, self.owned
+        self.shard_count = shard_count
+        self.owned = owned
+        # Measured from before the renewal was sent, so we always give up
+        # a shard before the server considers the lease expired.
+        self._valid_until = started + self.ttl
+        return acquired, released
+
+    async def release_all(self, conn):
+        async with conn.transaction():
+            await conn.execute(
+                """
+                UPDATE worker_shards
+                SET owner = NULL, expires_at = NULL
+                WHERE owner = %s;
+                """,
+                (self.worker_id,),
+            )
+            await conn.execute("DELETE FROM workers WHERE worker_id = %s;", (self.worker_id,))
+        self.owned = set()
+        self._valid_until = 0.0
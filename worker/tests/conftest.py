@@ -0,0 +1,30 @@
+import os
+import sys
+
+import psycopg
+import pytest
+
+# The worker modules are flat scripts (python worker.py), not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def conninfo():
+    """
+    Connection settings of a database with initdb/init.sql applied (same
+    DB_* settings as the worker); the test is skipped if it is unreachable.
+    Tests run in a transaction they roll back.
+    """
+    info = {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", "5432")),
+        "dbname": os.getenv("DB_NAME", "nethealth"),
+        "user": os.getenv("DB_USER", "netuser"),
+        "password": os.getenv("DB_PASSWORD", "netpass"),
+        "connect_timeout": 3,
+    }
+    try:
+        psycopg.connect(**info).close()
+    except psycopg.OperationalError as e:
+        pytest.skip(f"no database: {e}")
+    return info
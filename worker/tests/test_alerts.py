@@ -0,0 +1,136 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from alerts import FAILURE_RATE_MAX_WINDOW_CHECKS, LATENCY_WINDOW_MAX_SAMPLES, AlertEvaluator
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def endpoint(ep_id, **fields):
+    return {
+        "id": ep_id,
+        "consecutive_failures": 0,
+        "alert_active": False,
+        "latency_threshold_ms": 300,
+        "consecutive_fail_threshold": 3,
+        **fields,
+    }
+
+
+def reference(state, latency_ms, status):
+    """
+    The per-endpoint rules as record_result applied them before the batch
+    evaluator. Updates state in place, returns the alert fired (or None).
+    """
+    failures, active = state["consecutive_failures"], state["alert_active"]
+    threshold = state["latency_threshold_ms"]
+    new_failures = failures + 1 if status == "down" else 0
+    new_active, alert = active, None
+    if status == "down" and new_failures >= state["consecutive_fail_threshold"] and not active:
+        alert = ("down", f"Endpoint is DOWN for {new_failures} consecutive checks", None)
+        new_active = True
+    if status == "up" and latency_ms is not None and latency_ms > threshold and not active:
+        alert = ("latency", f"Latency {latency_ms} ms exceeded threshold {threshold} ms", latency_ms)
+        new_active = True
+    if active and status == "up" and (latency_ms is None or latency_ms <= threshold) and new_failures == 0:
+        new_active = False
+    state["consecutive_failures"], state["alert_active"] = new_failures, new_active
+    return alert
+
+
+def test_matches_per_endpoint_rules():
+    rng = random.Random(0)
+    evaluator = AlertEvaluator(capacity=4)
+    states = {}
+    for ep_id in range(1, 41):
+        row = endpoint(
+            ep_id,
+            consecutive_failures=rng.randint(0, 3),
+            alert_active=rng.random() < 0.3,
+            latency_threshold_ms=rng.choice([100, 300]),
+            consecutive_fail_threshold=rng.randint(1, 4),
+        )
+        evaluator.upsert(row)
+        states[ep_id] = dict(row)
+
+    for batch in range(50):
+        expected, at = [], NOW + timedelta(minutes=batch)
+        for _ in range(rng.randint(0, 120)):
+            ep_id = rng.randint(1, 40)
+            down = rng.random() < 0.3
+            latency_ms = None if down or rng.random() < 0.05 else rng.randint(1, 400)
+            status = "down" if down else "up"
+            evaluator.record(ep_id, latency_ms, status, at)
+            alert = reference(states[ep_id], latency_ms, status)
+            if alert:
+                expected.append((ep_id, *alert, at))
+
+        transitions, alerts = evaluator.evaluate()
+        assert sorted(alerts, key=repr) == sorted(expected, key=repr)
+        for ep_id, failures, active, _ in transitions:
+            assert (failures, active) == (
+                states[ep_id]["consecutive_failures"], states[ep_id]["alert_active"]
+            )
+
+
+def test_removed_endpoint_results_do_not_reach_the_next_one():
+    evaluator = AlertEvaluator()
+    evaluator.upsert(endpoint(1, consecutive_fail_threshold=1))
+    evaluator.record(1, None, "down", NOW)
+    evaluator.remove(1)
+    evaluator.upsert(endpoint(2, consecutive_fail_threshold=1))
+
+    assert evaluator.evaluate() == ([], [])
+
+    # The slot is reusable again once the queue has been evaluated
+    evaluator.upsert(endpoint(3, consecutive_fail_threshold=1))
+    evaluator.record(3, None, "down", NOW)
+    evaluator.record(2, 50, "up", NOW)
+    transitions, alerts = evaluator.evaluate()
+    assert [a[:2] for a in alerts] == [(3, "down")]
+    assert transitions == [(3, 1, True, True)]
+
+
+def test_released_window_row_is_not_shared():
+    rules = {"failure_rate_threshold_pct": 50, "failure_rate_window_checks": 2}
+    evaluator = AlertEvaluator()
+    evaluator.upsert(endpoint(1, consecutive_fail_threshold=100, **rules))
+    evaluator.record(1, None, "down", NOW)
+    evaluator.record(1, None, "down", NOW)
+    evaluator.remove(1)
+    evaluator.upsert(endpoint(2, consecutive_fail_threshold=100, **rules))
+    evaluator.record(2, 10, "up", NOW)
+
+    assert evaluator.evaluate() == ([], [])
+    assert {row[0] for row in evaluator.checkpoint()} == {2}
+
+
+def test_failure_rate_rule_fires_once_and_rearms():
+    evaluator = AlertEvaluator()
+    evaluator.upsert(endpoint(
+        1, consecutive_fail_threshold=100,
+        failure_rate_threshold_pct=50, failure_rate_window_checks=4,
+    ))
+    fired = []
+    for status in ["up", "down", "up", "down", "down", "up", "up", "up", "up", "down", "down"]:
+        evaluator.record(1, None if status == "down" else 10, status, NOW)
+        fired.append([a[1] for a in evaluator.evaluate()[1]])
+    assert fired.count(["failure_rate"]) == 2
+    assert fired[3] == ["failure_rate"] and fired[10] == ["failure_rate"]
+
+
+def test_rules_past_the_worker_limits_are_clamped_and_logged_once(capsys):
+    evaluator = AlertEvaluator()
+    row = endpoint(
+        1, check_interval_seconds=60,
+        failure_rate_threshold_pct=50, failure_rate_window_checks=FAILURE_RATE_MAX_WINDOW_CHECKS + 1,
+        latency_percentile=95, latency_percentile_window_minutes=LATENCY_WINDOW_MAX_SAMPLES + 1,
+        latency_percentile_threshold_ms=100,
+    )
+    evaluator.upsert(row)
+    evaluator.upsert(row)
+
+    logged = capsys.readouterr().out.splitlines()
+    assert len(logged) == 2
+    assert "FAILURE_RATE_MAX_WINDOW_CHECKS" in logged[0]
+    assert "LATENCY_WINDOW_MAX_SAMPLES" in logged[1]
@@ -0,0 +1,56 @@
+import psycopg
+import pytest
+from psycopg.rows import dict_row
+
+
+@pytest.fixture
+def conn(conninfo):
+    conn = psycopg.connect(**conninfo, row_factory=dict_row)
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def test_moving_rows_out_of_default_partition_keeps_rollups(conn):
+    day = "2099-12-31"
+    with conn.cursor() as cur:
+        if cur.execute("SELECT to_regclass('measurements_p20991231') AS p").fetchone()["p"]:
+            pytest.skip("partition already exists")
+        user_id = cur.execute(
+            "INSERT INTO users (email, password_hash) VALUES ('partition-test@example.com', 'x') RETURNING id"
+        ).fetchone()["id"]
+        ep_id = cur.execute(
+            "INSERT INTO endpoints (user_id, name, url) VALUES (%s, 't', 'http://t') RETURNING id",
+            (user_id,),
+        ).fetchone()["id"]
+        cur.execute(
+            "INSERT INTO measurements (endpoint_id, latency_ms, status, observed_at) "
+            "VALUES (%s, 10, 'up', %s::timestamptz + interval '1 hour')",
+            (ep_id, day),
+        )
+
+        def counts():
+            return cur.execute(
+                """
+                SELECT
+                  (SELECT count(*) FROM measurements WHERE endpoint_id = %(id)s) AS measurements,
+                  (SELECT array_agg(checks ORDER BY resolution)
+                   FROM measurement_rollups WHERE endpoint_id = %(id)s) AS rollups
+                """,
+                {"id": ep_id},
+            ).fetchone()
+
+        before = counts()
+        assert before == {"measurements": 1, "rollups": [1, 1, 1]}
+
+        created = cur.execute(
+            "SELECT ensure_time_partitions('measurements', '1 day', %s, %s::timestamptz + interval '1 day') AS n",
+            (day, day),
+        ).fetchone()["n"]
+        assert created == 1
+        assert counts() == before
+        assert cur.execute(
+            "SELECT count(*) AS n FROM measurements_p20991231 WHERE endpoint_id = %s", (ep_id,)
+        ).fetchone()["n"] == 1
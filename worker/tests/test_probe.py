@@ -0,0 +1,54 @@
+import asyncio
+
+from aiohttp import web
+
+from probe import ProbeEngine
+
+
+async def serve(handler):
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, runner.addresses[0][1]
+
+
+def test_stalled_host_does_not_block_other_hosts():
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(request):
+            if request.path.startswith("/stall"):
+                await release.wait()
+            return web.Response(text="ok")
+
+        runner, port = await serve(handler)
+        try:
+            async with ProbeEngine(concurrency=4, per_host=2, timeout=10) as engine:
+                # Far more probes of one stalled host than global slots
+                stalled = [
+                    asyncio.create_task(engine.probe(f"http://127.0.0.1:{port}/stall/{i}"))
+                    for i in range(20)
+                ]
+                await asyncio.sleep(0.2)
+
+                # Same server, but another host name: its own per-host slots
+                latency_ms, status, _ = await asyncio.wait_for(
+                    engine.probe(f"http://localhost:{port}/healthy"), 2
+                )
+                assert status == "up"
+                assert not any(task.done() for task in stalled)
+                assert set(engine._hosts) == {"127.0.0.1"}
+
+                release.set()
+                results = await asyncio.gather(*stalled)
+                assert all(status == "up" for _, status, _ in results)
+                # Per-host slots go away once nothing probes the host
+                assert not engine._hosts and not engine._host_users
+        finally:
+            release.set()
+            await runner.cleanup()
+
+    asyncio.run(run())
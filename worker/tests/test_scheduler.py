@@ -0,0 +1,113 @@
+import pytest
+
+import scheduler
+from scheduler import Scheduler, TokenBucket
+
+
+def endpoint(ep_id, **fields):
+    return {"id": ep_id, "check_interval_seconds": None, "latency_threshold_ms": 1000,
+            "consecutive_failures": 0, **fields}
+
+
+def adaptive(**kwargs):
+    return Scheduler(default_interval=60, jitter_ratio=0, adaptive=True, **kwargs)
+
+
+def test_failure_switches_to_fast_cadence_and_first_success_back():
+    s = adaptive()
+    s.upsert(endpoint(1), now=0)
+    ep = s.get(1)
+    assert s.interval(ep) == 60
+
+    s.observe(1, None, "down", now=0)
+    assert s.interval(ep) == 60 * scheduler.ADAPTIVE_FAST_FACTOR
+    s.observe(1, 10, "up", now=0)
+    assert s.interval(ep) == 60
+
+
+def test_latency_near_threshold_counts_as_degraded():
+    s = adaptive()
+    s.upsert(endpoint(1), now=0)
+    s.observe(1, 1000 * scheduler.ADAPTIVE_NEAR_THRESHOLD_RATIO, "up", now=0)
+    assert s.interval(s.get(1)) == 60 * scheduler.ADAPTIVE_FAST_FACTOR
+
+
+def test_stable_endpoint_backs_off_up_to_max_factor():
+    s = adaptive()
+    s.upsert(endpoint(1), now=0)
+    seen = []
+    for _ in range(scheduler.ADAPTIVE_STABLE_CHECKS * 4):
+        s.observe(1, 10, "up", now=0)
+        seen.append(s.interval(s.get(1)))
+    assert seen[scheduler.ADAPTIVE_STABLE_CHECKS - 2] == 60
+    assert seen[scheduler.ADAPTIVE_STABLE_CHECKS - 1] == 120
+    assert max(seen) == 60 * scheduler.ADAPTIVE_MAX_FACTOR
+
+    # A failure goes straight to the fast cadence, then 1x, not back to max
+    s.observe(1, None, "down", now=0)
+    assert s.interval(s.get(1)) == 60 * scheduler.ADAPTIVE_FAST_FACTOR
+    s.observe(1, 10, "up", now=0)
+    assert s.interval(s.get(1)) == 60
+
+
+def test_fast_cadence_respects_floor_and_short_intervals():
+    s = adaptive()
+    s.upsert(endpoint(1, check_interval_seconds=10), now=0)
+    s.upsert(endpoint(2, check_interval_seconds=2), now=0)
+    s.observe(1, None, "down", now=0)
+    s.observe(2, None, "down", now=0)
+    assert s.interval(s.get(1)) == scheduler.ADAPTIVE_MIN_INTERVAL_SECONDS
+    # Never slower than configured because of the floor
+    assert s.interval(s.get(2)) == 2
+
+
+def test_endpoint_taken_over_while_failing_starts_fast():
+    s = adaptive()
+    s.upsert(endpoint(1, consecutive_failures=2), now=0)
+    assert s.interval(s.get(1)) == 60 * scheduler.ADAPTIVE_FAST_FACTOR
+
+
+def test_cadence_change_reanchors_next_slot():
+    s = adaptive()
+    s.upsert(endpoint(1), now=0)
+    t = s.seconds_until_next(now=0)
+    assert [ep["id"] for ep in s.pop_due(now=t)] == [1]
+    # Fired at t, next slot t + 60; a failure brings it to t + 15
+    s.observe(1, None, "down", now=t + 1)
+    assert s.seconds_until_next(now=t + 1) == pytest.approx(14)
+    assert s.pop_due(now=t + 14.9) == []
+    assert [ep["id"] for ep in s.pop_due(now=t + 15.001)] == [1]
+
+
+def test_not_adaptive_ignores_results():
+    s = Scheduler(default_interval=60, jitter_ratio=0, adaptive=False)
+    s.upsert(endpoint(1, consecutive_failures=3), now=0)
+    s.observe(1, None, "down", now=0)
+    assert s.interval(s.get(1)) == 60
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2, burst=4)
+    now = bucket._updated
+    assert bucket.take(10, now) == 4
+    assert bucket.take(1, now) == 0
+    assert bucket.seconds_until_available(now) == 0.5
+    assert bucket.take(10, now + 1) == 2
+
+
+def test_pop_due_is_capped_and_defers_the_rest():
+    s = Scheduler(default_interval=60, jitter_ratio=0, max_per_second=5)
+    s.bucket = TokenBucket(5, 5)
+    start = s.bucket._updated
+    for ep_id in range(20):
+        s.upsert(endpoint(ep_id), now=start - 120)
+
+    fired = len(s.pop_due(now=start))
+    assert fired == 5
+    # Nothing fires until a token is back, and the wait says so
+    assert s.pop_due(now=start) == []
+    assert s.seconds_until_next(now=start) == 0.2
+
+    for second in range(1, 4):
+        fired += len(s.pop_due(now=start + second))
+    assert fired == 20
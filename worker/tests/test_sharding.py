@@ -0,0 +1,75 @@
+import asyncio
+
+import psycopg
+from psycopg.rows import dict_row
+
+from sharding import ShardLeases
+
+
+def run_on_scratch_leases(conninfo, body):
+    """
+    Run body(conn) on one connection with workers / worker_shards emptied,
+    inside a transaction that is rolled back. NOW() is fixed within it,
+    so all replicas heartbeat at the same instant.
+    """
+    async def run():
+        conn = await psycopg.AsyncConnection.connect(**conninfo, row_factory=dict_row)
+        try:
+            await conn.execute("DELETE FROM workers")
+            await conn.execute("UPDATE worker_shards SET owner = NULL, expires_at = NULL")
+            await body(conn)
+        finally:
+            await conn.rollback()
+            await conn.close()
+
+    asyncio.run(run())
+
+
+def test_replicas_converge_on_a_fair_disjoint_split(conninfo):
+    async def body(conn):
+        a, b, c = ShardLeases("a"), ShardLeases("b"), ShardLeases("c")
+        acquired, released = await a.heartbeat(conn)
+        shards = a.shard_count
+        assert len(a.owned) == shards and acquired == a.owned and not released
+
+        # b joins: a gives up its surplus first, b picks it up next beat
+        await b.heartbeat(conn)
+        await a.heartbeat(conn)
+        await b.heartbeat(conn)
+        assert len(a.owned) == len(b.owned) == shards // 2
+        assert not a.owned & b.owned
+
+        for _ in range(2):
+            for replica in (a, b, c):
+                await replica.heartbeat(conn)
+        owned = [r.owned for r in (a, b, c)]
+        assert set().union(*owned) == set(range(shards))
+        assert sum(len(o) for o in owned) == shards
+        assert max(len(o) for o in owned) <= -(-shards // 3)
+
+        # c dies: its leases expire and the others take its shards over
+        await conn.execute(
+            """
+            UPDATE workers SET heartbeat_at = NOW() - interval '1 hour' WHERE worker_id = 'c';
+            UPDATE worker_shards SET expires_at = NOW() - interval '1 second' WHERE owner = 'c';
+            """
+        )
+        for replica in (a, b):
+            await replica.heartbeat(conn)
+        assert a.owned | b.owned == set(range(shards))
+        assert not a.owned & b.owned
+
+    run_on_scratch_leases(conninfo, body)
+
+
+def test_owns_maps_endpoints_to_held_shards(conninfo):
+    async def body(conn):
+        leases = ShardLeases("a")
+        assert not leases.owns(1)
+        await leases.heartbeat(conn)
+        assert leases.valid
+        assert all(leases.owns(ep_id) for ep_id in range(1, 200))
+        leases.owned.discard(leases.shard_of(7))
+        assert not leases.owns(7)
+
+    run_on_scratch_leases(conninfo, body)
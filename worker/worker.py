@@ -1,8 +1,17 @@
+import asyncio
 import os
+import signal
 import time
+from datetime import datetime, timezone
 import psycopg
 from psycopg.rows import dict_row
-import requests
+
+from alerts import AlertEvaluator
+from maintenance import MAINTENANCE_INTERVAL_SECONDS, maintain_partitions
+from probe import ProbeEngine
+from scheduler import Scheduler
+from sharding import HEARTBEAT_INTERVAL_SECONDS, ShardLeases
+from writer import ResultWriter
 
 DB_HOST = os.getenv("DB_HOST", "db")
 DB_PORT = int(os.getenv("DB_PORT", "5432"))
@@ -10,12 +19,28 @@ DB_NAME = os.getenv("DB_NAME", "nethealth")
 DB_USER = os.getenv("DB_USER", "netuser")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "netpass")
 
-POLL_INTERVAL_SECONDS = int(os.getenv("POLL_INTERVAL_SECONDS", "60"))
-HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "5.0"))
+# How often buffered results are written to the DB
+FLUSH_INTERVAL_SECONDS = float(os.getenv("FLUSH_INTERVAL_SECONDS", "1.0"))
+
+# Endpoint changes arrive via LISTEN/NOTIFY; a full re-read of the table
+# runs this often as a safety net for notifications missed on reconnect.
+RESYNC_INTERVAL_SECONDS = float(os.getenv("RESYNC_INTERVAL_SECONDS", "300"))
+
+# Results pushed through the API wait in probe_inbox for alert evaluation;
+# NOTIFY probe_inbox wakes us up, this is the fallback poll interval.
+INBOX_POLL_SECONDS = float(os.getenv("INBOX_POLL_SECONDS", "5"))
+INBOX_BATCH_ROWS = int(os.getenv("INBOX_BATCH_ROWS", "5000"))
+
+# Sliding-window alert state is written back to alert_rule_state this often
+# (and on shutdown); a crash loses at most this much window history.
+ALERT_STATE_CHECKPOINT_SECONDS = float(os.getenv("ALERT_STATE_CHECKPOINT_SECONDS", "30"))
+
+# How often the probe cache hit rates (connections, DNS, TLS) are logged
+PROBE_STATS_INTERVAL_SECONDS = float(os.getenv("PROBE_STATS_INTERVAL_SECONDS", "300"))
 
 
-def get_conn():
-    return psycopg.connect(
+async def get_conn():
+    return await psycopg.AsyncConnection.connect(
         host=DB_HOST,
         port=DB_PORT,
         dbname=DB_NAME,
@@ -25,182 +50,393 @@ def get_conn():
     )
 
 
-def check_endpoint(url: str, timeout: float = HTTP_TIMEOUT_SECONDS):
+async def fetch_endpoints(conn, ids=None, shards=None, shard_count=None):
     """
-    Returns (latency_ms, status_str).
-    status_str is 'up' if HTTP 2xx/3xx, otherwise 'down'.
+    Get all endpoints (or only the given ids / shards) with their alert
+    config/state, including the last checkpoint of the window rules.
     """
-    try:
-        start = time.perf_counter()
-        resp = requests.get(url, timeout=timeout)
-        elapsed_ms = int((time.perf_counter() - start) * 1000)
-
-        if 200 <= resp.status_code < 400:
-            return elapsed_ms, "up"
-        else:
-            return elapsed_ms, "down"
-    except Exception as e:
-        # Could not reach endpoint
-        print(f"[worker] Error reaching {url}: {e}")
-        # None = no latency (consistent con manual_measure del API)
-        return None, "down"
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT
+              e.id,
+              e.name,
+              e.url,
+              e.check_interval_seconds,
+              e.probe_headers_only,
+              e.probe_mode,
+              e.latency_threshold_ms,
+              e.consecutive_fail_threshold,
+              e.consecutive_failures,
+              e.alert_active,
+              e.failure_rate_threshold_pct,
+              e.failure_rate_window_checks,
+              e.latency_percentile,
+              e.latency_percentile_window_minutes,
+              e.latency_percentile_threshold_ms,
+              s.outcomes,
+              s.latencies,
+              s.latency_times,
+              s.failure_rate_active,
+              s.latency_percentile_active
+            FROM endpoints e
+            LEFT JOIN alert_rule_state s ON s.endpoint_id = e.id
+            WHERE (%(ids)s::int[] IS NULL OR e.id = ANY(%(ids)s::int[]))
+              AND (%(shards)s::int[] IS NULL
+                   OR e.id %% %(shard_count)s = ANY(%(shards)s::int[]))
+            ORDER BY e.id;
+            """,
+            {"ids": ids, "shards": shards, "shard_count": shard_count},
+        )
+        return await cur.fetchall()
 
 
-def fetch_endpoints(conn):
+def record_result(writer, evaluator, ep_id: int, latency_ms, status: str, observed_at, store_measurement: bool = True, timings=None):
     """
-    Get all endpoints with their alert config/state.
+    Buffer a check result: the measurement row goes to the writer (unless
+    store_measurement is False, for results the API already stored) and
+    the result is queued for alert evaluation, see apply_alerts.
+    timings is the probe's phase breakdown (probe.PHASES), if any.
     """
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT
-              id,
-              name,
-              url,
-              latency_threshold_ms,
-              consecutive_fail_threshold,
-              consecutive_failures,
-              alert_active
-            FROM endpoints
-            ORDER BY id;
-            """
-        )
-        return cur.fetchall()
+    if store_measurement:
+        writer.add_measurement(ep_id, latency_ms, status, observed_at, timings)
+    evaluator.record(ep_id, latency_ms, status, observed_at)
 
 
-def insert_measurement(conn, endpoint_id: int, latency_ms, status: str):
+def apply_alerts(evaluator, writer):
     """
-    Store one measurement row.
+    Evaluate the alert rules over every result recorded since the last
+    call (see alerts.AlertEvaluator) and buffer in the writer:
+      - the new consecutive_failures / alert_active (only if they changed)
+      - an entry in alerts si se dispara algo.
     """
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO measurements (endpoint_id, latency_ms, status)
-            VALUES (%s, %s, %s);
-            """,
-            (endpoint_id, latency_ms, status),
-        )
+    transitions, alerts = evaluator.evaluate()
+    for alert in alerts:
+        writer.add_alert(*alert)
+    for ep_id, failures, active, alerted in transitions:
+        writer.set_state(ep_id, failures, active, alerted)
 
 
-def update_alert_state(conn, ep, latency_ms, status: str):
-    """
-    Given the latest check result, update:
-      - consecutive_failures
-      - alert_active
-      - last_alert_at
-    and create an entry in alerts si se dispara algo.
-    ep es el row completo de endpoints (con config y estado).
-    """
-    ep_id = ep["id"]
-    threshold_latency = ep["latency_threshold_ms"]
-    threshold_fail = ep["consecutive_fail_threshold"]
-    consecutive_failures = ep["consecutive_failures"] or 0
-    alert_active = bool(ep["alert_active"])
-
-    # Actualizar contador de fallos
-    if status == "down":
-        new_failures = consecutive_failures + 1
-    else:
-        new_failures = 0
-
-    trigger_alert = False
-    alert_type = None
-    message = None
-    value = None
-    new_alert_active = alert_active
-
-    # Caso 1: demasiados "down" seguidos
-    if status == "down" and new_failures >= threshold_fail and not alert_active:
-        trigger_alert = True
-        alert_type = "down"
-        message = f"Endpoint is DOWN for {new_failures} consecutive checks"
-        value = None
-        new_alert_active = True
-
-    # Caso 2: latencia muy alta (solo si está up)
-    if (
-        status == "up"
-        and latency_ms is not None
-        and latency_ms > threshold_latency
-        and not alert_active
-    ):
-        trigger_alert = True
-        alert_type = "latency"
-        message = f"Latency {latency_ms} ms exceeded threshold {threshold_latency} ms"
-        value = latency_ms
-        new_alert_active = True
-
-    # Caso 3: limpiar alerta cuando se recupera
-    if alert_active and status == "up":
-        # está up, sin demasiados fallos y dentro del threshold
-        if (latency_ms is None or latency_ms <= threshold_latency) and new_failures == 0:
-            new_alert_active = False
-
-    with conn.cursor() as cur:
-        # Actualizar estado en endpoints
-        cur.execute(
-            """
-            UPDATE endpoints
-            SET consecutive_failures = %s,
-                alert_active = %s,
-                last_alert_at = CASE
-                                  WHEN %s THEN NOW()
-                                  ELSE last_alert_at
-                                END
-            WHERE id = %s;
-            """,
-            (new_failures, new_alert_active, trigger_alert, ep_id),
-        )
+def apply_endpoint_rows(scheduler, evaluator, leases, rows, checked_ids=None):
+    """
+    Schedule the rows this worker owns (and track their alert state).
+    Scheduled endpoints among checked_ids (all of them if None) that were
+    not returned or are no longer owned are dropped.
+    """
+    seen = set()
+    for row in rows:
+        if leases.owns(row["id"]):
+            scheduler.upsert(row)
+            evaluator.upsert(row)
+            seen.add(row["id"])
 
-        # Registrar evento de alerta si se disparó
-        if trigger_alert:
-            cur.execute(
-                """
-                INSERT INTO alerts (endpoint_id, type, message, value)
-                VALUES (%s, %s, %s, %s);
-                """,
-                (ep_id, alert_type, message, value),
-            )
+    checked = scheduler.ids() if checked_ids is None else set(checked_ids) & scheduler.ids()
+    for ep_id in checked - seen:
+        scheduler.remove(ep_id)
+        evaluator.remove(ep_id)
 
 
-def main_loop():
-    print("[worker] Starting worker loop...")
+async def sync_endpoints(scheduler, evaluator, leases):
+    """
+    Keep the scheduler in step with the endpoints table. The API sends
+    NOTIFY endpoint_changes with the endpoint id on every create / update /
+    delete; changed ids are re-read in small batches. The owned part of the
+    table is only re-read on (re)connect and every RESYNC_INTERVAL_SECONDS.
+    """
     while True:
         try:
-            with get_conn() as conn:
-                endpoints = fetch_endpoints(conn)
+            async with await get_conn() as conn:
+                await conn.set_autocommit(True)
+                await conn.execute("LISTEN endpoint_changes;")
+                last_resync = None
+
+                while True:
+                    now = time.monotonic()
+                    if last_resync is None or now - last_resync >= RESYNC_INTERVAL_SECONDS:
+                        rows = await fetch_endpoints(
+                            conn, shards=sorted(leases.owned), shard_count=leases.shard_count or 1
+                        )
+                        apply_endpoint_rows(scheduler, evaluator, leases, rows)
+                        last_resync = now
+                        print(f"[worker] Scheduling {len(scheduler)} endpoints")
+
+                    changed = set()
+                    async for notify in conn.notifies(timeout=1.0):
+                        try:
+                            changed.add(int(notify.payload))
+                        except ValueError:
+                            continue
+
+                    if changed:
+                        rows = await fetch_endpoints(conn, list(changed))
+                        apply_endpoint_rows(scheduler, evaluator, leases, rows, changed)
+                        print(f"[worker] Picked up changes for endpoints {sorted(changed)}")
 
-                if not endpoints:
-                    print("[worker] No endpoints found, sleeping...")
-                else:
-                    print(f"[worker] Checking {len(endpoints)} endpoints...")
+        except Exception as e:
+            print(f"[worker] Error syncing endpoints: {e}")
+            await asyncio.sleep(5)
+
+
+async def maintain_leases(scheduler, evaluator, leases):
+    """
+    Heartbeat every HEARTBEAT_INTERVAL_SECONDS and (un)schedule the
+    endpoints of shards that changed hands.
+    """
+    while True:
+        try:
+            async with await get_conn() as conn:
+                while True:
+                    acquired, released = await leases.heartbeat(conn)
+                    if released:
+                        # Not matched against `released`: after a shard
+                        # layout change those are old shard numbers, while
+                        # owns() places ids with the new shard count
+                        for ep_id in scheduler.ids():
+                            if not leases.owns(ep_id):
+                                scheduler.remove(ep_id)
+                                evaluator.remove(ep_id)
+                    if acquired:
+                        rows = await fetch_endpoints(
+                            conn, shards=sorted(acquired), shard_count=leases.shard_count
+                        )
+                        await conn.commit()
+                        apply_endpoint_rows(scheduler, evaluator, leases, rows, checked_ids=())
+                    if acquired or released:
+                        print(
+                            f"[worker] {leases.worker_id} owns {len(leases.owned)}/"
+                            f"{leases.shard_count} shards, scheduling {len(scheduler)} endpoints"
+                        )
+                    await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
 
-                for ep in endpoints:
-                    ep_id = ep["id"]
-                    ep_url = ep["url"]
-                    ep_name = ep["name"]
+        except Exception as e:
+            print(f"[worker] Error renewing shard leases: {e}")
+            await asyncio.sleep(1)
 
-                    latency_ms, status = check_endpoint(ep_url)
-                    print(
-                        f"[worker] {ep_name} ({ep_url}) -> "
-                        f"status={status}, latency={latency_ms}ms"
-                    )
 
-                    # 1) Insertar medición
-                    insert_measurement(conn, ep_id, latency_ms, status)
+async def partition_loop():
+    """
+    Keep measurement / alert partitions ahead of time and apply retention
+    (raw partitions and rollups) every MAINTENANCE_INTERVAL_SECONDS (one replica at a time).
+    """
+    while True:
+        try:
+            async with await get_conn() as conn:
+                result = await maintain_partitions(conn)
+            if result and any(result.values()):
+                print(
+                    f"[worker] Partitions: created {result['created']}, "
+                    f"dropped {result['dropped']}; "
+                    f"pruned {result['rollups_deleted']} rollup buckets, "
+                    f"{result['inbox_deleted']} stale inbox rows, "
+                    f"{result['cache_deleted']} cached responses"
+                )
+        except Exception as e:
+            print(f"[worker] Error maintaining partitions: {e}")
+        await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
 
-                    # 2) Actualizar estado de alertas según el resultado
-                    update_alert_state(conn, ep, latency_ms, status)
 
-                conn.commit()
+async def drain_inbox(scheduler, evaluator, writer):
+    """
+    Run results pushed through the API (probe_inbox) through the same alert
+    evaluation as our own probes. Only rows of endpoints we have scheduled
+    are claimed, oldest first; the rest wait for their owner. Claimed rows
+    are deleted right away, so a crash before the next flush loses their
+    alert evaluation (the measurements themselves are already stored).
+    """
+    while True:
+        try:
+            async with await get_conn() as conn:
+                await conn.set_autocommit(True)
+                await conn.execute("LISTEN probe_inbox;")
+
+                while True:
+                    while scheduler.ids():
+                        async with conn.cursor() as cur:
+                            await cur.execute(
+                                """
+                                DELETE FROM probe_inbox
+                                WHERE id IN (
+                                  SELECT id FROM probe_inbox
+                                  WHERE endpoint_id = ANY(%s)
+                                  ORDER BY id
+                                  LIMIT %s
+                                  FOR UPDATE SKIP LOCKED
+                                )
+                                RETURNING id, endpoint_id, latency_ms, status, observed_at;
+                                """,
+                                (list(scheduler.ids()), INBOX_BATCH_ROWS),
+                            )
+                            rows = await cur.fetchall()
+
+                        rows.sort(key=lambda r: r["id"])
+                        for r in rows:
+                            record_result(
+                                writer, evaluator, r["endpoint_id"], r["latency_ms"],
+                                r["status"], r["observed_at"], store_measurement=False,
+                            )
+                            scheduler.observe(r["endpoint_id"], r["latency_ms"], r["status"])
+                        if rows:
+                            print(f"[worker] Evaluated {len(rows)} pushed results")
+                        if len(rows) < INBOX_BATCH_ROWS:
+                            break
+
+                    async for _ in conn.notifies(timeout=INBOX_POLL_SECONDS):
+                        # One wake-up is enough, the query above takes everything
+                        break
 
         except Exception as e:
-            print(f"[worker] Error in loop: {e}")
+            print(f"[worker] Error draining probe inbox: {e}")
+            await asyncio.sleep(5)
+
+
+async def probe_endpoint(engine, scheduler, evaluator, writer, ep):
+    latency_ms, status, timings = await engine.probe(
+        ep["url"], ep.get("probe_headers_only", False), ep.get("probe_mode", "warm")
+    )
+    observed_at = datetime.now(timezone.utc)
+    print(
+        f"[worker] {ep['name']} ({ep['url']}) -> "
+        f"status={status}, latency={latency_ms}ms"
+    )
+    # Skip endpoints deleted while the probe was in flight
+    if ep["id"] in scheduler:
+        record_result(writer, evaluator, ep["id"], latency_ms, status, observed_at, timings=timings)
+        scheduler.observe(ep["id"], latency_ms, status)
+
+
+async def run_scheduler(scheduler, evaluator, leases, engine, writer):
+    """
+    Fire each endpoint's probe when it is due. An endpoint whose previous
+    probe is still in flight skips that slot, and nothing fires while our
+    shard leases may have lapsed.
+    """
+    in_flight = {}
+    while True:
+        for ep in scheduler.pop_due():
+            if ep["id"] in in_flight or not leases.owns(ep["id"]):
+                continue
+            task = asyncio.create_task(probe_endpoint(engine, scheduler, evaluator, writer, ep))
+            in_flight[ep["id"]] = task
+            task.add_done_callback(lambda _, ep_id=ep["id"]: in_flight.pop(ep_id, None))
 
-        # 3. Sleep before next round
-        print(f"[worker] Sleeping for {POLL_INTERVAL_SECONDS} seconds...\n")
-        time.sleep(POLL_INTERVAL_SECONDS)
+        # Wake up at least once a second so new endpoints are picked up
+        await asyncio.sleep(min(scheduler.seconds_until_next(), 1.0))
+
+
+async def flush_loop(writer, evaluator, leases):
+    """
+    Evaluate alerts and write buffered results every
+    FLUSH_INTERVAL_SECONDS over one long-lived connection (re-opened after
+    errors). Window rule state rides along every
+    ALERT_STATE_CHECKPOINT_SECONDS.
+    """
+    conn = None
+    last_checkpoint = time.monotonic()
+    try:
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+            apply_alerts(evaluator, writer)
+            if time.monotonic() - last_checkpoint >= ALERT_STATE_CHECKPOINT_SECONDS:
+                writer.set_rule_states(evaluator.checkpoint())
+                last_checkpoint = time.monotonic()
+            if not len(writer):
+                continue
+            try:
+                if conn is None or conn.closed:
+                    conn = await get_conn()
+                    await writer.prepare(conn)
+
+                stats = await writer.flush(conn, leases)
+                print(
+                    f"[worker] Flushed {stats['measurements']} measurements, "
+                    f"{stats['alerts']} alerts, {stats['endpoints']} endpoint "
+                    f"updates in {stats['flush_ms']:.1f} ms"
+                )
+            except Exception as e:
+                print(f"[worker] Error flushing results: {e}")
+                if conn is not None:
+                    await conn.close()
+                    conn = None
+    finally:
+        apply_alerts(evaluator, writer)
+        writer.set_rule_states(evaluator.checkpoint())
+        if conn is not None and len(writer):
+            await writer.flush(conn, leases)
+        if conn is not None:
+            await conn.close()
+
+
+def percent(part: int, whole: int) -> str:
+    return f"{part * 100 / whole:.1f}%" if whole else "-"
+
+
+async def report_probe_stats(engine, scheduler):
+    """
+    Log how well the warm probe caches work every
+    PROBE_STATS_INTERVAL_SECONDS: keep-alive connections reused, DNS
+    answers served from cache and TLS handshakes resumed; with adaptive
+    cadence also how many endpoints run at each interval factor.
+    """
+    while True:
+        await asyncio.sleep(PROBE_STATS_INTERVAL_SECONDS)
+        s = engine.take_stats()
+        if not s["warm"] and not s["cold"]:
+            continue
+        conns = s["conn_reused"] + s["conn_new"]
+        lookups = s["dns_hit"] + s["dns_lookup"]
+        handshakes = s["tls_resumed"] + s["tls_full"]
+        print(
+            f"[worker] Probes: {s['warm']} warm, {s['cold']} cold; "
+            f"connections reused {percent(s['conn_reused'], conns)} of {conns}, "
+            f"DNS cache hits {percent(s['dns_hit'], lookups)} of {lookups}, "
+            f"TLS resumed {percent(s['tls_resumed'], handshakes)} of {handshakes}"
+        )
+        if scheduler.adaptive:
+            factors = ", ".join(
+                f"{count} at {factor:g}x" for factor, count in sorted(scheduler.factors().items())
+            )
+            print(f"[worker] Cadence: {factors}")
+
+
+async def main_loop():
+    print("[worker] Starting worker loop...")
+    scheduler = Scheduler()
+    leases = ShardLeases()
+    writer = ResultWriter()
+    evaluator = AlertEvaluator()
+
+    # Kubernetes stops pods with SIGTERM: flush and hand our shards over
+    # right away instead of letting the leases time out.
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, asyncio.current_task().cancel
+    )
+
+    async with ProbeEngine() as engine:
+        tasks = [
+            asyncio.create_task(maintain_leases(scheduler, evaluator, leases)),
+            asyncio.create_task(sync_endpoints(scheduler, evaluator, leases)),
+            asyncio.create_task(run_scheduler(scheduler, evaluator, leases, engine, writer)),
+            asyncio.create_task(flush_loop(writer, evaluator, leases)),
+            asyncio.create_task(drain_inbox(scheduler, evaluator, writer)),
+            asyncio.create_task(partition_loop()),
+            asyncio.create_task(report_probe_stats(engine, scheduler)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                async with await get_conn() as conn:
+                    await leases.release_all(conn)
+                print(f"[worker] {leases.worker_id} released its shards")
+            except Exception as e:
+                print(f"[worker] Error releasing shard leases: {e}")
 
 
 if __name__ == "__main__":
-    main_loop()
+    try:
+        asyncio.run(main_loop())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
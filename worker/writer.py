@@ -0,0 +1,266 @@
+import os
+import time
+
+# Upper bound on buffered measurements while the DB is unreachable; the
+# oldest rows are dropped beyond this.
+WRITER_MAX_BUFFERED = int(os.getenv("WRITER_MAX_BUFFERED", "200000"))
+
+# Phase timing columns for results without a breakdown (pushed, failed)
+NO_TIMINGS = (None,) * 5
+
+STAGING_TABLES = """
+CREATE TEMP TABLE IF NOT EXISTS measurements_stage (
+  endpoint_id INT NOT NULL,
+  latency_ms INT,
+  status TEXT NOT NULL,
+  observed_at TIMESTAMPTZ NOT NULL,
+  dns_us INT,
+  connect_us INT,
+  tls_us INT,
+  ttfb_us INT,
+  total_us INT
+) ON COMMIT DELETE ROWS;
+
+CREATE TEMP TABLE IF NOT EXISTS alerts_stage (
+  endpoint_id INT NOT NULL,
+  type TEXT NOT NULL,
+  message TEXT NOT NULL,
+  value INT,
+  created_at TIMESTAMPTZ NOT NULL
+) ON COMMIT DELETE ROWS;
+"""
+
+
+class ResultWriter:
+    """
+    Buffers probe results and writes them in a single transaction:
+
+      - measurements and alerts are streamed with COPY into session-local
+        staging tables, then moved with one INSERT ... SELECT that drops
+        rows for endpoints deleted in the meantime
+      - endpoint alert state is written with one set-based UPDATE that only
+        carries the endpoints whose state actually changed
+      - window rule checkpoints (alerts.WindowRules) are upserted into
+        alert_rule_state in the same way
+
+    If a flush fails the rows are put back and retried on the next flush.
+    """
+
+    def __init__(self):
+        self._measurements = []
+        self._alerts = []
+        self._states = {}
+        self._rule_states = {}
+
+    def __len__(self):
+        return (
+            len(self._measurements) + len(self._alerts)
+            + len(self._states) + len(self._rule_states)
+        )
+
+    def add_measurement(self, endpoint_id: int, latency_ms, status: str, observed_at, timings=None):
+        """
+        timings: (dns_us, connect_us, tls_us, ttfb_us, total_us), see
+        probe.PHASES, or None.
+        """
+        self._measurements.append(
+            (endpoint_id, latency_ms, status, observed_at, *(timings or NO_TIMINGS))
+        )
+
+    def add_alert(self, endpoint_id: int, alert_type: str, message: str, value, created_at):
+        self._alerts.append((endpoint_id, alert_type, message, value, created_at))
+
+    def set_state(self, endpoint_id: int, consecutive_failures: int, alert_active: bool, alerted: bool):
+        """
+        Record the new alert state of an endpoint. Only call this when the
+        state differs from what is stored; the last call per endpoint wins,
+        but an alert fired earlier in the cycle is kept.
+        """
+        prev = self._states.get(endpoint_id)
+        alerted = alerted or (prev is not None and prev[2])
+        self._states[endpoint_id] = (consecutive_failures, alert_active, alerted)
+
+    def set_rule_states(self, rows):
+        """
+        Queue window rule checkpoints, (endpoint_id, outcomes, latencies,
+        latency_times, failure_rate_active, latency_percentile_active).
+        """
+        for row in rows:
+            self._rule_states[row[0]] = row
+
+    async def prepare(self, conn):
+        """
+        Create the staging tables. Call once on every new connection.
+        """
+        async with conn.transaction():
+            await conn.execute(STAGING_TABLES)
+
+    async def flush(self, conn, leases=None):
+        """
+        Write everything buffered so far and commit.
+        With `leases` (see sharding.ShardLeases) only rows for shards this
+        worker still holds an unexpired lease on are written; the lease rows
+        are locked for the duration so they cannot change hands mid-flush.
+        Returns a dict with the row counts and the flush latency.
+        """
+        measurements, alerts, states = self._measurements, self._alerts, self._states
+        rule_states = self._rule_states
+        self._measurements, self._alerts, self._states = [], [], {}
+        self._rule_states = {}
+
+        start = time.perf_counter()
+        try:
+            updated = await self._write(conn, measurements, alerts, states, rule_states, leases)
+        except Exception:
+            self._restore(measurements, alerts, states)
+            for ep_id, row in rule_states.items():
+                self._rule_states.setdefault(ep_id, row)
+            raise
+
+        return {
+            "measurements": len(measurements),
+            "alerts": len(alerts),
+            "endpoints": updated,
+            "flush_ms": (time.perf_counter() - start) * 1000,
+        }
+
+    def _restore(self, measurements, alerts, states):
+        self._measurements[:0] = measurements
+        del self._measurements[:-WRITER_MAX_BUFFERED]
+        self._alerts[:0] = alerts
+        for ep_id, (failures, active, alerted) in states.items():
+            if ep_id in self._states:
+                failures, active, newer_alerted = self._states[ep_id]
+                alerted = alerted or newer_alerted
+            self._states[ep_id] = (failures, active, alerted)
+
+    async def _write(self, conn, measurements, alerts, states, rule_states, leases):
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                fence = {"shards": None, "shard_count": None}
+                if leases is not None:
+                    await cur.execute(
+                        """
+                        SELECT shard, (SELECT count(*) FROM worker_shards) AS shard_count
+                        FROM worker_shards
+                        WHERE owner = %s AND expires_at > NOW()
+                        FOR SHARE;
+                        """,
+                        (leases.worker_id,),
+                    )
+                    rows = await cur.fetchall()
+                    fence["shards"] = [r["shard"] for r in rows]
+                    fence["shard_count"] = rows[0]["shard_count"] if rows else 1
+
+                if measurements:
+                    async with cur.copy(
+                        "COPY measurements_stage (endpoint_id, latency_ms, status, observed_at, "
+                        "dns_us, connect_us, tls_us, ttfb_us, total_us) FROM STDIN"
+                    ) as copy:
+                        for row in measurements:
+                            await copy.write_row(row)
+                    await cur.execute(
+                        """
+                        INSERT INTO measurements (
+                          endpoint_id, latency_ms, status, observed_at,
+                          dns_us, connect_us, tls_us, ttfb_us, total_us
+                        )
+                        SELECT s.endpoint_id, s.latency_ms, s.status, s.observed_at,
+                               s.dns_us, s.connect_us, s.tls_us, s.ttfb_us, s.total_us
+                        FROM measurements_stage s
+                        JOIN endpoints e ON e.id = s.endpoint_id
+                        WHERE %(shards)s::int[] IS NULL
+                           OR s.endpoint_id %% %(shard_count)s = ANY(%(shards)s::int[]);
+                        """,
+                        fence,
+                    )
+
+                if alerts:
+                    async with cur.copy(
+                        "COPY alerts_stage (endpoint_id, type, message, value, created_at) "
+                        "FROM STDIN"
+                    ) as copy:
+                        for row in alerts:
+                            await copy.write_row(row)
+                    await cur.execute(
+                        """
+                        INSERT INTO alerts (endpoint_id, type, message, value, created_at)
+                        SELECT s.endpoint_id, s.type, s.message, s.value, s.created_at
+                        FROM alerts_stage s
+                        JOIN endpoints e ON e.id = s.endpoint_id
+                        WHERE %(shards)s::int[] IS NULL
+                           OR s.endpoint_id %% %(shard_count)s = ANY(%(shards)s::int[]);
+                        """,
+                        fence,
+                    )
+
+                updated = 0
+                if states:
+                    ids = list(states)
+                    await cur.execute(
+                        """
+                        UPDATE endpoints e
+                        SET consecutive_failures = v.consecutive_failures,
+                            alert_active = v.alert_active,
+                            last_alert_at = CASE
+                                              WHEN v.alerted THEN NOW()
+                                              ELSE e.last_alert_at
+                                            END
+                        FROM unnest(
+                               %(ids)s::int[], %(failures)s::int[],
+                               %(active)s::bool[], %(alerted)s::bool[]
+                             ) AS v(id, consecutive_failures, alert_active, alerted)
+                        WHERE e.id = v.id
+                          AND (v.alerted
+                               OR e.consecutive_failures <> v.consecutive_failures
+                               OR e.alert_active <> v.alert_active)
+                          AND (%(shards)s::int[] IS NULL
+                               OR e.id %% %(shard_count)s = ANY(%(shards)s::int[]));
+                        """,
+                        {
+                            "ids": ids,
+                            "failures": [states[i][0] for i in ids],
+                            "active": [states[i][1] for i in ids],
+                            "alerted": [states[i][2] for i in ids],
+                            **fence,
+                        },
+                    )
+                    updated = cur.rowcount
+
+                if rule_states:
+                    rows = list(rule_states.values())
+                    await cur.execute(
+                        """
+                        INSERT INTO alert_rule_state (
+                          endpoint_id, outcomes, latencies, latency_times,
+                          failure_rate_active, latency_percentile_active, updated_at
+                        )
+                        SELECT v.*, NOW()
+                        FROM unnest(
+                               %(ids)s::int[], %(outcomes)s::bytea[], %(latencies)s::bytea[],
+                               %(times)s::bytea[], %(rate_active)s::bool[], %(pct_active)s::bool[]
+                             ) AS v(endpoint_id, outcomes, latencies, latency_times,
+                                    failure_rate_active, latency_percentile_active)
+                        JOIN endpoints e ON e.id = v.endpoint_id
+                        WHERE %(shards)s::int[] IS NULL
+                           OR v.endpoint_id %% %(shard_count)s = ANY(%(shards)s::int[])
+                        ON CONFLICT (endpoint_id) DO UPDATE
+                        SET outcomes = EXCLUDED.outcomes,
+                            latencies = EXCLUDED.latencies,
+                            latency_times = EXCLUDED.latency_times,
+                            failure_rate_active = EXCLUDED.failure_rate_active,
+                            latency_percentile_active = EXCLUDED.latency_percentile_active,
+                            updated_at = EXCLUDED.updated_at;
+                        """,
+                        {
+                            "ids": [r[0] for r in rows],
+                            "outcomes": [r[1] for r in rows],
+                            "latencies": [r[2] for r in rows],
+                            "times": [r[3] for r in rows],
+                            "rate_active": [r[4] for r in rows],
+                            "pct_active": [r[5] for r in rows],
+                            **fence,
+                        },
+                    )
+
+        return updated